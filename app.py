@@ -4,33 +4,80 @@ import psycopg2
 import psycopg2.extras
 import sys
 import secrets
+import random
 import urllib.request 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, make_response, g, has_request_context
+from flask import before_render_template, template_rendered
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from psycopg2 import sql, pool
 from psycopg2.pool import ThreadedConnectionPool 
 import requests
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 import time
-from functools import wraps
-from urllib.parse import urlparse
+import copy
+import queue
+import tempfile
+import asyncio
+import inspect
+import threading
+import tracemalloc
+import atexit
+from collections import OrderedDict, deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from contextlib import contextmanager
+from functools import wraps, lru_cache
+import click
+import repository
+from urllib.parse import urlparse, parse_qs, unquote
 from PIL import Image
 import io
-import boto3
-from botocore.exceptions import ClientError 
 import logging
 
+# Check if httpx is available for the async upstream routes
+try:
+    import httpx
+    ASYNC_HTTP_AVAILABLE = True
+except ImportError:
+    ASYNC_HTTP_AVAILABLE = False
+
+# Check if prometheus_client is available for the /metrics endpoint
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, multiprocess
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
+# Check if NumPy is available for the similar-recipes index
+try:
+    import similarity
+    SIMILARITY_AVAILABLE = True
+except ImportError:
+    SIMILARITY_AVAILABLE = False
+
+# Cooperative mode: with GUNICORN_WORKER_CLASS=gevent, gunicorn.conf.py
+# monkey-patches the standard library before this module is imported, so the
+# locks, semaphores and sockets created below are all gevent-aware.
+try:
+    from gevent import monkey as gevent_monkey
+    GREEN_MODE = gevent_monkey.is_module_patched('socket')
+except ImportError:
+    GREEN_MODE = False
+
 # Check if Pillow (PIL) is available for image processing
 try:
     from PIL import Image
     IMAGE_PROCESSING_AVAILABLE = True
 except ImportError:
     IMAGE_PROCESSING_AVAILABLE = False
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from markupsafe import Markup
+from jinja2 import FileSystemBytecodeCache
 import re
+import select
 from html import unescape
 
 from dotenv import load_dotenv
@@ -39,40 +86,144 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
 
-#Configure logging for production 
-if not app.debug and os.environ.get('FLASK_ENV') == 'production':
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/recipe_app.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('Recipe app startup')
+# Logging configuration
+#
+# Request threads only put records on an in-memory queue; a QueueListener
+# thread does the formatting and the stream/file I/O. LOG_LEVELS takes
+# per-logger overrides such as "recipe_app.images=DEBUG,botocore=WARNING".
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+
+# Attributes every LogRecord has; anything else was passed via extra= and is logged as a field
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message plus extra= fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener.
+
+    The stock prepare() formats the whole record on the calling thread; this
+    one only merges the message arguments, renders any traceback and adds the
+    request line, so records stay structured for JsonFormatter.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context() and not hasattr(record, 'path'):
+            record.method = request.method
+            record.path = request.path
+        return record
+
+def parse_log_levels(spec):
+    """'a=DEBUG,b.c=warning' -> {'a': 'DEBUG', 'b.c': 'WARNING'}"""
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+log_listener = None
+
+def configure_logging():
+    """Route every logger through one queue drained by a background listener"""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+
+    if LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if not app.debug and os.environ.get('FLASK_ENV') == 'production':
+        os.makedirs('logs', exist_ok=True)
+        handlers.append(RotatingFileHandler('logs/recipe_app.log', maxBytes=10240, backupCount=10))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [StructuredQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_log_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
+
+configure_logging()
+atexit.register(lambda: log_listener.stop())
+
+log = logging.getLogger('recipe_app')
+db_log = logging.getLogger('recipe_app.db')
+s3_log = logging.getLogger('recipe_app.s3')
+image_log = logging.getLogger('recipe_app.images')
+api_log = logging.getLogger('recipe_app.spoonacular')
+cache_log = logging.getLogger('recipe_app.cache')
+http_log = logging.getLogger('recipe_app.http')
 
 # AWS S3 Configuration 
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 AWS_S3_BUCKET = os.environ.get('AWS_S3_BUCKET')
 AWS_S3_REGION = os.environ.get('AWS_S3_REGION', 'us-east-1')
+# Optional S3-compatible endpoint (MinIO etc.) for local development and benchmarks
+AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL')
+
+S3_CONFIGURED = bool(AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and AWS_S3_BUCKET)
+
+# The S3 client is built on first use: importing boto3 is a large share of worker boot time
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    """Return the shared S3 client, or None when S3 is not configured"""
+    global _s3_client
+    if not S3_CONFIGURED:
+        return None
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=AWS_ACCESS_KEY_ID, 
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_S3_REGION,
+                    endpoint_url=AWS_S3_ENDPOINT_URL,
+                    config=Config(s3={'addressing_style': 'path'} if AWS_S3_ENDPOINT_URL else None,
+                                  max_pool_connections=GREEN_HTTP_POOL_SIZE if GREEN_MODE else 10)
+                )
+    return _s3_client
 
-# Initialize S3 client 
-if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and AWS_S3_BUCKET: 
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID, 
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_S3_REGION
-    )
-    print(f"✅ AWS S3 configured: {AWS_S3_BUCKET}")
-else: 
-    s3_client = None
-    print("⚠️  AWS S3 not configured. Check your environment variables.")
-    
 # Database configuration
 DATABASE_URL = os.environ.get('DATABASE_URL')
-if 'DATABASE_URL' in os.environ:
-      DATABASE_URL = os.environ['DATABASE_URL']
+DATABASE_CONFIG = None
+if DATABASE_URL:
       url = urlparse(DATABASE_URL)
       DATABASE_CONFIG = {
         'host': url.hostname,
@@ -80,21 +231,77 @@ if 'DATABASE_URL' in os.environ:
         'user': url.username,
         'password': url.password,
         'port': url.port or 5432,
-        'sslmode': 'require'  
+        # Neon needs SSL; a local database can opt out with ?sslmode=disable
+        'sslmode': parse_qs(url.query).get('sslmode', ['require'])[0]
       }
-      print(f"🐘 Using Neon.tech PostgreSQL: {url.hostname}")
-else:
-    print("❌DATABASE_URL not set!")
-    exit(1)
 
 # Spoonacular API configuration
 SPOONACULAR_API_KEY = os.environ.get('SPOONACULAR_API_KEY')
-SPOONACULAR_BASE_URL = 'https://api.spoonacular.com/recipes'
+SPOONACULAR_BASE_URL = os.environ.get('SPOONACULAR_BASE_URL', 'https://api.spoonacular.com/recipes')
+
+# Outbound HTTP: one keep-alive session per thread, created on first use. In
+# gevent mode each request runs in its own greenlet, so the process shares a
+# single session (and boto3 client) with a pool sized for green concurrency.
+GREEN_HTTP_POOL_SIZE = int(os.environ.get('GREEN_HTTP_POOL_SIZE', 50))
+_http_local = threading.local()
+_http_shared = None
+
+def http_session():
+    """requests.Session for the current thread, so repeat calls reuse connections"""
+    global _http_shared
+    if GREEN_MODE:
+        if _http_shared is None:
+            _http_shared = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=GREEN_HTTP_POOL_SIZE)
+            _http_shared.mount('http://', adapter)
+            _http_shared.mount('https://', adapter)
+        return _http_shared
+    session_ = getattr(_http_local, 'session', None)
+    if session_ is None:
+        session_ = _http_local.session = requests.Session()
+    return session_
+
+# Spoonacular response cache and speculative prefetch configuration
+SPOONACULAR_CACHE_TTL = int(os.environ.get('SPOONACULAR_CACHE_TTL', 6 * 60 * 60))
+SPOONACULAR_CACHE_MAX_ENTRIES = int(os.environ.get('SPOONACULAR_CACHE_MAX_ENTRIES', 512))
+SPOONACULAR_PREFETCH_ENABLED = os.environ.get('SPOONACULAR_PREFETCH', '').lower() in ('1', 'true', 'yes')
+SPOONACULAR_PREFETCH_TOP_K = int(os.environ.get('SPOONACULAR_PREFETCH_TOP_K', 4))
+SPOONACULAR_PREFETCH_WORKERS = int(os.environ.get('SPOONACULAR_PREFETCH_WORKERS', 1))
+SPOONACULAR_PREFETCH_MAX_PENDING = int(os.environ.get('SPOONACULAR_PREFETCH_MAX_PENDING', 16))
+SPOONACULAR_PREFETCH_DAILY_POINTS = float(os.environ.get('SPOONACULAR_PREFETCH_DAILY_POINTS', 50))
+SPOONACULAR_PREFETCH_MIN_QUOTA_LEFT = float(os.environ.get('SPOONACULAR_PREFETCH_MIN_QUOTA_LEFT', 30))
+
+# Spoonacular daily quota budget (see QuotaBudget)
+SPOONACULAR_DAILY_QUOTA = float(os.environ.get('SPOONACULAR_DAILY_QUOTA', 150))
+SPOONACULAR_LEAN_BELOW = float(os.environ.get('SPOONACULAR_LEAN_BELOW', 0.5))
+SPOONACULAR_CACHE_ONLY_BELOW = float(os.environ.get('SPOONACULAR_CACHE_ONLY_BELOW', 0.1))
+SPOONACULAR_BUDGET_SYNC_INTERVAL = float(os.environ.get('SPOONACULAR_BUDGET_SYNC_INTERVAL', 5))
+SPOONACULAR_SEARCH_CACHE_TTL = int(os.environ.get('SPOONACULAR_SEARCH_CACHE_TTL', 60 * 60))
+SPOONACULAR_LEAN_RESULTS = int(os.environ.get('SPOONACULAR_LEAN_RESULTS', 6))
 
-if not SPOONACULAR_API_KEY:
-    print("⚠️  Warning: SPOONACULAR_API_KEY not set. API features will be disabled.")
+# Cache warmer (see CacheWarmer)
+CACHE_WARMER_ENABLED = os.environ.get('CACHE_WARMER', '').lower() in ('1', 'true', 'yes')
+CACHE_WARM_INTERVAL = float(os.environ.get('CACHE_WARM_INTERVAL', 300))
+CACHE_WARM_REFRESH_BEFORE = float(os.environ.get('CACHE_WARM_REFRESH_BEFORE', 600))
+CACHE_WARM_TOP_QUERIES = int(os.environ.get('CACHE_WARM_TOP_QUERIES', 20))
+CACHE_WARM_CATEGORIES = [name.strip().lower() for name in os.environ.get(
+    'CACHE_WARM_CATEGORIES', 'breakfast,lunch,dinner,dessert,vegetarian,healthy').split(',') if name.strip()]
+CACHE_WARM_DETAILS = int(os.environ.get('CACHE_WARM_DETAILS', 3))
+CACHE_WARM_MAX_POINTS = float(os.environ.get('CACHE_WARM_MAX_POINTS', 30))
+CACHE_WARM_MIN_QUOTA_LEFT = float(os.environ.get('CACHE_WARM_MIN_QUOTA_LEFT', 30))
+SEARCH_LOG_DAYS = int(os.environ.get('SEARCH_LOG_DAYS', 7))
+SEARCH_LOG_FLUSH_INTERVAL = float(os.environ.get('SEARCH_LOG_FLUSH_INTERVAL', 30))
 
 def login_required(f):
+    if inspect.iscoroutinefunction(f):
+        @wraps(f)
+        async def decorated_coroutine(*args, **kwargs):
+            if 'user_id' not in session:
+                flash('Please log in to access this page.', 'error')
+                return redirect(url_for('login'))
+            return await f(*args, **kwargs)
+        return decorated_coroutine
+    
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
@@ -103,31 +310,213 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Database connection helper
-def get_db_connection():
-    """Simple database connection without pooling"""
+# Prometheus metrics
+#
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py) makes
+# every worker write its samples to shared files that /metrics merges.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+class NoopMetric:
+    """Stand-in used when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+def metric(kind, name, documentation, labelnames=(), **kwargs):
+    """Create a prometheus_client metric of the given kind, or a no-op"""
+    if not METRICS_AVAILABLE:
+        return NoopMetric()
+    factory = {'counter': Counter, 'gauge': Gauge, 'histogram': Histogram}[kind]
+    return factory(name, documentation, labelnames, **kwargs)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUESTS = metric('counter', 'recipe_http_requests_total',
+                       'HTTP requests served', ('route', 'method', 'status'))
+HTTP_LATENCY = metric('histogram', 'recipe_http_request_duration_seconds',
+                      'HTTP request latency', ('route', 'method', 'status'), buckets=LATENCY_BUCKETS)
+DB_POOL_IN_USE = metric('gauge', 'recipe_db_pool_connections_in_use',
+                        'Pooled database connections checked out', multiprocess_mode='livesum')
+DB_POOL_SIZE = metric('gauge', 'recipe_db_pool_connections_max',
+                      'Maximum pooled database connections', multiprocess_mode='livesum')
+DB_POOL_WAIT = metric('histogram', 'recipe_db_pool_wait_seconds',
+                      'Time spent waiting for a pooled database connection', buckets=LATENCY_BUCKETS)
+DB_QUERY_LATENCY = metric('histogram', 'recipe_db_query_duration_seconds',
+                          'Database statement execution time', buckets=LATENCY_BUCKETS)
+SPOONACULAR_CALLS = metric('counter', 'recipe_spoonacular_requests_total',
+                           'Spoonacular API calls', ('endpoint', 'outcome'))
+SPOONACULAR_LATENCY = metric('histogram', 'recipe_spoonacular_request_duration_seconds',
+                             'Spoonacular API call latency', ('endpoint',), buckets=LATENCY_BUCKETS)
+SPOONACULAR_POINTS = metric('counter', 'recipe_spoonacular_quota_points_total',
+                            'Spoonacular quota points spent', ('endpoint',))
+CACHE_INVALIDATIONS = metric('counter', 'recipe_cache_invalidations_total',
+                             'Page cache entries dropped by the invalidation bus', ('reason',))
+CACHE_REQUESTS = metric('counter', 'recipe_cache_requests_total',
+                        'Cache lookups by result', ('cache', 'result'))
+CACHE_WARMS = metric('counter', 'recipe_cache_warm_total',
+                     'Cache warmer entries by result', ('entry', 'result'))
+IMAGE_STAGE_LATENCY = metric('histogram', 'recipe_image_stage_duration_seconds',
+                             'Image pipeline stage duration', ('stage',), buckets=LATENCY_BUCKETS)
+IMAGE_BYTES = metric('counter', 'recipe_image_bytes_total',
+                     'Bytes moved through the image pipeline', ('stage',))
+S3_UPLOAD_LATENCY = metric('histogram', 'recipe_s3_upload_duration_seconds',
+                           'S3 put_object latency', buckets=LATENCY_BUCKETS)
+SPOONACULAR_BUDGET_REMAINING = metric('gauge', 'recipe_spoonacular_budget_remaining_points',
+                                      'Spoonacular quota points left today', multiprocess_mode='livemin')
+SPOONACULAR_BUDGET_LEVEL = metric('gauge', 'recipe_spoonacular_budget_level',
+                                  'Spoonacular degradation level (0 full, 1 lean, 2 cache only)',
+                                  multiprocess_mode='livemax')
+WORKER_BOOT_SECONDS = metric('gauge', 'recipe_worker_boot_seconds',
+                             'Seconds from fork until the worker was warmed up', multiprocess_mode='livemax')
+
+# Request timing
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '1').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+
+@contextmanager
+def span(name, histogram=None):
+    """Time a block of work and attach it to the current request's spans.
+
+    When a histogram is given the duration is also observed there, even
+    outside a request (CLI commands, background threads); otherwise spans
+    outside a request are a no-op.
+    """
+    in_request = has_request_context() and 'spans' in g
+    if not in_request and histogram is None:
+        yield
+        return
+    started = time.perf_counter()
     try:
-        conn = psycopg2.connect(**DATABASE_CONFIG)
-        return conn
-    except psycopg2.Error as e:
-        print(f"❌ Error connecting to PostgreSQL: {e}")
-        print(f"🔧 Check your DATABASE_CONFIG settings:")
-        print(f"   Host: {DATABASE_CONFIG['host']}")
-        print(f"   Database: {DATABASE_CONFIG['database']}")
-        print(f"   User: {DATABASE_CONFIG['user']}")
-        print(f"   Port: {DATABASE_CONFIG['port']}")
-        if 'DATABASE_URL' in os.environ:
-            print(f"💡 Make sure your Neon.tech DATABASE_URL is correct")
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if in_request:
+            # list.append is atomic, so spans recorded from to_thread workers are safe
+            g.spans.append((name, elapsed))
+        if histogram is not None:
+            histogram.observe(elapsed)
+
+class TimedCursorMixin:
+    """Report every query's execution time as a 'db' span"""
+
+    def execute(self, query, vars=None):
+        with span('db', DB_QUERY_LATENCY):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with span('db', DB_QUERY_LATENCY):
+            return super().executemany(query, vars_list)
+
+@lru_cache(maxsize=None)
+def timed_cursor_class(cursor_factory):
+    return type(f"Timed{cursor_factory.__name__}", (TimedCursorMixin, cursor_factory), {})
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors (plain or DictCursor) are timed"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = timed_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+# psycopg2 blocks inside libpq unless a wait callback hands control back; this
+# one parks the greenlet on the socket so other requests run during a query.
+def gevent_wait_callback(conn, timeout=None):
+    from gevent.socket import wait_read, wait_write
+    while True:
+        state = conn.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            break
+        elif state == psycopg2.extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
         else:
-            print(f"💡 Make sure PostgreSQL is running and the database exists")
-        if app.logger: 
-            app.logger.error(f"Database connection failed: {e}")
-        return None
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+if GREEN_MODE:
+    psycopg2.extensions.set_wait_callback(gevent_wait_callback)
+
+def native_call(fn, *args):
+    """Run CPU-bound fn on gevent's native thread pool in green mode.
+
+    Pillow releases the GIL while decoding and resizing, so other greenlets
+    keep serving while an image is transcoded. Outside green mode this is a
+    plain call.
+    """
+    if GREEN_MODE:
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+# Database connection pool. A gevent worker has many requests in flight, so
+# its default pool is larger; requests beyond it wait (cooperatively) for a slot.
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 25 if GREEN_MODE else 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+db_pool = None
+_db_pool_lock = threading.Lock()
+_db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+def get_db_pool():
+    """Create the connection pool on first use (after gunicorn has forked)"""
+    global db_pool
+    if db_pool is None:
+        if DATABASE_CONFIG is None:
+            raise psycopg2.OperationalError("DATABASE_URL not set")
+        with _db_pool_lock:
+            if db_pool is None:
+                DB_POOL_SIZE.set(DB_POOL_MAX)
+                db_pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, connection_factory=TimedConnection,
+                                                 **DATABASE_CONFIG)
+    return db_pool
+
+# Database connection helper
+def get_db_connection():
+    """Borrow a pooled connection, waiting up to DB_POOL_TIMEOUT for a free one"""
+    with span('db-connect', DB_POOL_WAIT):
+        if not _db_pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+            db_log.error(f"❌ Timed out after {DB_POOL_TIMEOUT}s waiting for a database connection")
+            return None
+        try:
+            conn = get_db_pool().getconn()
+            if conn.closed:
+                # Server dropped an idle connection; replace it
+                db_pool.putconn(conn, close=True)
+                conn = db_pool.getconn()
+            DB_POOL_IN_USE.inc()
+            return conn
+        except psycopg2.Error as e:
+            _db_pool_slots.release()
+            db_log.error(f"❌ Error connecting to PostgreSQL: {e}", extra={
+                'db_host': (DATABASE_CONFIG or {}).get('host'),
+                'db_name': (DATABASE_CONFIG or {}).get('database'),
+                'db_user': (DATABASE_CONFIG or {}).get('user'),
+                'db_port': (DATABASE_CONFIG or {}).get('port'),
+            })
+            return None
 
 def close_db_connection(conn):
-    """Simple connection close"""
-    if conn: 
-        conn.close()
+    """Return a connection to the pool, discarding it if it is broken"""
+    if conn:
+        try:
+            db_pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            DB_POOL_IN_USE.dec()
+            _db_pool_slots.release()
 
     
 def clean_html_content(content):
@@ -143,16 +532,103 @@ def clean_html_content(content):
     
     # Remove extra whitespace
     clean_text = ' '.join(clean_text.split())
-    
+
     return clean_text
 
+# Sanitized fields computed once at write time, so pages don't re-clean on every view
+INGREDIENT_MARKER = re.compile(r'^\s*[•*\-]\s*')
+STEP_MARKER = re.compile(r'^\s*(?:step\s*)?\d+\s*[.):]\s*', re.IGNORECASE)
+
+def split_recipe_lines(text, marker):
+    """Split stored ingredients/steps text into cleaned lines without their bullets or numbers"""
+    if not text:
+        return []
+    lines = (clean_html_content(marker.sub('', line)) for line in text.splitlines())
+    return [line for line in lines if line]
+
+def derive_recipe_fields(title, description, ingredients, steps):
+    """Return (title_clean, description_clean, ingredient_list, step_list) for a recipe row"""
+    return (
+        clean_html_content(title),
+        clean_html_content(description),
+        split_recipe_lines(ingredients, INGREDIENT_MARKER),
+        split_recipe_lines(steps, STEP_MARKER),
+    )
+
+def derived_field_params(title, description, ingredients, steps):
+    """derive_recipe_fields() adapted for use as query parameters"""
+    title_clean, description_clean, ingredient_list, step_list = derive_recipe_fields(
+        title, description, ingredients, steps)
+    return (title_clean, description_clean,
+            psycopg2.extras.Json(ingredient_list), psycopg2.extras.Json(step_list))
+
+def as_int(value):
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+# Spoonacular diet flags folded into the diets list, so "vegetarian" also
+# matches recipes Spoonacular only labels "lacto ovo vegetarian"
+DIET_FLAGS = {'vegetarian': 'vegetarian', 'vegan': 'vegan', 'glutenFree': 'gluten free', 'dairyFree': 'dairy free'}
+DETAIL_NUTRIENTS = ('calories', 'protein', 'fat', 'carbohydrates')
+
+def recipe_details_document(recipe_data):
+    """The structured part of a Spoonacular payload kept in recipes.details"""
+    diets = {diet.lower() for diet in recipe_data.get('diets') or []}
+    diets.update(diet for flag, diet in DIET_FLAGS.items() if recipe_data.get(flag))
+    nutrients = {(n.get('name') or '').lower(): n.get('amount')
+                 for n in (recipe_data.get('nutrition') or {}).get('nutrients') or []}
+    nutrition = {name: as_int(nutrients[name]) for name in DETAIL_NUTRIENTS if as_int(nutrients.get(name)) is not None}
+    return {
+        'diets': sorted(diets),
+        'cuisines': sorted({cuisine.lower() for cuisine in recipe_data.get('cuisines') or []}),
+        'dishTypes': sorted({dish_type.lower() for dish_type in recipe_data.get('dishTypes') or []}),
+        'readyInMinutes': as_int(recipe_data.get('readyInMinutes')),
+        'servings': as_int(recipe_data.get('servings')),
+        'nutrition': nutrition or None,
+    }
+
+def with_derived_fields(recipe):
+    """Fill derived fields of a repository row that predates the backfill"""
+    if getattr(recipe, 'raw_title', None) is not None:
+        title_clean, description_clean, ingredient_list, step_list = derive_recipe_fields(
+            recipe.raw_title, recipe.raw_description,
+            getattr(recipe, 'raw_ingredients', None), getattr(recipe, 'raw_steps', None))
+        recipe.title_clean, recipe.description_clean = title_clean, description_clean
+        if isinstance(recipe, repository.RecipeDetail):
+            recipe.ingredient_list, recipe.step_list = ingredient_list, step_list
+    return recipe
+
+def sanitize_recipe_payload(recipe_data):
+    """Attach cleaned copies of the HTML-bearing fields of a Spoonacular payload.
+
+    Runs when a response is fetched, before it goes into the cache, so the
+    detail template renders the 'sanitized' block as-is.
+    """
+    analyzed = recipe_data.get('analyzedInstructions') or []
+    steps = (analyzed[0].get('steps') or []) if analyzed else []
+    nutrients = (recipe_data.get('nutrition') or {}).get('nutrients') or []
+    recipe_data['sanitized'] = {
+        'title': clean_html_content(recipe_data.get('title')),
+        'summary': clean_html_content(recipe_data.get('summary')),
+        'ingredients': [clean_html_content(i.get('original')) for i in recipe_data.get('extendedIngredients') or []],
+        'steps': [clean_html_content(s.get('step')) for s in steps],
+        'instructions': clean_html_content(recipe_data.get('instructions')),
+        'nutrients': [{'name': clean_html_content(n.get('name')), 'amount': n.get('amount'), 'unit': n.get('unit')}
+                      for n in nutrients[:6]],
+    }
+    return recipe_data
+
 
 # AWS S3 Helper Functions
 def upload_image_to_s3(image_data, filename, content_type='image/jpeg'):
     """Upload image data to S3 bucket with public read access"""
-    if not s3_client:
-        print("❌ S3 client not configured")
+    if not S3_CONFIGURED:
+        s3_log.error("❌ S3 client not configured")
         return None
+    from botocore.exceptions import ClientError
+    s3_client = get_s3_client()
     
     try:
         # Upload to S3
@@ -166,12 +642,12 @@ def upload_image_to_s3(image_data, filename, content_type='image/jpeg'):
         )
         
         # Generate S3 URL
-        s3_url = f"https://{AWS_S3_BUCKET}.s3.{AWS_S3_REGION}.amazonaws.com/{filename}"
-        print(f"✅ Image uploaded to S3: {s3_url}")
+        s3_url = generate_public_s3_url(filename)
+        s3_log.debug("✅ Image uploaded to S3: %s", s3_url)
         return s3_url
     
     except ClientError as e:
-        print(f"❌ Error uploading to S3: {e}")
+        s3_log.warning(f"❌ Error uploading to S3: {e}")
         #If ACL fails, try without it 
         try: 
             s3_client.put_object(
@@ -182,10 +658,10 @@ def upload_image_to_s3(image_data, filename, content_type='image/jpeg'):
                 CacheControl='max-age=31536000'
             )
             s3_url = generate_public_s3_url(filename)
-            print(f"✅ Image uploaded to S3 (no ACL): {s3_url}")
+            s3_log.debug("✅ Image uploaded to S3 (no ACL): %s", s3_url)
             return s3_url
         except Exception as e2:
-            print(f"❌ Error uploading to S3 (retry): {e2}")
+            s3_log.error(f"❌ Error uploading to S3 (retry): {e2}")
         return None
 
 def save_image_locally(file, title="recipe"):
@@ -227,18 +703,106 @@ def save_image_locally(file, title="recipe"):
         return f"/static/uploads/{unique_filename}"
         
     except Exception as e:
-        print(f"Error saving image locally: {e}")
+        image_log.error(f"Error saving image locally: {e}")
         return None
 
-def process_and_upload_user_image(file):
-    """Process user uploaded file and upload to S3 with better error handling"""
+def image_placeholder(img):
+    """(width, height, '#rrggbb') for an image: its size plus its dominant colour.
+
+    The colour is the mean of the most populated 4-bit-per-channel bin of a
+    32x32 downsample, so it is a colour the image actually shows rather than
+    a muddy average of all of them.
+    """
+    import numpy as np
+    small = img.convert('RGB').resize((32, 32), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.uint8).reshape(-1, 3)
+    bins = pixels >> 4
+    keys = (bins[:, 0].astype(np.int32) << 8) | (bins[:, 1].astype(np.int32) << 4) | bins[:, 2]
+    dominant = np.bincount(keys, minlength=4096).argmax()
+    red, green, blue = pixels[keys == dominant].mean(axis=0).round().astype(int)
+    return img.width, img.height, f"#{red:02x}{green:02x}{blue:02x}"
+
+def transcode_image(image_data):
+    """Flatten transparency onto white, shrink to fit 800x600 and encode as JPEG.
+
+    Returns (jpeg bytes, image_placeholder() of the encoded image).
+    """
+    with span('image-transcode', IMAGE_STAGE_LATENCY.labels('transcode')):
+        return native_call(_transcode_image, image_data)
+
+def _transcode_image(image_data):
+    with Image.open(io.BytesIO(image_data)) as img:
+        # Convert to RGB if needed
+        if img.mode in ('RGBA', 'P', 'LA'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            if 'A' in img.mode:
+                background.paste(img, mask=img.split()[-1])
+            else:
+                background.paste(img)
+            img = background
+        
+        # Resize if too large
+        if img.width > 800 or img.height > 600:
+            img.thumbnail((800, 600), Image.Resampling.LANCZOS)
+        
+        placeholder = image_placeholder(img)
+        
+        # Convert to bytes
+        img_buffer = io.BytesIO()
+        img.save(img_buffer, format='JPEG', optimize=True, quality=85)
+        jpeg_data = img_buffer.getvalue()
+        IMAGE_BYTES.labels('encoded').inc(len(jpeg_data))
+        return jpeg_data, placeholder
+
+def transcode_to_jpeg(image_data):
+    """JPEG bytes only; see transcode_image()"""
+    return transcode_image(image_data)[0]
+
+def record_image_placeholder(image_url, placeholder, conn=None):
+    """Store an image's placeholder; a failure only costs the inline colour.
+
+    Inside a request that already holds a connection, pass it as conn: the
+    row then commits with the caller's transaction instead of waiting on a
+    second pool connection.
+    """
+    if not image_url or not placeholder:
+        return
+    if conn is not None:
+        with conn.cursor() as cur:
+            cur.execute('SAVEPOINT image_placeholder')
+            try:
+                repository.save_image_placeholder(conn, image_url, *placeholder)
+                cur.execute('RELEASE SAVEPOINT image_placeholder')
+            except psycopg2.Error as e:
+                cur.execute('ROLLBACK TO SAVEPOINT image_placeholder')
+                db_log.warning(f"⚠️ Could not store image placeholder: {e}")
+        return
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        repository.save_image_placeholder(conn, image_url, *placeholder)
+        conn.commit()
+    except psycopg2.Error as e:
+        db_log.warning(f"⚠️ Could not store image placeholder: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+def process_and_upload_user_image(file, conn=None):
+    """Process user uploaded file and upload to S3 with better error handling.
+
+    conn is the request's open connection, if it has one (see record_image_placeholder()).
+    """
     if not file or not file.filename:
-        print("❌ No file provided")
+        image_log.debug("❌ No file provided")
         return None
     
     # Check if S3 is available
-    if not s3_client:
-        print("⚠️ S3 not configured - saving without image")
+    if not S3_CONFIGURED:
+        image_log.warning("⚠️ S3 not configured - saving without image")
         return None
     
     # Check file type
@@ -246,7 +810,7 @@ def process_and_upload_user_image(file):
     file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
     
     if file_extension not in allowed_extensions:
-        print(f"❌ Invalid file type: {file_extension}")
+        image_log.info(f"❌ Invalid file type: {file_extension}")
         return None
     
     try:
@@ -255,12 +819,13 @@ def process_and_upload_user_image(file):
         file.seek(0)  # Reset file pointer
         
         if len(file_data) == 0:
-            print("❌ Empty file")
+            image_log.info("❌ Empty file")
             return None
+        IMAGE_BYTES.labels('received').inc(len(file_data))
         
         # Check if we have PIL available
         if not IMAGE_PROCESSING_AVAILABLE:
-            print("⚠️ PIL not available - uploading without processing")
+            image_log.warning("⚠️ PIL not available - uploading without processing")
             # Upload raw file
             unique_id = str(uuid.uuid4())
             filename = f"recipes/{unique_id}.{file_extension}"
@@ -272,104 +837,94 @@ def process_and_upload_user_image(file):
                 # Verify it's actually an image
                 img.verify()
         except Exception as e:
-            print(f"❌ Invalid image file: {e}")
+            image_log.info(f"❌ Invalid image file: {e}")
             return None
         
         # Reopen for processing (verify closes the image)
-        with Image.open(io.BytesIO(file_data)) as img:
-            # Convert to RGB if needed
-            if img.mode in ('RGBA', 'P', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                if 'A' in img.mode:
-                    background.paste(img, mask=img.split()[-1])
-                else:
-                    background.paste(img)
-                img = background
-            
-            # Resize if too large
-            if img.width > 800 or img.height > 600:
-                img.thumbnail((800, 600), Image.Resampling.LANCZOS)
-            
-            # Convert to bytes
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format='JPEG', optimize=True, quality=85)
-            img_buffer.seek(0)
-            
-            # Generate filename
-            unique_id = str(uuid.uuid4())
-            filename = f"recipes/{unique_id}.jpg"
-            
-            # Upload to S3
-            s3_url = upload_image_to_s3(img_buffer.getvalue(), filename, 'image/jpeg')
-            if s3_url:
-                print(f"✅ Image uploaded successfully: {s3_url}")
-            else:
-                print("❌ S3 upload failed")
-            return s3_url
+        jpeg_data, placeholder = transcode_image(file_data)
+        
+        # Generate filename
+        unique_id = str(uuid.uuid4())
+        filename = f"recipes/{unique_id}.jpg"
+        
+        # Upload to S3
+        s3_url = upload_image_to_s3(jpeg_data, filename, 'image/jpeg')
+        if s3_url:
+            image_log.debug("✅ Image uploaded successfully: %s", s3_url)
+            record_image_placeholder(s3_url, placeholder, conn)
+        else:
+            image_log.error("❌ S3 upload failed")
+        return s3_url
             
     except Exception as e:
-        print(f"❌ Error processing user image: {e}")
-        import traceback
-        traceback.print_exc()
+        image_log.exception(f"❌ Error processing user image: {e}")
         return None
 
 def upload_image_to_s3(image_data, filename, content_type='image/jpeg'):
     """Upload image data to S3 bucket with better error handling"""
-    if not s3_client:
-        print("❌ S3 client not configured")
+    if not S3_CONFIGURED:
+        s3_log.error("❌ S3 client not configured")
         return None
     
     if not AWS_S3_BUCKET:
-        print("❌ S3 bucket not configured")
+        s3_log.error("❌ S3 bucket not configured")
         return None
+    from botocore.exceptions import ClientError
+    s3_client = get_s3_client()
     
     try:
         # Upload to S3
-        s3_client.put_object(
-            Bucket=AWS_S3_BUCKET,
-            Key=filename,
-            Body=image_data,
-            ContentType=content_type,
-            CacheControl='max-age=31536000',  # Cache for 1 year
-            # Make sure the object is publicly readable
-            ACL='public-read'
-        )
+        with span('s3-put', S3_UPLOAD_LATENCY):
+            s3_client.put_object(
+                Bucket=AWS_S3_BUCKET,
+                Key=filename,
+                Body=image_data,
+                ContentType=content_type,
+                CacheControl='max-age=31536000',  # Cache for 1 year
+                # Make sure the object is publicly readable
+                ACL='public-read'
+            )
         
         # Generate S3 URL
-        s3_url = f"https://{AWS_S3_BUCKET}.s3.{AWS_S3_REGION}.amazonaws.com/{filename}"
-        print(f"✅ Image uploaded to S3: {s3_url}")
+        s3_url = generate_public_s3_url(filename)
+        s3_log.debug("✅ Image uploaded to S3: %s", s3_url)
         
         # Test if the URL is accessible
         try:
-            import requests
-            response = requests.head(s3_url, timeout=5)
+            with span('s3-head'):
+                response = http_session().head(s3_url, timeout=5)
             if response.status_code == 200:
-                print("✅ Image URL is accessible")
+                s3_log.debug("✅ Image URL is accessible")
             else:
-                print(f"⚠️ Image URL returned status: {response.status_code}")
+                s3_log.warning(f"⚠️ Image URL returned status: {response.status_code}")
         except:
-            print("⚠️ Could not verify image URL accessibility")
+            s3_log.warning("⚠️ Could not verify image URL accessibility")
         
         return s3_url
     
     except ClientError as e:
         error_code = e.response['Error']['Code']
-        print(f"❌ S3 ClientError ({error_code}): {e}")
+        s3_log.error(f"❌ S3 ClientError ({error_code}): {e}")
         return None
     except Exception as e:
-        print(f"❌ Error uploading to S3: {e}")
+        s3_log.error(f"❌ Error uploading to S3: {e}")
         return None
 
+# Headers used when mirroring images from recipe sites
+IMAGE_DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
 def download_and_upload_to_s3(image_url, recipe_title="recipe"):
     """Download image from URL and upload to S3 with fallback to original URL"""
     if not image_url:
         return None
     
     # If S3 is not configured, return the original URL
-    if not s3_client:
-        print("⚠️ S3 not configured - using original image URL")
+    if not S3_CONFIGURED:
+        image_log.debug("⚠️ S3 not configured - using original image URL")
         return image_url
     
     try:
@@ -378,58 +933,34 @@ def download_and_upload_to_s3(image_url, recipe_title="recipe"):
         filename = f"recipes/{unique_id}.jpg"
         
         # Download image with better headers
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        }
-        
-        import requests
-        response = requests.get(image_url, headers=headers, timeout=15, stream=True)
-        response.raise_for_status()
-        
-        # Check content type
-        content_type = response.headers.get('content-type', '').lower()
-        if not content_type.startswith('image/'):
-            print(f"❌ Not an image: {content_type}")
-            return image_url  # Return original URL
-        
-        # Read image data
-        image_data = response.content
+        with span('image-download', IMAGE_STAGE_LATENCY.labels('download')):
+            response = http_session().get(image_url, headers=IMAGE_DOWNLOAD_HEADERS, timeout=15, stream=True)
+            response.raise_for_status()
+            
+            # Check content type
+            content_type = response.headers.get('content-type', '').lower()
+            if not content_type.startswith('image/'):
+                image_log.warning(f"❌ Not an image: {content_type}")
+                return image_url  # Return original URL
+            
+            # Read image data
+            image_data = response.content
+            IMAGE_BYTES.labels('downloaded').inc(len(image_data))
         
         if not IMAGE_PROCESSING_AVAILABLE:
             # Upload without processing
             return upload_image_to_s3(image_data, filename, 'image/jpeg')
         
         # Process image with Pillow
-        with Image.open(io.BytesIO(image_data)) as img:
-            # Convert to RGB if needed
-            if img.mode in ('RGBA', 'P', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                if 'A' in img.mode:
-                    background.paste(img, mask=img.split()[-1])
-                else:
-                    background.paste(img)
-                img = background
-            
-            # Resize if too large
-            if img.width > 800 or img.height > 600:
-                img.thumbnail((800, 600), Image.Resampling.LANCZOS)
-            
-            # Convert to bytes
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format='JPEG', optimize=True, quality=85)
-            img_buffer.seek(0)
-            
-            # Upload to S3
-            s3_url = upload_image_to_s3(img_buffer.getvalue(), filename, 'image/jpeg')
-            return s3_url if s3_url else image_url  # Fallback to original URL
+        jpeg_data, placeholder = transcode_image(image_data)
+        
+        # Upload to S3
+        s3_url = upload_image_to_s3(jpeg_data, filename, 'image/jpeg')
+        record_image_placeholder(s3_url, placeholder)
+        return s3_url if s3_url else image_url  # Fallback to original URL
             
     except Exception as e:
-        print(f"❌ Error downloading and uploading image: {e}")
-        print(f"🔄 Using original image URL: {image_url}")
+        image_log.warning(f"❌ Error downloading and uploading image: {e} - using original image URL", extra={'image_url': image_url})
         return image_url  
 
 def generate_public_s3_url(filename):
@@ -437,8 +968,137 @@ def generate_public_s3_url(filename):
     if not AWS_S3_BUCKET or not filename: 
         return None
     
+    if AWS_S3_ENDPOINT_URL:
+        return f"{AWS_S3_ENDPOINT_URL.rstrip('/')}/{AWS_S3_BUCKET}/{filename}"
+    
      # Use the public URL format
     return f"https://{AWS_S3_BUCKET}.s3.{AWS_S3_REGION}.amazonaws.com/{filename}"
+
+def s3_key_from_url(url):
+    """Object key in AWS_S3_BUCKET that a stored image URL points at, or None.
+
+    Accepts both URL styles generate_public_s3_url() has produced:
+    virtual-hosted (bucket.s3.region.amazonaws.com/key) and path-style
+    (endpoint/bucket/key).
+    """
+    if not url or not AWS_S3_BUCKET:
+        return None
+    parsed = urlparse(url)
+    path = unquote(parsed.path)
+    if (parsed.hostname or '').startswith(f"{AWS_S3_BUCKET}."):
+        return path.lstrip('/') or None
+    prefix = f"/{AWS_S3_BUCKET}/"
+    if path.startswith(prefix):
+        return path[len(prefix):] or None
+    return None
+
+# Direct browser uploads: the browser POSTs the original straight to S3 with a
+# presigned form, the recipe form submits only the object key, and a
+# background thread turns the original into the served JPEG.
+DIRECT_UPLOAD_MAX_BYTES = int(os.environ.get('DIRECT_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+DIRECT_UPLOAD_EXPIRES = int(os.environ.get('DIRECT_UPLOAD_EXPIRES', 300))
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+DIRECT_UPLOAD_TYPES = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif', 'image/webp': 'webp'}
+UPLOAD_KEY = re.compile(r'uploads/(\d+)/[0-9a-f]{32}\.(jpg|png|gif|webp)')
+
+_image_executor = None
+_image_executor_pid = None
+_image_executor_lock = threading.Lock()
+
+def presigned_image_upload(user_id, content_type):
+    """Presigned POST for one original image under the user's uploads/ prefix.
+
+    S3 itself enforces the content type and the size limit, so nothing the
+    browser sends can exceed them.
+    """
+    key = f"uploads/{user_id}/{uuid.uuid4().hex}.{DIRECT_UPLOAD_TYPES[content_type]}"
+    post = get_s3_client().generate_presigned_post(
+        Bucket=AWS_S3_BUCKET,
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, DIRECT_UPLOAD_MAX_BYTES]],
+        ExpiresIn=DIRECT_UPLOAD_EXPIRES,
+    )
+    return {'url': post['url'], 'fields': post['fields'], 'key': key}
+
+def uploaded_image_key(form, user_id):
+    """The submitted image_key if it is one of this user's direct uploads, else None"""
+    key = (form.get('image_key') or '').strip()
+    match = UPLOAD_KEY.fullmatch(key)
+    if not match or int(match.group(1)) != user_id:
+        return None
+    return key
+
+def process_uploaded_image(recipe_id, key):
+    """Transcode a direct upload, publish it and point the recipe at it.
+
+    The recipe keeps its previous image (or none) until this finishes. If the
+    recipe has since been given a newer upload, the result is discarded. An
+    S3 failure leaves the upload pending for `flask process-pending-uploads`;
+    a file Pillow cannot read, or an original that no longer exists (never
+    uploaded, or already consumed), is dropped and the recipe keeps its old
+    image. Returns True once the upload is settled either way.
+    """
+    from botocore.exceptions import ClientError
+
+    s3_client = get_s3_client()
+    image_url = placeholder = image_data = None
+    try:
+        with span('image-download', IMAGE_STAGE_LATENCY.labels('original')):
+            image_data = s3_client.get_object(Bucket=AWS_S3_BUCKET, Key=key)['Body'].read()
+        IMAGE_BYTES.labels('received').inc(len(image_data))
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            image_log.warning(f"❌ Could not fetch uploaded image: {e}", extra={'recipe_id': recipe_id, 'key': key})
+            return False
+        # Retrying cannot bring it back; settle so the recipe stops showing "processing"
+        image_log.info("❌ Uploaded image is gone", extra={'recipe_id': recipe_id, 'key': key})
+    except Exception as e:
+        image_log.warning(f"❌ Could not fetch uploaded image: {e}", extra={'recipe_id': recipe_id, 'key': key})
+        return False
+    
+    if image_data is not None:
+        try:
+            jpeg_data, placeholder = transcode_image(image_data)
+        except Exception as e:
+            image_log.info(f"❌ Invalid uploaded image: {e}", extra={'recipe_id': recipe_id, 'key': key})
+        else:
+            image_url = upload_image_to_s3(jpeg_data, f"recipes/{uuid.uuid4()}.jpg", 'image/jpeg')
+            if not image_url:
+                return False
+    
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        if image_url:
+            repository.save_image_placeholder(conn, image_url, *placeholder)
+        if repository.finish_pending_image(conn, recipe_id, key, image_url):
+            image_log.debug("✅ Uploaded image processed: %s", image_url)
+        conn.commit()
+    except psycopg2.Error as e:
+        db_log.error(f"❌ Error storing processed image for recipe {recipe_id}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        close_db_connection(conn)
+    
+    if image_data is None:
+        return True
+    try:
+        s3_client.delete_object(Bucket=AWS_S3_BUCKET, Key=key)
+    except Exception as e:
+        s3_log.warning(f"⚠️ Could not delete upload original {key}: {e}")
+    return True
+
+def schedule_image_processing(recipe_id, key):
+    """Queue process_uploaded_image() on this worker's image threads"""
+    global _image_executor, _image_executor_pid
+    with _image_executor_lock:
+        if _image_executor_pid != os.getpid():
+            _image_executor = ThreadPoolExecutor(max_workers=IMAGE_PROCESSING_WORKERS, thread_name_prefix='image')
+            _image_executor_pid = os.getpid()
+        _image_executor.submit(process_uploaded_image, recipe_id, key)
    
 # Test database connection
 def test_db_connection():
@@ -494,6 +1154,181 @@ def init_db():
                         source VARCHAR(50) DEFAULT 'user',
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )''')
+
+        # Sanitized copies of the text fields, filled on write (see derive_recipe_fields)
+        cur.execute('''ALTER TABLE recipes
+                       ADD COLUMN IF NOT EXISTS title_clean VARCHAR(255),
+                       ADD COLUMN IF NOT EXISTS description_clean TEXT,
+                       ADD COLUMN IF NOT EXISTS ingredient_list JSONB,
+                       ADD COLUMN IF NOT EXISTS step_list JSONB''')
+
+        # Structured Spoonacular data for local filtering (see recipe_details_document)
+        cur.execute('ALTER TABLE recipes ADD COLUMN IF NOT EXISTS details JSONB')
+        # S3 key of a direct upload still being processed (process_uploaded_image)
+        cur.execute('ALTER TABLE recipes ADD COLUMN IF NOT EXISTS pending_image_key VARCHAR(255)')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipes_details_idx
+                       ON recipes USING GIN (details jsonb_path_ops)''')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipes_ready_in_minutes_idx
+                       ON recipes (((details->>'readyInMinutes')::int))''')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipes_calories_idx
+                       ON recipes (((details->'nutrition'->>'calories')::numeric))''')
+        # Home page (newest first), the "already saved?" check, image backfills
+        # and the pending-upload sweep; each would otherwise scan recipes
+        cur.execute('CREATE INDEX IF NOT EXISTS recipes_created_at_idx ON recipes (created_at)')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipes_spoonacular_id_idx
+                       ON recipes (spoonacular_id) WHERE spoonacular_id IS NOT NULL''')
+        cur.execute('CREATE INDEX IF NOT EXISTS recipes_image_url_idx ON recipes (image_url)')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipes_pending_image_idx
+                       ON recipes (id) WHERE pending_image_key IS NOT NULL''')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipes_missing_details_idx
+                       ON recipes (id) WHERE details IS NULL AND spoonacular_id IS NOT NULL''')
+        # Trigram indexes serve search's ILIKE '%term%'; pg_trgm ships with
+        # Postgres but creating it needs CREATE rights on the database
+        cur.execute('SAVEPOINT trigram')
+        try:
+            cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cur.execute('''CREATE INDEX IF NOT EXISTS recipes_title_trgm_idx
+                           ON recipes USING GIN (title gin_trgm_ops)''')
+            cur.execute('''CREATE INDEX IF NOT EXISTS recipes_description_trgm_idx
+                           ON recipes USING GIN (description gin_trgm_ops)''')
+            cur.execute('RELEASE SAVEPOINT trigram')
+        except psycopg2.Error as e:
+            cur.execute('ROLLBACK TO SAVEPOINT trigram')
+            print(f"⚠️ pg_trgm unavailable, text search will scan recipes: {e}")
+
+        # Facet counts for /browse, maintained by a trigger on every write to
+        # recipes.details so browsing never has to GROUP BY over recipes
+        cur.execute('''CREATE TABLE IF NOT EXISTS recipe_facet_counts (
+                        facet VARCHAR(32) NOT NULL,
+                        value VARCHAR(255) NOT NULL,
+                        recipes INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (facet, value)
+                    )''')
+        cur.execute('''CREATE OR REPLACE FUNCTION recipe_facets(details JSONB)
+                       RETURNS TABLE (facet TEXT, value TEXT) AS $$
+                           SELECT 'category', jsonb_array_elements_text(COALESCE(details->'dishTypes', '[]'))
+                           UNION
+                           SELECT 'diet', jsonb_array_elements_text(COALESCE(details->'diets', '[]'))
+                       $$ LANGUAGE SQL IMMUTABLE''')
+        cur.execute('''CREATE OR REPLACE FUNCTION recipe_facet_counts_update() RETURNS trigger AS $$
+                       BEGIN
+                           IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                               UPDATE recipe_facet_counts c SET recipes = c.recipes - 1
+                               FROM recipe_facets(OLD.details) f
+                               WHERE c.facet = f.facet AND c.value = f.value;
+                           END IF;
+                           IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                               INSERT INTO recipe_facet_counts (facet, value, recipes)
+                               SELECT f.facet, f.value, 1 FROM recipe_facets(NEW.details) f
+                               ON CONFLICT (facet, value)
+                               DO UPDATE SET recipes = recipe_facet_counts.recipes + 1;
+                           END IF;
+                           RETURN NULL;
+                       END
+                       $$ LANGUAGE plpgsql''')
+        cur.execute('DROP TRIGGER IF EXISTS recipe_facet_counts_insert_delete ON recipes')
+        cur.execute('''CREATE TRIGGER recipe_facet_counts_insert_delete
+                       AFTER INSERT OR DELETE ON recipes
+                       FOR EACH ROW EXECUTE FUNCTION recipe_facet_counts_update()''')
+        cur.execute('DROP TRIGGER IF EXISTS recipe_facet_counts_details ON recipes')
+        cur.execute('''CREATE TRIGGER recipe_facet_counts_details
+                       AFTER UPDATE OF details ON recipes
+                       FOR EACH ROW WHEN (OLD.details IS DISTINCT FROM NEW.details)
+                       EXECUTE FUNCTION recipe_facet_counts_update()''')
+        cur.execute('SELECT NOT EXISTS (SELECT 1 FROM recipe_facet_counts)')
+        if cur.fetchone()[0]:
+            repository.rebuild_facet_counts(conn)
+
+        # Similar-recipes index: TF-IDF model plus each recipe's sparse vector and top-k neighbours
+        cur.execute('''CREATE TABLE IF NOT EXISTS similarity_model (
+                        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                        vocabulary JSONB NOT NULL,
+                        idf REAL[] NOT NULL,
+                        built_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS recipe_similarity (
+                        recipe_id INTEGER PRIMARY KEY REFERENCES recipes(id) ON DELETE CASCADE,
+                        terms INTEGER[] NOT NULL,
+                        weights REAL[] NOT NULL,
+                        similar_ids INTEGER[] NOT NULL,
+                        scores REAL[] NOT NULL
+                    )''')
+        # Incremental updates look recipes up by shared term, and by the lists that name them
+        cur.execute('CREATE INDEX IF NOT EXISTS recipe_similarity_terms_idx ON recipe_similarity USING GIN (terms)')
+        cur.execute('''CREATE INDEX IF NOT EXISTS recipe_similarity_similar_ids_idx
+                       ON recipe_similarity USING GIN (similar_ids)''')
+
+        # Page cache invalidation bus: each committed change to a recipe or its
+        # similar-recipes row is announced to every worker's CacheInvalidationListener
+        cur.execute(f'''CREATE OR REPLACE FUNCTION recipe_cache_notify() RETURNS trigger AS $$
+                        DECLARE
+                            changed RECORD;
+                        BEGIN
+                            IF TG_OP = 'DELETE' THEN changed := OLD; ELSE changed := NEW; END IF;
+                            IF TG_TABLE_NAME = 'recipes' THEN
+                                PERFORM pg_notify('{RECIPE_CACHE_CHANNEL}', json_build_object(
+                                    'recipe', changed.id, 'author', changed.author_id)::text);
+                            ELSE
+                                PERFORM pg_notify('{RECIPE_CACHE_CHANNEL}', json_build_object(
+                                    'recipe', changed.recipe_id)::text);
+                            END IF;
+                            RETURN NULL;
+                        END
+                        $$ LANGUAGE plpgsql''')
+        for table in ('recipes', 'recipe_similarity'):
+            cur.execute(f'DROP TRIGGER IF EXISTS {table}_cache_notify ON {table}')
+            cur.execute(f'''CREATE TRIGGER {table}_cache_notify
+                            AFTER INSERT OR UPDATE OR DELETE ON {table}
+                            FOR EACH ROW EXECUTE FUNCTION recipe_cache_notify()''')
+
+        # Dominant colour and size of each processed image, for inline placeholders
+        cur.execute('''CREATE TABLE IF NOT EXISTS image_placeholders (
+                        image_url VARCHAR(500) PRIMARY KEY,
+                        width INTEGER NOT NULL,
+                        height INTEGER NOT NULL,
+                        color CHAR(7) NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    )''')
+
+        # Resume points for flask reprocess-images, one row per named job
+        cur.execute('''CREATE TABLE IF NOT EXISTS image_reprocess_checkpoints (
+                        job VARCHAR(64) PRIMARY KEY,
+                        last_id INTEGER NOT NULL,
+                        processed BIGINT NOT NULL DEFAULT 0,
+                        failed BIGINT NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    )''')
+
+        # Spoonacular quota spend per day and endpoint, shared by every worker
+        cur.execute('''CREATE TABLE IF NOT EXISTS spoonacular_quota_usage (
+                        day DATE NOT NULL,
+                        endpoint VARCHAR(64) NOT NULL,
+                        points DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        calls INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, endpoint)
+                    )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS spoonacular_quota_state (
+                        day DATE PRIMARY KEY,
+                        quota_used DOUBLE PRECISION,
+                        quota_left DOUBLE PRECISION,
+                        reported_at TIMESTAMPTZ NOT NULL
+                    )''')
+
+        # Searches per day, query and kind, which the cache warmer ranks
+        cur.execute('''CREATE TABLE IF NOT EXISTS search_query_counts (
+                        day DATE NOT NULL,
+                        kind VARCHAR(32) NOT NULL,
+                        query VARCHAR(200) NOT NULL,
+                        searches INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, kind, query)
+                    )''')
+
+        # Shared cache of Spoonacular responses (read by every worker)
+        cur.execute('''CREATE TABLE IF NOT EXISTS api_response_cache (
+                        cache_key VARCHAR(255) PRIMARY KEY,
+                        payload JSONB NOT NULL,
+                        expires_at TIMESTAMP NOT NULL
+                    )''')
         conn.commit()
         print("✅ Database tables created successfully!")
         
@@ -513,47 +1348,1009 @@ def init_db():
         close_db_connection(conn)
                         
 # Spoonacular API functions
+def normalize_query(query):
+    return ' '.join(query.lower().split())[:200]
+
+def cache_levels(level):
+    """Budget levels whose cached responses may be served at level, best first.
+
+    Lean responses are cached under keys of their own, so a full-budget
+    visitor never gets the fewer results or missing blocks of a lean fetch.
+    """
+    return ('full',) if level == 'full' else ('full', 'lean')
+
+def search_cache_key(kind, query, number, level='full'):
+    lean = '' if level == 'full' else ':lean'
+    return f"{kind}:{number}{lean}:{normalize_query(query)}"
+
+def search_params(query, number, level):
+    """complexSearch parameters for the search page at a budget level"""
+    params = {
+        'apiKey': SPOONACULAR_API_KEY,
+        'query': query,
+        'number': number,
+        'addRecipeInformation': True,
+        'fillIngredients': True
+    }
+    if level != 'full':
+        # Cards only need id, title, image and summary; every result costs points
+        del params['fillIngredients']
+        params['number'] = min(number, SPOONACULAR_LEAN_RESULTS)
+    return params
+
+def cached_search(kind, query, number, endpoint, level):
+    """Cached results, from an earlier search or the cache warmer; (hit, value)"""
+    for cached_level in cache_levels(level):
+        cached = api_cache.get(search_cache_key(kind, query, number, cached_level))
+        if cached is not None:
+            return True, cached
+    if level == 'cache_only':
+        SPOONACULAR_CALLS.labels(endpoint, 'skipped').inc()
+        return True, None
+    return False, None
+
+def fetch_search_api(query, number=12, level='full'):
+    """Run the search page's complexSearch without touching the cache.
+
+    Returns a (search_data, quota_points) tuple.
+    """
+    url = f"{SPOONACULAR_BASE_URL}/complexSearch"
+    with spoonacular_call('complexSearch'):
+        response = http_session().get(url, params=search_params(query, number, level), timeout=10)
+    points = record_spoonacular_quota(response, 'complexSearch')
+    response.raise_for_status()
+    return response.json(), points
+
 def search_recipes_api(query, number=12):
     """Search recipes using Spoonacular API"""
     if not SPOONACULAR_API_KEY:
-        print("⚠️  Spoonacular API key not configured")
+        api_log.debug("⚠️  Spoonacular API key not configured")
         return None
+    
+    level = quota_budget.level()
+    key = search_cache_key('complexSearch', query, number, level)
+    hit, cached = cached_search('complexSearch', query, number, 'complexSearch', level)
+    if hit:
+        return cached
         
     try:
-        url = f"{SPOONACULAR_BASE_URL}/complexSearch"
-        params = {
-            'apiKey': SPOONACULAR_API_KEY,
-            'query': query,
-            'number': number,
-            'addRecipeInformation': True,
-            'fillIngredients': True
-        }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        search_data, _ = fetch_search_api(query, number, level)
     except requests.exceptions.RequestException as e: 
-        print(f"Error searching recipes: {e}")
-        return None 
+        api_log.error(f"Error searching recipes: {e}")
+        # A stale answer beats none
+        return api_cache.get(key)
+    
+    api_cache.set(key, search_data, ttl=SPOONACULAR_SEARCH_CACHE_TTL)
+    return search_data
+
+# Last quota figures reported by Spoonacular response headers
+spoonacular_quota = {'used': None, 'left': None}
+
+# Spoonacular quota budget
+#
+# Every call's cost (X-API-Quota-Request) is recorded in memory and folded
+# into the spoonacular_quota_usage table by a background thread, so all
+# workers see the account's spend for the day. As the remaining budget
+# drains, calls drop to cheaper parameters ('lean') and finally stop
+# altogether in favour of cached responses ('cache_only').
+BUDGET_LEVELS = ('full', 'lean', 'cache_only')
+
+class QuotaBudget:
+    """Daily Spoonacular point budget shared across workers through Postgres"""
+
+    def __init__(self, daily_quota, lean_below, cache_only_below, sync_interval):
+        self.daily_quota = daily_quota
+        self.lean_below = lean_below
+        self.cache_only_below = cache_only_below
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._day = None
+        self._pending = {}
+        self._synced_spent = 0.0
+        self._header_left = None
+        self._header_used = None
+        self._header_at = None
+        self._pid = None
+        self._roll_day()
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date()
+
+    def _roll_day(self):
+        # Spoonacular quotas reset daily; forget yesterday's figures
+        today = self._today()
+        if self._day != today:
+            self._day = today
+            self._synced_spent = 0.0
+            self._header_left = self._header_used = self._header_at = None
+
+    def ensure_running(self):
+        """Start the sync thread in this process if it isn't running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='quota-budget', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                api_log.exception(f"❌ Quota budget sync failed: {e}")
+
+    def record(self, endpoint, points, used=None, left=None):
+        """Account for one call and the quota headers it came back with"""
+        self.ensure_running()
+        with self._lock:
+            self._roll_day()
+            spent, calls = self._pending.get(endpoint, (0.0, 0))
+            self._pending[endpoint] = (spent + points, calls + 1)
+            if left is not None:
+                self._header_left, self._header_used = left, used
+                self._header_at = datetime.now(timezone.utc)
+        self._publish()
+
+    def mark_exhausted(self):
+        """Spoonacular refused a call for lack of quota (HTTP 402)"""
+        with self._lock:
+            self._roll_day()
+            self._header_left = 0.0
+            self._header_at = datetime.now(timezone.utc)
+        self._publish()
+
+    def remaining(self):
+        with self._lock:
+            self._roll_day()
+            spent = self._synced_spent + sum(points for points, _ in self._pending.values())
+            remaining = self.daily_quota - spent
+            if self._header_left is not None:
+                remaining = min(remaining, self._header_left)
+        return max(remaining, 0.0)
+
+    def level(self):
+        """'full', 'lean' or 'cache_only' for the budget left today"""
+        self.ensure_running()
+        fraction = self.remaining() / self.daily_quota if self.daily_quota else 0.0
+        if fraction <= self.cache_only_below:
+            return 'cache_only'
+        if fraction <= self.lean_below:
+            return 'lean'
+        return 'full'
+
+    def _publish(self):
+        remaining = self.remaining()
+        SPOONACULAR_BUDGET_REMAINING.set(remaining)
+        SPOONACULAR_BUDGET_LEVEL.set(BUDGET_LEVELS.index(self.level()))
+
+    def sync(self):
+        """Write this worker's pending spend and read back the day's totals"""
+        with self._lock:
+            self._roll_day()
+            day, pending, self._pending = self._day, self._pending, {}
+            header = (self._header_used, self._header_left, self._header_at)
+
+        conn = get_db_connection()
+        if not conn:
+            self._restore(day, pending)
+            return
+        try:
+            cur = conn.cursor()
+            if pending:
+                psycopg2.extras.execute_values(cur, '''
+                    INSERT INTO spoonacular_quota_usage (day, endpoint, points, calls) VALUES %s
+                    ON CONFLICT (day, endpoint) DO UPDATE
+                    SET points = spoonacular_quota_usage.points + EXCLUDED.points,
+                        calls = spoonacular_quota_usage.calls + EXCLUDED.calls''',
+                    [(day, endpoint, points, calls) for endpoint, (points, calls) in pending.items()])
+            if header[2] is not None:
+                cur.execute('''INSERT INTO spoonacular_quota_state (day, quota_used, quota_left, reported_at)
+                               VALUES (%s, %s, %s, %s)
+                               ON CONFLICT (day) DO UPDATE
+                               SET quota_used = EXCLUDED.quota_used, quota_left = EXCLUDED.quota_left,
+                                   reported_at = EXCLUDED.reported_at
+                               WHERE spoonacular_quota_state.reported_at < EXCLUDED.reported_at''',
+                            (day, *header))
+            conn.commit()
+            cur.execute('SELECT COALESCE(SUM(points), 0) FROM spoonacular_quota_usage WHERE day = %s', (day,))
+            spent = float(cur.fetchone()[0])
+            cur.execute('''SELECT quota_used, quota_left, reported_at FROM spoonacular_quota_state
+                           WHERE day = %s''', (day,))
+            shared_header = cur.fetchone()
+            cur.close()
+        except psycopg2.Error as e:
+            api_log.warning(f"⚠️ Quota budget sync failed: {e}")
+            conn.rollback()
+            self._restore(day, pending)
+            return
+        finally:
+            close_db_connection(conn)
+
+        with self._lock:
+            if self._day == day:
+                self._synced_spent = spent
+                # Another worker may have seen fresher quota headers than ours
+                if shared_header and (self._header_at is None or shared_header[2] > self._header_at):
+                    self._header_used, self._header_left, self._header_at = shared_header
+                    spoonacular_quota['used'], spoonacular_quota['left'] = shared_header[0], shared_header[1]
+        self._publish()
+
+    def _restore(self, day, pending):
+        """Put unsynced spend back so it is written next time"""
+        with self._lock:
+            if self._day != day:
+                return
+            for endpoint, (points, calls) in pending.items():
+                spent, count = self._pending.get(endpoint, (0.0, 0))
+                self._pending[endpoint] = (spent + points, count + calls)
+
+quota_budget = QuotaBudget(SPOONACULAR_DAILY_QUOTA, SPOONACULAR_LEAN_BELOW,
+                           SPOONACULAR_CACHE_ONLY_BELOW, SPOONACULAR_BUDGET_SYNC_INTERVAL)
+
+@contextmanager
+def spoonacular_call(endpoint):
+    """Span and latency histogram for one Spoonacular request; counts transport errors"""
+    try:
+        with span('spoonacular', SPOONACULAR_LATENCY.labels(endpoint)):
+            yield
+    except Exception:
+        SPOONACULAR_CALLS.labels(endpoint, 'error').inc()
+        raise
+
+def record_spoonacular_quota(response, endpoint):
+    """Remember the quota headers Spoonacular sends back and return the call's cost"""
+    for key, header in (('used', 'X-API-Quota-Used'), ('left', 'X-API-Quota-Left')):
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                spoonacular_quota[key] = float(value)
+            except ValueError:
+                pass
+    try:
+        points = float(response.headers.get('X-API-Quota-Request', 1))
+    except ValueError:
+        points = 1.0
+    SPOONACULAR_CALLS.labels(endpoint, 'ok' if response.status_code < 400 else 'error').inc()
+    SPOONACULAR_POINTS.labels(endpoint).inc(points)
+    reported = response.headers.get('X-API-Quota-Left') is not None
+    quota_budget.record(endpoint, points, spoonacular_quota['used'] if reported else None,
+                        spoonacular_quota['left'] if reported else None)
+    if response.status_code == 402:
+        quota_budget.mark_exhausted()
+    return points
+
+class ResponseCache:
+    """Two-level cache for Spoonacular responses.
+
+    A small in-process LRU sits in front of the api_response_cache table so
+    a response fetched by one worker can be served by every other worker.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        value = self._get_local(key)
+        if value is not None:
+            CACHE_REQUESTS.labels('spoonacular', 'hit_local').inc()
+            return value
+
+        conn = get_db_connection()
+        if not conn:
+            CACHE_REQUESTS.labels('spoonacular', 'miss').inc()
+            return None
+        try:
+            cur = conn.cursor()
+            cur.execute('''SELECT payload, EXTRACT(EPOCH FROM expires_at - NOW())
+                           FROM api_response_cache
+                           WHERE cache_key = %s AND expires_at > NOW()''', (key,))
+            row = cur.fetchone()
+            cur.close()
+        except psycopg2.Error as e:
+            cache_log.warning(f"⚠️ Response cache lookup failed: {e}")
+            conn.rollback()
+            row = None
+        finally:
+            close_db_connection(conn)
+
+        if not row:
+            CACHE_REQUESTS.labels('spoonacular', 'miss').inc()
+            return None
+        CACHE_REQUESTS.labels('spoonacular', 'hit_shared').inc()
+        value, remaining = row
+        self._set_local(key, value, time.time() + float(remaining))
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        self._set_local(key, value, time.time() + ttl)
+
+        conn = get_db_connection()
+        if not conn:
+            return
+        try:
+            cur = conn.cursor()
+            cur.execute('''INSERT INTO api_response_cache (cache_key, payload, expires_at)
+                           VALUES (%s, %s, NOW() + %s * INTERVAL '1 second')
+                           ON CONFLICT (cache_key) DO UPDATE
+                           SET payload = EXCLUDED.payload, expires_at = EXCLUDED.expires_at''',
+                        (key, psycopg2.extras.Json(value), ttl))
+            conn.commit()
+            cur.close()
+        except psycopg2.Error as e:
+            cache_log.warning(f"⚠️ Response cache write failed: {e}")
+            conn.rollback()
+        finally:
+            close_db_connection(conn)
+
+    def ttl_left(self, key):
+        """Seconds before the shared entry expires; 0 when it is missing or expired"""
+        conn = get_db_connection()
+        if not conn:
+            return 0.0
+        try:
+            cur = conn.cursor()
+            cur.execute('''SELECT EXTRACT(EPOCH FROM expires_at - NOW())
+                           FROM api_response_cache WHERE cache_key = %s''', (key,))
+            row = cur.fetchone()
+            cur.close()
+        except psycopg2.Error as e:
+            cache_log.warning(f"⚠️ Response cache lookup failed: {e}")
+            conn.rollback()
+            row = None
+        finally:
+            close_db_connection(conn)
+        return max(float(row[0]), 0.0) if row else 0.0
+
+api_cache = ResponseCache(SPOONACULAR_CACHE_MAX_ENTRIES, SPOONACULAR_CACHE_TTL)
+
+# Page data cache and its invalidation bus
+#
+# Each worker keeps the rows behind the home page, recipe pages and /browse in
+# memory. A trigger on recipes (and recipe_similarity) NOTIFYs every change
+# on RECIPE_CACHE_CHANNEL when its transaction commits; a listener thread in
+# every worker, on every node, evicts the entries tagged with that recipe or
+# author plus all listings. The cache only serves while its listener is
+# connected, and is flushed whenever the listener (re)connects.
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 300))
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+RECIPE_CACHE_CHANNEL = 'recipe_cache'
+# Idle listeners run SELECT 1 this often, so a dropped connection is noticed
+CACHE_LISTENER_KEEPALIVE = 30
+
+class PageCache:
+    """Tagged in-process LRU for page data, invalidated by CacheInvalidationListener"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.live = False
+        # Bumped by every eviction, so a load that raced one is not stored
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if not self.live or self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._drop(key)
+                CACHE_REQUESTS.labels('pages', 'miss').inc()
+                return None
+            self._entries.move_to_end(key)
+        CACHE_REQUESTS.labels('pages', 'hit_local').inc()
+        return entry[2]
+
+    def set(self, key, value, tags, generation):
+        """Store value unless anything was evicted since generation was read"""
+        if not self.live or self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + self.ttl, frozenset(tags), value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags):
+        with self._lock:
+            self.generation += 1
+            keys = set().union(*(self._tags.get(tag, ()) for tag in tags))
+            for key in keys:
+                self._drop(key)
+        CACHE_INVALIDATIONS.labels('notify').inc(len(keys))
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+        CACHE_INVALIDATIONS.labels('flush').inc(dropped)
+
+def recipe_cache_tags(payload):
+    """Tags a change notification evicts: the recipe, its author and every listing"""
+    tags = ['listings']
+    if payload.get('recipe') is not None:
+        tags.append(f"recipe:{payload['recipe']}")
+    if payload.get('author') is not None:
+        tags.append(f"author:{payload['author']}")
+    return tags
+
+class CacheInvalidationListener:
+    """LISTENs on RECIPE_CACHE_CHANNEL over its own connection and evicts page_cache entries"""
+
+    def __init__(self, cache, channel):
+        self.cache = cache
+        self.channel = channel
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        """Start the listener thread in this process if it isn't running yet"""
+        if self._pid == os.getpid() or DATABASE_CONFIG is None or self.cache.ttl <= 0:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            # A forked worker inherits the parent's entries but not its listener
+            self.cache.live = False
+            self.cache.clear()
+            threading.Thread(target=self._run, name='cache-listener', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**DATABASE_CONFIG)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.channel)))
+                # Anything may have changed while nobody was listening
+                self.cache.clear()
+                self.cache.live = True
+                backoff = 1
+                cache_log.info("📡 Cache invalidation listener connected")
+                self._listen(conn)
+            except Exception as e:
+                cache_log.warning(f"⚠️ Cache invalidation listener lost its connection: {e}")
+            finally:
+                self.cache.live = False
+                self.cache.clear()
+                if conn is not None:
+                    conn.close()
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _listen(self, conn):
+        idle_since = time.monotonic()
+        while not self._stop.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                if time.monotonic() - idle_since >= CACHE_LISTENER_KEEPALIVE:
+                    with conn.cursor() as cur:
+                        cur.execute('SELECT 1')
+                    idle_since = time.monotonic()
+                continue
+            conn.poll()
+            idle_since = time.monotonic()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    payload = json.loads(notify.payload)
+                except ValueError:
+                    payload = {'flush': True}
+                if payload.get('flush'):
+                    self.cache.clear()
+                else:
+                    self.cache.invalidate(recipe_cache_tags(payload))
+
+page_cache = PageCache(PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_TTL)
+cache_listener = CacheInvalidationListener(page_cache, RECIPE_CACHE_CHANNEL)
+atexit.register(cache_listener.stop)
+
+def cached_page_data(key):
+    """(value or None, generation to pass to page_cache.set) for one page's data"""
+    cache_listener.ensure_running()
+    generation = page_cache.generation
+    return page_cache.get(key), generation
+
+def recipe_details_cache_key(recipe_id, level='full'):
+    # v2: payloads carry the 'sanitized' block added by sanitize_recipe_payload()
+    lean = '' if level == 'full' else 'lean:'
+    return f"information:v2:{lean}{int(recipe_id)}"
+
+def cached_recipe_details(recipe_id, level):
+    """Cached details servable at level (see cache_levels()), or None"""
+    for cached_level in cache_levels(level):
+        cached = api_cache.get(recipe_details_cache_key(recipe_id, cached_level))
+        if cached is not None:
+            return cached
+    return None
+
+def recipe_details_params(level):
+    # Nutrition is dropped once the budget is degraded; the page just hides that block
+    return {
+        'apiKey': SPOONACULAR_API_KEY,
+        'includeNutrition': level == 'full'
+    }
+
+def fetch_recipe_details_api(recipe_id, level='full'):
+    """Fetch recipe information from Spoonacular without touching the cache.
+
+    Returns a (recipe_data, quota_points) tuple; recipe_data is sanitized.
+    """
+    url = f"{SPOONACULAR_BASE_URL}/{recipe_id}/information"
+    params = recipe_details_params(level)
+    with spoonacular_call('information'):
+        response = http_session().get(url, params=params, timeout=10)
+    points = record_spoonacular_quota(response, 'information')
+    response.raise_for_status()
+    return sanitize_recipe_payload(response.json()), points
 
 def get_recipe_details_api(recipe_id):
     """Get detailed recipe information from Spoonacular API"""
+    level = quota_budget.level()
+    cached = cached_recipe_details(recipe_id, level)
+    if cached is not None:
+        return cached
+
     if not SPOONACULAR_API_KEY:
-        print("⚠️  Spoonacular API key not configured")
+        api_log.debug("⚠️  Spoonacular API key not configured")
         return None
-        
+
+    if level == 'cache_only':
+        SPOONACULAR_CALLS.labels('information', 'skipped').inc()
+        return None
+
     try:
-        url = f"{SPOONACULAR_BASE_URL}/{recipe_id}/information"
-        params = {
-            'apiKey': SPOONACULAR_API_KEY,
-            'includeNutrition': True
-        }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        recipe_data, _ = fetch_recipe_details_api(recipe_id, level)
     except requests.exceptions.RequestException as e:
-        print(f"Error getting recipe details: {e}")
+        api_log.error(f"Error getting recipe details: {e}")
         return None
 
+    api_cache.set(recipe_details_cache_key(recipe_id, level), recipe_data)
+    return recipe_data
+
+class PrefetchBatch:
+    """The fetches queued by one search: a cancel flag and how many are still to run"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        # The submitting request holds one until it has queued every fetch
+        self.pending = 1
+
+class RecipePrefetcher:
+    """Warm the response cache with details for freshly served search results.
+
+    Fetches run on a small background pool after the search page has been
+    sent. They are bounded three ways: a cap on pending jobs, a daily point
+    budget of their own, and a floor on the account-wide quota left, so
+    prefetching never spends quota that real page views need. A new search
+    cancels whatever is still pending for the same client.
+    """
+
+    def __init__(self, top_k, workers, max_pending, daily_points, min_quota_left):
+        self.top_k = top_k
+        self.daily_points = daily_points
+        self.min_quota_left = min_quota_left
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._batches = {}
+        self._budget_day = None
+        self._points_spent = 0.0
+        self._shutdown = threading.Event()
+
+    def _has_budget(self):
+        # Speculative fetches stop as soon as the shared budget is degraded
+        if quota_budget.level() != 'full':
+            return False
+        with self._lock:
+            # The UTC day, so this budget rolls over with QuotaBudget and Spoonacular's quota
+            today = datetime.now(timezone.utc).date()
+            if self._budget_day != today:
+                self._budget_day = today
+                self._points_spent = 0.0
+            if self._points_spent >= self.daily_points:
+                return False
+        quota_left = spoonacular_quota['left']
+        return quota_left is None or quota_left > self.min_quota_left
+
+    def _spend(self, points):
+        with self._lock:
+            self._points_spent += points
+
+    def _finish(self, client_key, batch):
+        # Forget a client once its last fetch is done, unless a newer search replaced the batch
+        with self._lock:
+            batch.pending -= 1
+            if batch.pending == 0 and self._batches.get(client_key) is batch:
+                del self._batches[client_key]
+
+    def submit(self, client_key, recipe_ids):
+        """Queue background fetches for the top-K results of a search"""
+        if self._shutdown.is_set() or not SPOONACULAR_API_KEY:
+            return
+
+        batch = PrefetchBatch()
+        with self._lock:
+            previous = self._batches.get(client_key)
+            self._batches[client_key] = batch
+        if previous:
+            previous.cancelled.set()
+
+        try:
+            for recipe_id in recipe_ids[:self.top_k]:
+                if not self._slots.acquire(blocking=False):
+                    api_log.info("⚠️ Prefetch queue full - skipping remaining results")
+                    break
+                with self._lock:
+                    batch.pending += 1
+                self._executor.submit(self._run, recipe_id, client_key, batch)
+        finally:
+            self._finish(client_key, batch)
+
+    def _run(self, recipe_id, client_key, batch):
+        try:
+            if batch.cancelled.is_set() or self._shutdown.is_set():
+                return
+            key = recipe_details_cache_key(recipe_id)
+            if api_cache.get(key) is not None:
+                return
+            if not self._has_budget():
+                return
+            recipe_data, points = fetch_recipe_details_api(recipe_id)
+            self._spend(points)
+            api_cache.set(key, recipe_data)
+        except requests.exceptions.RequestException as e:
+            api_log.warning(f"⚠️ Prefetch of recipe {recipe_id} failed: {e}")
+        except Exception as e:
+            api_log.exception(f"❌ Unexpected prefetch error for recipe {recipe_id}: {e}")
+        finally:
+            self._slots.release()
+            self._finish(client_key, batch)
+
+    def shutdown(self):
+        self._shutdown.set()
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for batch in batches:
+            batch.cancelled.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+recipe_prefetcher = None
+if SPOONACULAR_PREFETCH_ENABLED:
+    recipe_prefetcher = RecipePrefetcher(
+        SPOONACULAR_PREFETCH_TOP_K,
+        SPOONACULAR_PREFETCH_WORKERS,
+        SPOONACULAR_PREFETCH_MAX_PENDING,
+        SPOONACULAR_PREFETCH_DAILY_POINTS,
+        SPOONACULAR_PREFETCH_MIN_QUOTA_LEFT,
+    )
+    atexit.register(recipe_prefetcher.shutdown)
+
+# Search log
+#
+# Searches that reach Spoonacular are counted per day in memory and added to
+# search_query_counts by a background thread, so the cache warmer can rank
+# what people actually look for without a write per request.
+class SearchLog:
+    """Per-process search counter, flushed to search_query_counts"""
+
+    # Distinct (kind, query) pairs held between flushes; later ones are dropped
+    MAX_PENDING = 5000
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pid = None
+
+    def ensure_running(self):
+        """Start the flush thread in this process if it isn't running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._pending = {}
+            threading.Thread(target=self._run, name='search-log', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                api_log.exception(f"❌ Search log flush failed: {e}")
+
+    def record(self, kind, query):
+        query = normalize_query(query)
+        if not query:
+            return
+        self.ensure_running()
+        key = (datetime.now(timezone.utc).date(), kind, query)
+        with self._lock:
+            if key in self._pending or len(self._pending) < self.MAX_PENDING:
+                self._pending[key] = self._pending.get(key, 0) + 1
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        conn = get_db_connection()
+        if not conn:
+            self._restore(pending)
+            return
+        try:
+            cur = conn.cursor()
+            psycopg2.extras.execute_values(cur, '''
+                INSERT INTO search_query_counts (day, kind, query, searches) VALUES %s
+                ON CONFLICT (day, kind, query) DO UPDATE
+                SET searches = search_query_counts.searches + EXCLUDED.searches''',
+                [(*key, count) for key, count in pending.items()])
+            conn.commit()
+            cur.close()
+        except psycopg2.Error as e:
+            api_log.warning(f"⚠️ Search log flush failed: {e}")
+            conn.rollback()
+            self._restore(pending)
+        finally:
+            close_db_connection(conn)
+
+    def _restore(self, pending):
+        with self._lock:
+            for key, count in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + count
+
+    @staticmethod
+    def popular(conn, limit, days):
+        """Most searched (kind, query) pairs over the last `days` days"""
+        with conn.cursor() as cur:
+            cur.execute('''SELECT kind, query FROM search_query_counts
+                           WHERE day > CURRENT_DATE - %s
+                           GROUP BY kind, query
+                           ORDER BY SUM(searches) DESC, query
+                           LIMIT %s''', (days, limit))
+            return cur.fetchall()
+
+    @staticmethod
+    def prune(conn, days):
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM search_query_counts WHERE day <= CURRENT_DATE - %s', (days,))
+            return cur.rowcount
+
+search_log = SearchLog(SEARCH_LOG_FLUSH_INTERVAL)
+
+# Cache warmer
+#
+# Keeps the most common searches, and the detail pages of their top results,
+# in api_cache so no visitor pays for a cold Spoonacular call after a deploy
+# or an expiry. Each pass refetches entries that are missing or expire within
+# CACHE_WARM_REFRESH_BEFORE seconds; with CACHE_WARM_INTERVAL shorter than
+# that window, a warmed entry is replaced before it ever lapses.
+
+# Serialises passes across workers, nodes and the CLI; held for the whole pass
+CACHE_WARMER_LOCK = 7_048_001
+
+class CacheWarmer:
+    """Refreshes popular Spoonacular responses in the shared cache ahead of visitors.
+
+    Targets are the configured categories (as search-page queries) plus the
+    most searched queries from search_query_counts. JSON-proxy searches get
+    their images mirrored to S3 like a live request would, reusing the images
+    of the entry being replaced. A pass spends at most max_points quota points
+    and stops as soon as the shared budget leaves 'full' or the account has
+    min_quota_left points or fewer, so warming never eats into quota that
+    real page views need.
+    """
+
+    def __init__(self, interval, refresh_before, top_queries, categories, details, max_points, min_quota_left):
+        self.interval = interval
+        self.refresh_before = refresh_before
+        self.top_queries = top_queries
+        self.categories = categories
+        self.details = details
+        self.max_points = max_points
+        self.min_quota_left = min_quota_left
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        """Start the warmer thread in this process if it isn't running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(target=self._run, name='cache-warmer', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # First pass right away: a fresh deploy is when the cache is coldest
+        while not self._stop.is_set():
+            try:
+                self.run_pass()
+            except Exception as e:
+                cache_log.exception(f"❌ Cache warm pass failed: {e}")
+            self._stop.wait(self.interval)
+
+    def run_pass(self, dry_run=False):
+        """One pass over every target; outcome counts, or None if another pass holds the lock"""
+        if not SPOONACULAR_API_KEY or not DATABASE_CONFIG:
+            return None
+        # The lock lives on a connection of its own, outside the pool: a pass is
+        # mostly HTTP and S3 and must not keep a pooled connection checked out,
+        # and closing this one releases the lock whatever happened
+        try:
+            conn = psycopg2.connect(**DATABASE_CONFIG)
+        except psycopg2.Error as e:
+            cache_log.warning(f"⚠️ Cache warm pass could not connect: {e}")
+            return None
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT pg_try_advisory_lock(%s)', (CACHE_WARMER_LOCK,))
+                if not cur.fetchone()[0]:
+                    return None
+                try:
+                    targets = self.targets(conn)
+                    if not dry_run:
+                        SearchLog.prune(conn, SEARCH_LOG_DAYS)
+                    conn.commit()
+                    return self._warm(targets, dry_run)
+                finally:
+                    # An aborted transaction would refuse the unlock
+                    conn.rollback()
+                    cur.execute('SELECT pg_advisory_unlock(%s)', (CACHE_WARMER_LOCK,))
+                    conn.commit()
+        except psycopg2.Error as e:
+            cache_log.warning(f"⚠️ Cache warm pass failed: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def targets(self, conn):
+        """(kind, query) pairs to keep warm: categories first, then popular searches"""
+        targets = [('complexSearch', normalize_query(name)) for name in self.categories]
+        for target in SearchLog.popular(conn, self.top_queries, SEARCH_LOG_DAYS):
+            if target not in targets:
+                targets.append(target)
+        return targets
+
+    def _has_budget(self, spent):
+        if spent >= self.max_points or quota_budget.level() != 'full':
+            return False
+        quota_left = spoonacular_quota['left']
+        return quota_left is None or quota_left > self.min_quota_left
+
+    def _warm(self, targets, dry_run):
+        outcomes = defaultdict(int)
+        spent = 0.0
+        for kind, query in targets:
+            # Same sizes as /api/search and search_recipes_api(), so the keys match
+            number = API_SEARCH_RESULTS if kind == 'api-search' else 12
+            key = search_cache_key(kind, query, number)
+            results = None
+            if self.refresh_before < api_cache.ttl_left(key):
+                outcomes['search_fresh'] += 1
+                cached = api_cache.get(key)
+                results = cached if kind == 'api-search' else (cached or {}).get('results')
+            elif dry_run:
+                outcomes['search_stale'] += 1
+            elif not self._has_budget(spent):
+                outcomes['search_skipped'] += 1
+            else:
+                try:
+                    if kind == 'api-search':
+                        previous = api_cache.get(key) or []
+                        mirrored = {res.get('id'): res.get('image') for res in previous
+                                    if s3_key_from_url(res.get('image'))}
+                        results, points = fetch_api_search(query, 'full', mirrored)
+                        api_cache.set(key, results, ttl=SPOONACULAR_SEARCH_CACHE_TTL)
+                    else:
+                        search_data, points = fetch_search_api(query, number, 'full')
+                        api_cache.set(key, search_data, ttl=SPOONACULAR_SEARCH_CACHE_TTL)
+                        results = search_data.get('results')
+                    spent += points
+                    outcomes['search_refreshed'] += 1
+                except requests.exceptions.RequestException as e:
+                    cache_log.warning(f"⚠️ Could not warm search {query!r}: {e}")
+                    outcomes['search_failed'] += 1
+            spent += self._warm_details(results or [], dry_run, spent, outcomes)
+        for outcome, count in outcomes.items():
+            entry, result = outcome.split('_')
+            CACHE_WARMS.labels(entry, result).inc(count)
+        cache_log.info('cache_warm_pass', extra={'targets': len(targets), 'points': round(spent, 1),
+                                                 **outcomes})
+        return dict(outcomes)
+
+    def _warm_details(self, results, dry_run, spent, outcomes):
+        """Refresh the detail entries of a search's top results; returns the points spent"""
+        points_spent = 0.0
+        for res in results[:self.details]:
+            recipe_id = res.get('id')
+            if recipe_id is None:
+                continue
+            key = recipe_details_cache_key(recipe_id)
+            if self.refresh_before < api_cache.ttl_left(key):
+                outcomes['details_fresh'] += 1
+            elif dry_run:
+                outcomes['details_stale'] += 1
+            elif not self._has_budget(spent + points_spent):
+                outcomes['details_skipped'] += 1
+            else:
+                try:
+                    recipe_data, points = fetch_recipe_details_api(recipe_id)
+                    api_cache.set(key, recipe_data)
+                    points_spent += points
+                    outcomes['details_refreshed'] += 1
+                except requests.exceptions.RequestException as e:
+                    cache_log.warning(f"⚠️ Could not warm recipe {recipe_id}: {e}")
+                    outcomes['details_failed'] += 1
+        return points_spent
+
+cache_warmer = CacheWarmer(CACHE_WARM_INTERVAL, CACHE_WARM_REFRESH_BEFORE, CACHE_WARM_TOP_QUERIES,
+                           CACHE_WARM_CATEGORIES, CACHE_WARM_DETAILS, CACHE_WARM_MAX_POINTS,
+                           CACHE_WARM_MIN_QUOTA_LEFT)
+
 def format_ingredients(ingredients_list):
     """Format ingredients list for database storage with HTML Cleaning"""
     if not ingredients_list:
@@ -598,50 +2395,438 @@ def clean_html_filter(content):
     """Template filter to clean HTML content"""
     return clean_html_content(content)
 
-#Health check endpoint for AWS load balancers
-@app.route('/health')
-def health_check():
-    """Health check endpoint for AWS load balancers"""
-    try: 
+# Request timing hooks
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.spans = []
+
+def template_render_started(sender, template, context, **extra):
+    if has_request_context():
+        g.render_started = time.perf_counter()
+
+def template_render_finished(sender, template, context, **extra):
+    if has_request_context() and 'spans' in g and 'render_started' in g:
+        g.spans.append(('render', time.perf_counter() - g.pop('render_started')))
+
+before_render_template.connect(template_render_started, app)
+template_rendered.connect(template_render_finished, app)
+
+def summarize_spans(spans):
+    """Fold a request's spans into {name: (total_seconds, count)}"""
+    totals = {}
+    for name, seconds in spans:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + seconds, count + 1)
+    return totals
+
+@app.after_request
+def add_server_timing(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    duration_ms = (time.perf_counter() - started) * 1000
+    totals = summarize_spans(g.spans)
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = str(response.status_code)
+    HTTP_REQUESTS.labels(route, request.method, status).inc()
+    HTTP_LATENCY.labels(route, request.method, status).observe(duration_ms / 1000)
+
+    if SERVER_TIMING_ENABLED:
+        metrics = [f'{name};desc="{count}x";dur={total * 1000:.1f}'
+                   for name, (total, count) in totals.items()]
+        metrics.append(f'total;dur={duration_ms:.1f}')
+        response.headers['Server-Timing'] = ', '.join(metrics)
+
+    if duration_ms >= SLOW_REQUEST_MS:
+        http_log.warning('slow_request', extra={
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'spans': {name: {'ms': round(total * 1000, 1), 'count': count}
+                      for name, (total, count) in totals.items()},
+        })
+    return response
+
+# Memory profiling
+#
+# Opt-in: with MEMORY_PROFILE_SAMPLE_RATE above 0, that fraction of requests
+# runs with tracemalloc tracing from the start of the request to its teardown;
+# the rest run untraced. tracemalloc is process-wide, so a trace only belongs
+# to one request in a sync gunicorn worker with a single thread, and sampling
+# stays off under gevent or GUNICORN_THREADS above 1. Allocations made by the
+# app's background threads (prefetch, image, similarity, cache listener and
+# warmer) are dropped from the net figure and the sites where their stacks
+# show it, but still count towards the peak. Each worker folds its samples
+# into per-route totals and the top allocation sites, and writes them to
+# MEMORY_PROFILE_DIR. /admin/memory and `flask memory-report` merge every
+# worker's file; gunicorn.conf.py removes a worker's file when it exits.
+MEMORY_PROFILE_SAMPLE_RATE = float(os.environ.get('MEMORY_PROFILE_SAMPLE_RATE', 0))
+MEMORY_PROFILE_FRAMES = int(os.environ.get('MEMORY_PROFILE_FRAMES', 16))
+MEMORY_PROFILE_DIR = os.environ.get('MEMORY_PROFILE_DIR',
+                                    os.path.join(tempfile.gettempdir(), 'recipe-app-memory'))
+MEMORY_PROFILE_WRITE_INTERVAL = float(os.environ.get('MEMORY_PROFILE_WRITE_INTERVAL', 10))
+MEMORY_PROFILE_ISOLATED = not GREEN_MODE and int(os.environ.get('GUNICORN_THREADS', 1)) == 1
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class MemoryProfile:
+    """Per-route allocation totals and top sites for this worker's sampled requests"""
+
+    # Sites kept per sample, and overall before the smallest are dropped
+    SITES_PER_SAMPLE = 10
+    MAX_SITES = 500
+
+    # A trace with a frame in these files was allocated off the request's thread
+    BACKGROUND_FILES = (threading.__file__, sys.modules[ThreadPoolExecutor.__module__].__file__)
+
+    def __init__(self, sample_rate, frames, directory, write_interval):
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.directory = directory
+        self.write_interval = write_interval
+        self._tracing = threading.Lock()
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._sites = {}
+        self._written_at = 0.0
+        self._pid = None
+
+    def start(self):
+        """Begin tracing this request if it is sampled; True if it is"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        # Someone else's tracemalloc session (PYTHONTRACEMALLOC, a debugger) is left alone
+        if tracemalloc.is_tracing() or not self._tracing.acquire(blocking=False):
+            return False
+        tracemalloc.start(self.frames)
+        return True
+
+    def finish(self, route):
+        """Stop tracing and fold the request into the totals"""
+        try:
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)] +
+                [tracemalloc.Filter(False, filename, all_frames=True) for filename in self.BACKGROUND_FILES])
+        finally:
+            tracemalloc.stop()
+            self._tracing.release()
+        net = 0
+        sites = defaultdict(lambda: [0, 0])
+        for stat in snapshot.statistics('traceback'):
+            net += stat.size
+            totals = sites[self.site(stat.traceback)]
+            totals[0] += stat.size
+            totals[1] += stat.count
+        top = sorted(sites.items(), key=lambda item: -item[1][0])[:self.SITES_PER_SAMPLE]
+        self.record(route, peak, net, [(site, size, count) for site, (size, count) in top])
+
+    @staticmethod
+    def site(traceback):
+        """'file:line' of the allocation, plus the innermost frame in this project if that differs"""
+        # Frames run oldest to most recent
+        allocated = f"{traceback[-1].filename}:{traceback[-1].lineno}"
+        for position, frame in enumerate(reversed(traceback)):
+            if frame.filename.startswith(PROJECT_DIR) and 'site-packages' not in frame.filename:
+                caller = f"{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno}"
+                return caller if position == 0 else f"{allocated} ← {caller}"
+        return allocated
+
+    def record(self, route, peak, net, sites):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: the master's samples are not ours
+                self._pid = os.getpid()
+                self._routes, self._sites = {}, {}
+            totals = self._routes.setdefault(route, {'samples': 0, 'peak_total': 0, 'peak_max': 0,
+                                                     'net_total': 0, 'net_max': 0})
+            totals['samples'] += 1
+            totals['peak_total'] += peak
+            totals['peak_max'] = max(totals['peak_max'], peak)
+            totals['net_total'] += net
+            totals['net_max'] = max(totals['net_max'], net)
+            for site, size, count in sites:
+                key = f"{route} {site}"
+                entry = self._sites.setdefault(key, {'route': route, 'site': site, 'size': 0, 'count': 0,
+                                                     'samples': 0})
+                entry['size'] += size
+                entry['count'] += count
+                entry['samples'] += 1
+            if len(self._sites) > self.MAX_SITES:
+                kept = sorted(self._sites.items(), key=lambda item: -item[1]['size'])[:self.MAX_SITES // 2]
+                self._sites = dict(kept)
+            due = time.monotonic() - self._written_at >= self.write_interval
+        if due:
+            self.write()
+
+    def state(self):
+        try:
+            import resource
+            max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            max_rss_kb = None
+        with self._lock:
+            return {'pid': os.getpid(), 'written_at': time.time(), 'max_rss_kb': max_rss_kb,
+                    'routes': copy.deepcopy(self._routes), 'sites': list(copy.deepcopy(self._sites).values())}
+
+    def write(self):
+        """Replace this worker's file in the profile directory"""
+        self._written_at = time.monotonic()
+        if self._pid != os.getpid():
+            return
+        state = self.state()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"memory-{state['pid']}.json")
+            with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False, suffix='.tmp') as f:
+                json.dump(state, f)
+            os.replace(f.name, path)
+        except OSError as e:
+            log.warning(f"⚠️ Could not write memory profile: {e}")
+
+def merge_memory_profiles(directory, top=20):
+    """Every worker's file folded into one report: routes by peak, then the largest sites"""
+    workers, routes, sites = [], {}, {}
+    paths = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    for name in paths:
+        if not (name.startswith('memory-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        workers.append({'pid': state['pid'], 'max_rss_kb': state['max_rss_kb'],
+                        'written_at': datetime.fromtimestamp(state['written_at'], timezone.utc).isoformat()})
+        for route, totals in state['routes'].items():
+            merged = routes.setdefault(route, {'samples': 0, 'peak_total': 0, 'peak_max': 0,
+                                               'net_total': 0, 'net_max': 0})
+            for key in ('samples', 'peak_total', 'net_total'):
+                merged[key] += totals[key]
+            for key in ('peak_max', 'net_max'):
+                merged[key] = max(merged[key], totals[key])
+        for entry in state['sites']:
+            merged = sites.setdefault((entry['route'], entry['site']), dict(entry, size=0, count=0, samples=0))
+            for key in ('size', 'count', 'samples'):
+                merged[key] += entry[key]
+
+    route_rows = [{'route': route, 'samples': t['samples'],
+                   'peak_avg': t['peak_total'] // t['samples'], 'peak_max': t['peak_max'],
+                   'net_avg': t['net_total'] // t['samples'], 'net_max': t['net_max']}
+                  for route, t in routes.items()]
+    route_rows.sort(key=lambda row: -row['peak_avg'])
+    samples = {route: t['samples'] for route, t in routes.items()}
+    site_rows = [dict(entry, size_per_request=entry['size'] // samples[entry['route']])
+                 for entry in sites.values()]
+    site_rows.sort(key=lambda row: -row['size_per_request'])
+    return {'sample_rate': MEMORY_PROFILE_SAMPLE_RATE, 'workers': workers,
+            'routes': route_rows, 'sites': site_rows[:top]}
+
+if MEMORY_PROFILE_SAMPLE_RATE > 0 and not MEMORY_PROFILE_ISOLATED:
+    log.warning("⚠️ Memory profiling needs sync workers with GUNICORN_THREADS=1; "
+                "concurrent requests would share its traces, so it stays off")
+    MEMORY_PROFILE_SAMPLE_RATE = 0
+memory_profile = MemoryProfile(MEMORY_PROFILE_SAMPLE_RATE, MEMORY_PROFILE_FRAMES, MEMORY_PROFILE_DIR,
+                               MEMORY_PROFILE_WRITE_INTERVAL)
+
+@app.before_request
+def start_memory_profile():
+    if memory_profile.sample_rate > 0:
+        g.memory_profiled = memory_profile.start()
+
+@app.teardown_request
+def finish_memory_profile(exc):
+    if g.pop('memory_profiled', False):
+        memory_profile.finish(request.url_rule.rule if request.url_rule else 'unmatched')
+
+def bearer_authorized(token):
+    """Constant-time check of the Authorization header against Bearer token"""
+    # As bytes: compare_digest rejects non-ASCII strings, which any client can send
+    return secrets.compare_digest(request.headers.get('Authorization', '').encode(), f"Bearer {token}".encode())
+
+def admin_authorized():
+    """Bearer ADMIN_TOKEN; admin endpoints stay closed when no token is configured"""
+    return bool(ADMIN_TOKEN) and bearer_authorized(ADMIN_TOKEN)
+
+@app.route('/admin/memory')
+def admin_memory():
+    """Sampled per-route memory use, merged across every worker's profile file"""
+    if not admin_authorized():
+        return jsonify({'error': 'unauthorized'}), 401
+    # Include this worker's samples since its last write
+    memory_profile.write()
+    top = min(request.args.get('top', 20, type=int), MemoryProfile.MAX_SITES)
+    return jsonify(merge_memory_profiles(MEMORY_PROFILE_DIR, top))
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint, merged across gunicorn workers"""
+    if not METRICS_AVAILABLE:
+        return jsonify({'error': 'prometheus_client is not installed'}), 501
+    
+    if METRICS_TOKEN and not bearer_authorized(METRICS_TOKEN):
+        return jsonify({'error': 'unauthorized'}), 401
+    
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    
+    response = make_response(prometheus_client.generate_latest(registry))
+    response.headers['Content-Type'] = prometheus_client.CONTENT_TYPE_LATEST
+    return response
+
+# Health checks
+#
+# Probes are answered from the last result of a background checker instead
+# of touching the database per request. /livez only says the process is up;
+# /readyz (and the older /health) report the checker's state and fail when
+# a required check is unhealthy or the state is older than HEALTH_MAX_STALENESS.
+HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', 10))
+HEALTH_MAX_STALENESS = float(os.environ.get('HEALTH_MAX_STALENESS', 30))
+HEALTH_REQUIRED_CHECKS = [name.strip() for name in os.environ.get('HEALTH_REQUIRED_CHECKS', 'database').split(',')
+                          if name.strip()]
+HEALTH_MIN_QUOTA_LEFT = float(os.environ.get('HEALTH_MIN_QUOTA_LEFT', 1))
+APP_VERSION = '1.0.0'
+
+class HealthMonitor:
+    """Refreshes database, S3 and Spoonacular status on a background thread.
+
+    Results are published as one immutable snapshot (with its JSON body
+    pre-rendered), so a probe only reads an attribute and compares a clock.
+    """
+
+    def __init__(self, interval, max_staleness, required):
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.required = required
+        self._snapshot = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        """Start the checker thread in this process if it isn't running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(target=self._run, name='health-monitor', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                log.exception(f"❌ Health check failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _check_database(self):
         conn = get_db_connection()
-        if conn:
+        if not conn:
+            return 'unhealthy', None
+        try:
             cur = conn.cursor()
             cur.execute('SELECT 1')
-            result = cur.fetchone()
+            cur.fetchone()
             cur.close()
+            return 'healthy', None
+        except psycopg2.Error as e:
+            conn.rollback()
+            return 'unhealthy', str(e)
+        finally:
             close_db_connection(conn)
-            
-            db_status = "healthy" if result else "unhealthy"
-        else: 
-            db_status = "unhealthy"
-            
-        #check S3 connection 
-        s3_status = "healthy" if s3_client else "not_configured"
-        
-        overall_status = "healthy" if db_status == "healthy" and s3_status == "healthy" else "unhealthy"
-        
-        response = {
-            'status': overall_status, 
-            'database': db_status,
-            's3': s3_status,
-            'timestamp': datetime.now(). isoformat(),
-            'version': '1.0.0'
+
+    def _check_s3(self):
+        if not S3_CONFIGURED:
+            return 'not_configured', None
+        try:
+            get_s3_client().head_bucket(Bucket=AWS_S3_BUCKET)
+            return 'healthy', None
+        except Exception as e:
+            return 'unhealthy', str(e)
+
+    def _check_spoonacular(self):
+        # Read from the quota headers of recent responses; a probe must not spend quota
+        if not SPOONACULAR_API_KEY:
+            return 'not_configured', None
+        quota_left = spoonacular_quota['left']
+        if quota_left is not None and quota_left < HEALTH_MIN_QUOTA_LEFT:
+            return 'quota_exhausted', f"{quota_left:g} points left"
+        return 'healthy', None
+
+    def refresh(self):
+        checks = {}
+        for name, check in (('database', self._check_database),
+                            ('s3', self._check_s3),
+                            ('spoonacular', self._check_spoonacular)):
+            started = time.perf_counter()
+            status, error = check()
+            checks[name] = {'status': status, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+            if error:
+                checks[name]['error'] = error
+
+        healthy = all(checks.get(name, {}).get('status') in ('healthy', 'not_configured')
+                      for name in self.required)
+        body = {
+            'status': 'healthy' if healthy else 'unhealthy',
+            'checks': checks,
+            'quota_left': spoonacular_quota['left'],
+            'checked_at': datetime.now().isoformat(),
+            'version': APP_VERSION,
         }
-        
-        status_code = 200 if overall_status == "healthy" else 503 
-        return jsonify(response), status_code
-    
-    except Exception as e: 
-        return jsonify({
-            'status': 'unhealthy', 
-            'error': str(e),
-            'timestamp': datetime.now().isoformat()
-        }), 503
+        # Keep the keys the old /health response had
+        body.update({name: check['status'] for name, check in checks.items()}, timestamp=body['checked_at'])
+        self._snapshot = (time.monotonic(), healthy, json.dumps(body))
+
+    def readiness(self):
+        """(ready, json_body) from the last snapshot"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return False, '{"status": "starting"}'
+        checked_at, healthy, body = snapshot
+        age = time.monotonic() - checked_at
+        if age > self.max_staleness:
+            return False, json.dumps({'status': 'stale', 'age_s': round(age, 1)})
+        return healthy, body
+
+health_monitor = HealthMonitor(HEALTH_CHECK_INTERVAL, HEALTH_MAX_STALENESS, HEALTH_REQUIRED_CHECKS)
+
+@app.route('/livez')
+def livez():
+    """Liveness probe: the process is serving requests; no I/O"""
+    return app.response_class('ok\n', mimetype='text/plain')
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe served from the background checker's last result"""
+    health_monitor.ensure_running()
+    ready, body = health_monitor.readiness()
+    return app.response_class(body, status=200 if ready else 503, mimetype='application/json')
+
+# Health check endpoint for AWS load balancers (same answer as /readyz)
+app.add_url_rule('/health', 'health_check', readyz)
 
 # Routes
 @app.route('/')
 def home():
-    print("🏠 Home route accessed")
+    http_log.debug("🏠 Home route accessed")
+    
+    featured_recipes, generation = cached_page_data('home:featured')
+    if featured_recipes is not None:
+        return render_template('home.html', featured_recipes=featured_recipes)
     
     conn = get_db_connection()
     if not conn:
@@ -649,204 +2834,822 @@ def home():
         return render_template('home.html', featured_recipes=[])
     
     try:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute('''SELECT r.*, u.email 
-                    FROM recipes r
-                    LEFT JOIN users u ON r.author_id = u.id 
-                    ORDER BY r.created_at DESC 
-                    LIMIT 4''')
-        featured_recipes = cur.fetchall()
-        print(f"✅ Found {len(featured_recipes)} featured recipes")
+        featured_recipes = [with_derived_fields(r) for r in repository.featured_cards(conn, limit=4)]
+        http_log.debug("✅ Found %s featured recipes", len(featured_recipes))
+        page_cache.set('home:featured', featured_recipes, ('listings',), generation)
         
     except psycopg2.Error as e:
-        print(f"❌ Error fetching recipes: {e}")
+        db_log.error(f"❌ Error fetching recipes: {e}")
         featured_recipes = []
     finally:
-        cur.close()
         close_db_connection(conn)
     
     return render_template('home.html', featured_recipes=featured_recipes)
 
+LOCAL_SEARCH_LIMIT = int(os.environ.get('LOCAL_SEARCH_LIMIT', 48))
+
+# Local filters over recipes.details; values are Spoonacular's, lowercased
+DIET_FILTERS = ('vegetarian', 'vegan', 'gluten free', 'dairy free', 'ketogenic', 'pescatarian',
+                'paleolithic', 'primal', 'whole 30')
+CUISINE_FILTERS = ('african', 'american', 'british', 'cajun', 'caribbean', 'chinese', 'eastern european',
+                   'european', 'french', 'german', 'greek', 'indian', 'irish', 'italian', 'japanese',
+                   'jewish', 'korean', 'latin american', 'mediterranean', 'mexican', 'middle eastern',
+                   'nordic', 'southern', 'spanish', 'thai', 'vietnamese')
+DISH_TYPE_FILTERS = ('breakfast', 'lunch', 'dinner', 'main course', 'side dish', 'dessert', 'appetizer',
+                     'salad', 'bread', 'soup', 'beverage', 'sauce', 'snack')
+
+def parse_recipe_filters(args):
+    """Search filters from the query string; unknown values are ignored"""
+    filters = {}
+    for arg, choices, key in (('diet', DIET_FILTERS, 'diets'),
+                              ('cuisine', CUISINE_FILTERS, 'cuisines'),
+                              ('type', DISH_TYPE_FILTERS, 'dishTypes')):
+        value = args.get(arg, '').strip().lower()
+        if value in choices:
+            filters[key] = value
+    for arg in ('max_time', 'max_calories'):
+        value = args.get(arg, type=int)
+        if value and value > 0:
+            filters[arg] = value
+    return filters
+
+def recipe_form_details(form, existing=None):
+    """details document for a recipe form's category and diet checkboxes.
+
+    Values the form doesn't offer (Spoonacular's own dish types and diets on
+    a saved recipe) are kept as they are.
+    """
+    details = dict(existing or {})
+    kept_types = [t for t in details.get('dishTypes') or [] if t not in DISH_TYPE_FILTERS]
+    kept_diets = [d for d in details.get('diets') or [] if d not in DIET_FILTERS]
+    details['dishTypes'] = sorted(set(kept_types + [t for t in form.getlist('categories') if t in DISH_TYPE_FILTERS]))
+    details['diets'] = sorted(set(kept_diets + [d for d in form.getlist('diets') if d in DIET_FILTERS]))
+    return details
+
+def render_recipe_form(template, **context):
+    return render_template(template, dish_type_filters=DISH_TYPE_FILTERS, diet_filters=DIET_FILTERS, **context)
+
+def search_local_recipes(query, filters=None):
+    """Search saved recipes whose title or description matches the query"""
+    conn = get_db_connection()
+    if not conn:
+        return []
+    try:
+        return [with_derived_fields(r) for r in repository.search_cards(conn, query, LOCAL_SEARCH_LIMIT, filters)]
+    except psycopg2.Error as e:
+        db_log.error(f"Error searching local recipes: {e}")
+        return []
+    finally:
+        close_db_connection(conn)
+
+def schedule_prefetch(response, api_results):
+    """Warm detail pages for the top results once the page has been sent"""
+    if recipe_prefetcher and api_results:
+        client_key = session.get('user_id') or request.remote_addr
+        recipe_ids = [r['id'] for r in api_results if r.get('id')]
+        response.call_on_close(lambda: recipe_prefetcher.submit(client_key, recipe_ids))
+    return response
+
 @app.route('/search')
 def search():
     query = request.args.get('q', '')
+    filters = parse_recipe_filters(request.args)
     search_results = {'local': [], 'api': []}
     
-    if query:
+    if query or filters:
         # Search in local database
-        conn = get_db_connection()
-        if conn:
-            try:
-                cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-                cur.execute('''SELECT r.*, u.email 
-                               FROM recipes r
-                               LEFT JOIN users u ON r.author_id = u.id 
-                               WHERE r.title ILIKE %s OR r.description ILIKE %s
-                               ORDER BY r.created_at DESC''', 
-                            (f'%{query}%', f'%{query}%'))
-                search_results['local'] = cur.fetchall()
-            except psycopg2.Error as e:
-                print(f"Error searching local recipes: {e}")
-            finally:
-                cur.close()
-                close_db_connection(conn)
+        search_results['local'] = search_local_recipes(query, filters)
         
-        # Search using Spoonacular API
+    if query and not filters:
+        # Search using Spoonacular API; filtered searches stay local
+        search_log.record('complexSearch', query)
         api_results = search_recipes_api(query)
         if api_results:
             search_results['api'] = api_results['results']
+
+    return render_search(query, filters, search_results)
+
+def render_search(query, filters, search_results):
+    response = make_response(render_template('search.html', query=query, filters=filters,
+                                             search_results=search_results, api_level=quota_budget.level(),
+                                             diet_filters=DIET_FILTERS, cuisine_filters=CUISINE_FILTERS,
+                                             dish_type_filters=DISH_TYPE_FILTERS))
+    return schedule_prefetch(response, search_results['api'])
+
+BROWSE_PAGE_SIZE = int(os.environ.get('BROWSE_PAGE_SIZE', 24))
+
+# Similar recipes
+#
+# `flask rebuild-similar-recipes` fits the TF-IDF model and precomputes every
+# recipe's neighbours; creates, edits and saves then slot single recipes into
+# the stored index in the background. Detail pages only read the stored list.
+SIMILAR_RECIPES_K = int(os.environ.get('SIMILAR_RECIPES_K', 12))
+SIMILAR_RECIPES_SHOWN = int(os.environ.get('SIMILAR_RECIPES_SHOWN', 4))
+SIMILAR_MIN_SCORE = float(os.environ.get('SIMILAR_MIN_SCORE', 0.1))
+SIMILARITY_MAX_TERMS = int(os.environ.get('SIMILARITY_MAX_TERMS', 2048))
+
+_similarity_executor = None
+_similarity_executor_pid = None
+_similarity_executor_lock = threading.Lock()
+
+def similarity_terms(title, ingredient_list, raw_ingredients):
+    if ingredient_list is None:
+        ingredient_list = split_recipe_lines(raw_ingredients, INGREDIENT_MARKER)
+    return similarity.recipe_terms(title, ingredient_list)
+
+def rebuild_similarity_index(conn, k=SIMILAR_RECIPES_K, max_terms=SIMILARITY_MAX_TERMS):
+    """Refit the model and recompute every neighbour list; returns (recipes, terms)"""
+    import numpy as np
+
+    # Two streamed passes over recipes: document frequencies, then the vectors
+    model = similarity.TfidfModel.fit((similarity_terms(*row[1:]) for row in repository.similarity_documents(conn)),
+                                      max_terms=max_terms)
+    ids, vectors = [], []
+    for row in repository.similarity_documents(conn):
+        ids.append(row[0])
+        vectors.append(model.transform(similarity_terms(*row[1:])))
+    stored = similarity.SparseRows(vectors)
+    del vectors
+
+    # Neighbours go into fixed-size arrays first, so the index lock is only held while writing
+    neighbors = np.full((len(ids), k), -1, dtype=np.int64)
+    scores = np.zeros((len(ids), k), dtype=np.float32)
+    position = 0
+    for batch_neighbors, batch_scores in similarity.all_neighbors(stored, len(model.vocabulary), k):
+        width = batch_neighbors.shape[1]
+        neighbors[position:position + len(batch_neighbors), :width] = batch_neighbors
+        scores[position:position + len(batch_neighbors), :width] = batch_scores
+        position += len(batch_neighbors)
+
+    def rows():
+        for position, recipe_id in enumerate(ids):
+            indices, weights = stored.row(position)
+            found = (neighbors[position] >= 0) & (scores[position] >= SIMILAR_MIN_SCORE)
+            yield (recipe_id, indices.tolist(), weights.tolist(),
+                   [ids[j] for j in neighbors[position][found]], scores[position][found].tolist())
+
+    repository.save_similarity_index(conn, model.vocabulary, model.idf.tolist(), rows())
+    # Every similar-recipes list may have changed; one flush instead of a NOTIFY per row
+    repository.notify_cache_flush(conn, RECIPE_CACHE_CHANNEL)
+    return len(ids), len(model.vocabulary)
+
+def update_similar_recipes(recipe_id):
+    """Score one created or edited recipe against the recipes it shares terms with and update both sides"""
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        # Shared: updates run side by side and only wait for a rebuild
+        repository.lock_similarity(conn, shared=True)
+        stored_model = repository.similarity_model(conn)
+        document = repository.similarity_document(conn, recipe_id)
+        if stored_model is None or document is None:
+            # Nothing to slot into until the first rebuild
+            conn.rollback()
+            return
+        model = similarity.TfidfModel(*stored_model)
+        indices, weights = model.transform(similarity_terms(*document[1:]))
+        # Recipes sharing none of the query terms score below SIMILAR_MIN_SCORE, so they are never read
+        stored = repository.similarity_candidates(conn, recipe_id,
+                                                  similarity.query_terms(indices, weights, SIMILAR_MIN_SCORE).tolist())
+        scores = similarity.SparseRows([(row.terms, row.weights) for row in stored]).dot(
+            indices, weights, len(model.vocabulary))
+
+        best, best_scores = similarity.top_k(scores[None, :], SIMILAR_RECIPES_K)
+        keep = best_scores[0] >= SIMILAR_MIN_SCORE
+        own_row = (recipe_id, indices.tolist(), weights.tolist(),
+                   [stored[j].recipe_id for j in best[0][keep]], best_scores[0][keep].tolist())
+
+        affected = similarity.affected_rows(scores, [(row.similar_ids, row.scores) for row in stored],
+                                            recipe_id, SIMILAR_RECIPES_K, SIMILAR_MIN_SCORE)
+        # Row locks on just the lists being rewritten (and our own), merged again from their committed state
+        current = repository.lock_neighbor_lists(conn, [recipe_id, *(stored[j].recipe_id for j in affected)])
+        neighbor_updates = []
+        for j in affected:
+            if stored[j].recipe_id not in current:
+                continue
+            merged = similarity.merge_neighbor(*current[stored[j].recipe_id], recipe_id, float(scores[j]),
+                                               SIMILAR_RECIPES_K, SIMILAR_MIN_SCORE)
+            if merged:
+                neighbor_updates.append((stored[j].recipe_id, *merged))
+
+        repository.save_recipe_similarity(conn, own_row, neighbor_updates)
+        conn.commit()
+        db_log.debug("similar_recipes_updated", extra={'recipe_id': recipe_id, 'candidates': len(stored),
+                                                       'neighbor_updates': len(neighbor_updates)})
+    except psycopg2.Error as e:
+        db_log.error(f"❌ Error updating similar recipes for {recipe_id}: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+def schedule_similarity_update(recipe_id):
+    """Queue update_similar_recipes() on this worker's background thread"""
+    global _similarity_executor, _similarity_executor_pid
+    if not SIMILARITY_AVAILABLE or recipe_id is None:
+        return
+    with _similarity_executor_lock:
+        if _similarity_executor_pid != os.getpid():
+            _similarity_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity')
+            _similarity_executor_pid = os.getpid()
+        _similarity_executor.submit(update_similar_recipes, recipe_id)
+
+def similar_recipe_cards(conn, recipe_id):
+    if not SIMILARITY_AVAILABLE:
+        return []
+    try:
+        return [with_derived_fields(r) for r in repository.similar_cards(conn, recipe_id, SIMILAR_RECIPES_SHOWN)]
+    except psycopg2.Error as e:
+        db_log.warning(f"⚠️ Could not load similar recipes: {e}")
+        conn.rollback()
+        return []
+
+def browse_filters(args):
+    """Facet selections from the query string; any stored value can be browsed"""
+    filters = {}
+    for arg, key in (('category', 'dishTypes'), ('diet', 'diets')):
+        value = args.get(arg, '').strip().lower()[:255]
+        if value:
+            filters[key] = value
+    return filters
+
+@app.route('/browse')
+def browse():
+    """Recipes by category and diet, with counts from recipe_facet_counts"""
+    filters = browse_filters(request.args)
+    before_id = request.args.get('cursor', type=int)
+    facets = {'category': [], 'diet': []}
+    recipes, next_cursor = [], None
+    
+    key = f"browse:{json.dumps(filters, sort_keys=True)}:{before_id}"
+    cached, generation = cached_page_data(key)
+    if cached is not None:
+        facets, recipes, next_cursor = cached
+        return render_template('browse.html', facets=facets, filters=filters, recipes=recipes,
+                               next_cursor=next_cursor)
+    
+    conn = get_db_connection()
+    if not conn:
+        flash('Database connection error', 'error')
+        return render_template('browse.html', facets=facets, filters=filters, recipes=recipes,
+                               next_cursor=next_cursor)
+    
+    try:
+        for count in repository.facet_counts(conn):
+            facets.setdefault(count.facet, []).append(count)
+        # One extra row tells us whether there is another page
+        rows = repository.browse_cards(conn, filters, before_id, BROWSE_PAGE_SIZE + 1)
+        recipes = [with_derived_fields(r) for r in rows[:BROWSE_PAGE_SIZE]]
+        if len(rows) > BROWSE_PAGE_SIZE:
+            next_cursor = recipes[-1].id
+        page_cache.set(key, (facets, recipes, next_cursor), ('listings',), generation)
+    except psycopg2.Error as e:
+        db_log.error(f"Error browsing recipes: {e}")
+        flash('Error loading recipes', 'error')
+    finally:
+        close_db_connection(conn)
+    
+    return render_template('browse.html', facets=facets, filters=filters, recipes=recipes,
+                           next_cursor=next_cursor)
+
+def api_recipe_unavailable():
+    """Redirect home explaining why a Spoonacular recipe could not be shown"""
+    if quota_budget.level() == 'cache_only':
+        flash('Spoonacular recipes are unavailable until the daily quota resets', 'info')
+    else:
+        flash('Recipe not found', 'error')
+    return redirect(url_for('home'))
+
+@app.route('/api_recipe/<int:spoonacular_id>')
+def api_recipe_detail(spoonacular_id):
+    """Display recipe details from Spoonacular API"""
+    http_log.debug("🔍 Requesting recipe ID: %s (API key configured: %s)",
+                   spoonacular_id, 'Yes' if SPOONACULAR_API_KEY else 'No')
+    
+    recipe_data = get_recipe_details_api(spoonacular_id)
+    if recipe_data and http_log.isEnabledFor(logging.DEBUG):
+        http_log.debug("📊 Recipe keys: %s", list(recipe_data.keys()) if isinstance(recipe_data, dict) else 'Not a dict')
+    
+    if not recipe_data:
+        return api_recipe_unavailable()
+    
+    return render_template('api_recipe_detail.html', recipe=recipe_data)
+
+# ... (existing code)
+
+API_SEARCH_RESULTS = 10
+
+def api_search_params(query, level='full'):
+    """Query parameters for the JSON search proxy"""
+    params = {
+        "apiKey": SPOONACULAR_API_KEY,
+        "query": query,
+        "number": API_SEARCH_RESULTS,
+        "addRecipeInformation": True,
+        "addRecipeNutrition": True,
+    }
+    if level != 'full':
+        del params["addRecipeNutrition"]
+        params["number"] = min(API_SEARCH_RESULTS, SPOONACULAR_LEAN_RESULTS)
+    return params
+
+def fetch_api_search(query, level='full', mirrored=None):
+    """Run the JSON proxy's complexSearch and mirror every result image to S3.
+
+    mirrored maps recipe ids to images already mirrored for them (from the
+    entry being refreshed), which are reused instead of downloaded again.
+    Returns an (api_recipes, quota_points) tuple; nothing is cached.
+    """
+    mirrored = mirrored or {}
+    with spoonacular_call('complexSearch'):
+        response = http_session().get(
+            f"{SPOONACULAR_BASE_URL}/complexSearch",
+            params=api_search_params(query, level),
+            timeout=10,
+        )
+    points = record_spoonacular_quota(response, 'complexSearch')
+    response.raise_for_status()
+    results = response.json().get('results', [])
+    
+    api_recipes = []
+    for res in results:
+        image_url = res.get('image')
+        
+        # Use `download_and_upload_to_s3` to handle image URL
+        processed_image_url = mirrored.get(res.get('id')) or download_and_upload_to_s3(image_url, res.get('title'))
+        
+        # Use the processed URL
+        res['image'] = processed_image_url
+        api_recipes.append(res)
+    return api_recipes, points
+
+def api_search_response(api_recipes, level):
+    response = jsonify(api_recipes)
+    response.headers['X-Spoonacular-Budget'] = level
+    return response
+
+@app.route('/api/search')
+def api_search():
+    """
+    Search for recipes from the Spoonacular API
+    """
+    query = request.args.get('q', '')
+    if not SPOONACULAR_API_KEY:
+        return jsonify({'error': 'Spoonacular API key is not configured'}), 500
+
+    if not query:
+        return jsonify([])
+
+    search_log.record('api-search', query)
+    level = quota_budget.level()
+    key = search_cache_key('api-search', query, API_SEARCH_RESULTS, level)
+    hit, results = cached_search('api-search', query, API_SEARCH_RESULTS, 'complexSearch', level)
+    if hit:
+        # Cached results already carry mirrored image URLs
+        return api_search_response(results or [], level)
+
+    try:
+        api_recipes, _ = fetch_api_search(query, level)
+        api_cache.set(key, api_recipes, ttl=SPOONACULAR_SEARCH_CACHE_TTL)
+        return api_search_response(api_recipes, level)
+
+    except requests.exceptions.RequestException as e:
+        api_log.error(f"Spoonacular API request failed: {e}")
+        cached = api_cache.get(key)
+        if cached is not None:
+            return api_search_response(cached, level)
+        return jsonify({'error': 'Failed to retrieve recipes from external API.'}), 500
+
+# JSON recipe API
+#
+# /api/recipes serves local recipes to mobile and partner clients. Only the
+# columns named in ?fields= are selected; lists default to the card fields so
+# ingredient and step lists are sent only when asked for.
+
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 100))
+
+def parse_api_fields(default):
+    """Requested field names in order; id is always included"""
+    raw = request.args.get('fields', '')
+    fields = [name.strip() for name in raw.split(',') if name.strip()] or list(default)
+    unknown = sorted(set(fields) - repository.API_FIELDS.keys())
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [name for name in dict.fromkeys(fields) if name != 'id']
+
+def parse_int_arg(name, default, minimum, maximum=None):
+    raw = request.args.get(name, '')
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+def recipe_api_row(row, fields):
+    recipe = {name: row[name] for name in fields}
+    if row.get('raw_steps') is not None:
+        derived = derive_recipe_fields(row['raw_title'], row['raw_description'],
+                                       row['raw_ingredients'], row['raw_steps'])
+        for name, index in repository.API_DERIVED_FIELDS.items():
+            if name in recipe:
+                recipe[name] = derived[index]
+    if recipe.get('created_at'):
+        recipe['created_at'] = recipe['created_at'].isoformat()
+    return recipe
+
+def conditional_json(payload):
+    """JSON response with an ETag; a matching If-None-Match gets a 304"""
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/recipes')
+def recipes_api():
+    """Local recipes, newest first, paged with ?cursor= from the previous page"""
+    try:
+        fields = parse_api_fields(repository.API_LIST_FIELDS)
+        limit = parse_int_arg('limit', API_PAGE_SIZE, 1, API_MAX_PAGE_SIZE)
+        before_id = parse_int_arg('cursor', None, 1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 503
+    
+    try:
+        # Keyset pagination: the primary key index finds the page start directly
+        rows = repository.api_recipe_page(conn, fields, before_id, limit + 1)
+    except psycopg2.Error as e:
+        db_log.error(f"Error listing recipes: {e}")
+        return jsonify({'error': 'Failed to load recipes'}), 500
+    finally:
+        close_db_connection(conn)
+    
+    recipes = [recipe_api_row(row, fields) for row in rows[:limit]]
+    next_cursor = str(recipes[-1]['id']) if len(rows) > limit else None
+    return conditional_json({'recipes': recipes, 'next_cursor': next_cursor})
+
+@app.route('/api/recipes/<int:recipe_id>')
+def recipe_api(recipe_id):
+    """One local recipe; every field unless ?fields= narrows it"""
+    try:
+        fields = parse_api_fields(repository.API_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 503
+    
+    try:
+        row = repository.api_recipe(conn, fields, recipe_id)
+    except psycopg2.Error as e:
+        db_log.error(f"Error loading recipe {recipe_id}: {e}")
+        return jsonify({'error': 'Failed to load recipe'}), 500
+    finally:
+        close_db_connection(conn)
+    
+    if not row:
+        return jsonify({'error': 'Recipe not found'}), 404
+    return conditional_json(recipe_api_row(row, fields))
+
+def prepare_api_recipe_fields(recipe_data):
+    """Turn a Spoonacular payload into cleaned (title, description, ingredients, steps)"""
+    title = recipe_data.get('title', '')
+    
+    #clean description and limit length
+    raw_description = recipe_data.get('summary', '')
+    description = clean_html_content(raw_description)[:500] if raw_description else ''
+    
+    #Format ingredient and instructions with html cleaning
+    ingredients = format_ingredients(recipe_data.get('extendedIngredients', []))
+    
+    # Get instructions
+    instructions = recipe_data.get('analyzedInstructions', [])
+    steps = ""
+    if instructions and len(instructions) > 0:
+        steps = format_instructions(instructions[0].get('steps', []))
+    elif recipe_data.get('instructions'):
+        # Fallback to raw instructions if analyzedInstructions not available
+        steps = clean_html_content(recipe_data['instructions'])
+    
+    return title, description, ingredients, steps
+
+def find_saved_api_recipe(spoonacular_id):
+    """Return the local id of an already saved Spoonacular recipe, if any"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        return repository.saved_api_recipe_id(conn, spoonacular_id)
+    except psycopg2.Error as e:
+        db_log.error(f"Error checking saved recipe: {e}")
+        return None
+    finally:
+        close_db_connection(conn)
+
+def insert_api_recipe(fields, image_url, user_id, spoonacular_id, details=None):
+    """Insert a Spoonacular recipe and return its new local id"""
+    title, description, ingredients, steps = fields
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        recipe_id = repository.insert_recipe(
+            conn, title, description, ingredients, steps, image_url, user_id,
+            derived_field_params(title, description, ingredients, steps),
+            spoonacular_id=spoonacular_id, source='spoonacular', details=details)
+        conn.commit()
+        schedule_similarity_update(recipe_id)
+        return recipe_id
+    except psycopg2.Error as e:
+        db_log.error(f"Error saving recipe: {e}")
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
+def finish_api_recipe_save(recipe_id, image_url):
+    """Flash the outcome of a save and redirect to the right page"""
+    if recipe_id is None:
+        flash('Error saving recipe', 'error')
+        return redirect(url_for('home'))
+    
+    if image_url and image_url.startswith('https'):
+        flash('Recipe and image saved successfully!', 'success')
+    else:
+        flash('Recipe saved successfully! (Image upload failed)', 'warning')
+    
+    return redirect(url_for('recipe_detail', recipe_id=recipe_id))
+
+@app.route('/save_api_recipe/<int:spoonacular_id>', methods=['POST'])
+@login_required
+# 
+def save_api_recipe(spoonacular_id):
+    """Save a recipe from Spoonacular API to local database"""
+    recipe_data = get_recipe_details_api(spoonacular_id)
+    
+    if not recipe_data:
+        return api_recipe_unavailable()
+    
+    # Check if recipe already exists
+    existing_id = find_saved_api_recipe(spoonacular_id)
+    if existing_id:
+        flash('Recipe already saved!', 'info')
+        return redirect(url_for('recipe_detail', recipe_id=existing_id))
+    
+    # Format data for database
+    fields = prepare_api_recipe_fields(recipe_data)
+    
+    # Download and upload image to S3
+    image_url = None
+    if recipe_data.get('image'):
+        image_log.debug("📥 Downloading and uploading image to S3: %s", recipe_data['image'])
+        image_url = download_and_upload_to_s3(recipe_data['image'], fields[0])
+        if image_url:
+            image_log.debug("✅ Image uploaded to S3: %s", image_url)
+        else:
+            image_log.warning("⚠️ Failed to upload image to S3, using original URL")
+            # Fallback to original URL if S3 upload fails
+            image_url = recipe_data['image']
+    
+    # Save to database with S3 URL
+    recipe_id = insert_api_recipe(fields, image_url, session['user_id'], spoonacular_id,
+                                  details=recipe_details_document(recipe_data))
+    return finish_api_recipe_save(recipe_id, image_url)
+
+# Async variants of the upstream-bound routes.
+#
+# With ASYNC_UPSTREAM_ROUTES=1 the search, API detail, JSON search and save
+# routes are served by coroutines that talk to Spoonacular and image hosts
+# through httpx and run blocking DB/S3/Pillow work on threads, so the
+# independent I/O inside one request overlaps instead of running in series.
+ASYNC_UPSTREAM_ROUTES = os.environ.get('ASYNC_UPSTREAM_ROUTES', '').lower() in ('1', 'true', 'yes')
+ASYNC_IMAGE_CONCURRENCY = int(os.environ.get('ASYNC_IMAGE_CONCURRENCY', 6))
+
+def async_http_client():
+    """HTTP client for one async request (clients are bound to their event loop)"""
+    return httpx.AsyncClient(timeout=10, follow_redirects=True)
+
+async def search_recipes_api_async(client, query, number=12):
+    """Async counterpart of search_recipes_api()"""
+    if not SPOONACULAR_API_KEY:
+        api_log.debug("⚠️  Spoonacular API key not configured")
+        return None
+    
+    level = quota_budget.level()
+    key = search_cache_key('complexSearch', query, number, level)
+    hit, cached = await asyncio.to_thread(cached_search, 'complexSearch', query, number, 'complexSearch', level)
+    if hit:
+        return cached
+    
+    try:
+        with spoonacular_call('complexSearch'):
+            response = await client.get(f"{SPOONACULAR_BASE_URL}/complexSearch",
+                                        params=search_params(query, number, level))
+        record_spoonacular_quota(response, 'complexSearch')
+        response.raise_for_status()
+        search_data = response.json()
+    except httpx.HTTPError as e:
+        api_log.error(f"Error searching recipes: {e}")
+        return await asyncio.to_thread(api_cache.get, key)
+    
+    await asyncio.to_thread(api_cache.set, key, search_data, ttl=SPOONACULAR_SEARCH_CACHE_TTL)
+    return search_data
+
+async def get_recipe_details_api_async(client, recipe_id):
+    """Async counterpart of get_recipe_details_api(), sharing its cache"""
+    level = quota_budget.level()
+    cached = await asyncio.to_thread(cached_recipe_details, recipe_id, level)
+    if cached is not None:
+        return cached
+    
+    if not SPOONACULAR_API_KEY:
+        api_log.debug("⚠️  Spoonacular API key not configured")
+        return None
+    
+    if level == 'cache_only':
+        SPOONACULAR_CALLS.labels('information', 'skipped').inc()
+        return None
+    
+    try:
+        with spoonacular_call('information'):
+            params = recipe_details_params(level)
+            params['includeNutrition'] = str(params['includeNutrition']).lower()
+            response = await client.get(f"{SPOONACULAR_BASE_URL}/{recipe_id}/information", params=params)
+        record_spoonacular_quota(response, 'information')
+        response.raise_for_status()
+        recipe_data = sanitize_recipe_payload(response.json())
+    except httpx.HTTPError as e:
+        api_log.error(f"Error getting recipe details: {e}")
+        return None
+    
+    await asyncio.to_thread(api_cache.set, recipe_details_cache_key(recipe_id, level), recipe_data)
+    return recipe_data
+
+def transcode_and_upload(image_data, filename):
+    """Blocking half of an image mirror: Pillow transcode, S3 put and placeholder"""
+    if not IMAGE_PROCESSING_AVAILABLE:
+        return upload_image_to_s3(image_data, filename, 'image/jpeg')
+    jpeg_data, placeholder = transcode_image(image_data)
+    s3_url = upload_image_to_s3(jpeg_data, filename, 'image/jpeg')
+    record_image_placeholder(s3_url, placeholder)
+    return s3_url
+
+async def download_and_upload_to_s3_async(client, image_url, recipe_title="recipe"):
+    """Async counterpart of download_and_upload_to_s3()"""
+    if not image_url:
+        return None
+    
+    if not S3_CONFIGURED:
+        image_log.debug("⚠️ S3 not configured - using original image URL")
+        return image_url
+    
+    try:
+        with span('image-download', IMAGE_STAGE_LATENCY.labels('download')):
+            response = await client.get(image_url, headers=IMAGE_DOWNLOAD_HEADERS, timeout=15)
+        IMAGE_BYTES.labels('downloaded').inc(len(response.content))
+        response.raise_for_status()
+        
+        content_type = response.headers.get('content-type', '').lower()
+        if not content_type.startswith('image/'):
+            image_log.warning(f"❌ Not an image: {content_type}")
+            return image_url
+        
+        filename = f"recipes/{uuid.uuid4()}.jpg"
+        s3_url = await asyncio.to_thread(transcode_and_upload, response.content, filename)
+        return s3_url if s3_url else image_url
+    except Exception as e:
+        image_log.warning(f"❌ Error downloading and uploading image: {e} - using original image URL", extra={'image_url': image_url})
+        return image_url
+
+async def search_async():
+    query = request.args.get('q', '')
+    filters = parse_recipe_filters(request.args)
+    search_results = {'local': [], 'api': []}
+    
+    if query and not filters:
+        # Local DB search and Spoonacular search run side by side
+        search_log.record('complexSearch', query)
+        async with async_http_client() as client:
+            local_results, api_results = await asyncio.gather(
+                asyncio.to_thread(search_local_recipes, query),
+                search_recipes_api_async(client, query),
+            )
+        search_results['local'] = local_results
+        if api_results:
+            search_results['api'] = api_results['results']
+    elif query or filters:
+        search_results['local'] = await asyncio.to_thread(search_local_recipes, query, filters)
     
-    return render_template('search.html', query=query, search_results=search_results)
+    return render_search(query, filters, search_results)
 
-@app.route('/api_recipe/<int:spoonacular_id>')
-def api_recipe_detail(spoonacular_id):
+async def api_recipe_detail_async(spoonacular_id):
     """Display recipe details from Spoonacular API"""
-    print(f"🔍 Requesting recipe ID: {spoonacular_id}")
-    print(f"🔑 API Key configured: {'Yes' if SPOONACULAR_API_KEY else 'No'}")
-    
-    recipe_data = get_recipe_details_api(spoonacular_id)
-    print(f"📊 Recipe data type: {type(recipe_data)}")
-    print(f"📊 Recipe data: {recipe_data is not None}")
-    
-    if recipe_data:
-        print(f"📊 Recipe keys: {list(recipe_data.keys()) if isinstance(recipe_data, dict) else 'Not a dict'}")
+    async with async_http_client() as client:
+        recipe_data = await get_recipe_details_api_async(client, spoonacular_id)
     
     if not recipe_data:
-        flash('Recipe not found', 'error')
-        return redirect(url_for('home'))
+        return api_recipe_unavailable()
     
     return render_template('api_recipe_detail.html', recipe=recipe_data)
 
-# ... (existing code)
-
-@app.route('/api/search')
-def api_search():
+async def api_search_async():
     """
-    Search for recipes from the Spoonacular API
+    Search for recipes from the Spoonacular API, mirroring images concurrently
     """
     query = request.args.get('q', '')
     if not SPOONACULAR_API_KEY:
         return jsonify({'error': 'Spoonacular API key is not configured'}), 500
-
+    
     if not query:
         return jsonify([])
-
-    try:
-        response = requests.get(
-            f"{SPOONACULAR_BASE_URL}/complexSearch",
-            params={
-                "apiKey": SPOONACULAR_API_KEY,
-                "query": query,
-                "number": 10,
-                "addRecipeInformation": True,
-                "addRecipeNutrition": True,
-            },
-            timeout=10,
-        )
-        response.raise_for_status()
-        search_data = response.json()
-        results = search_data.get('results', [])
+    
+    search_log.record('api-search', query)
+    level = quota_budget.level()
+    key = search_cache_key('api-search', query, API_SEARCH_RESULTS, level)
+    hit, results = await asyncio.to_thread(cached_search, 'api-search', query, API_SEARCH_RESULTS,
+                                           'complexSearch', level)
+    if hit:
+        return api_search_response(results or [], level)
+    
+    async with async_http_client() as client:
+        try:
+            with spoonacular_call('complexSearch'):
+                response = await client.get(f"{SPOONACULAR_BASE_URL}/complexSearch",
+                                            params=api_search_params(query, level))
+            record_spoonacular_quota(response, 'complexSearch')
+            response.raise_for_status()
+            results = response.json().get('results', [])
+        except httpx.HTTPError as e:
+            api_log.error(f"Spoonacular API request failed: {e}")
+            cached = await asyncio.to_thread(api_cache.get, key)
+            if cached is not None:
+                return api_search_response(cached, level)
+            return jsonify({'error': 'Failed to retrieve recipes from external API.'}), 500
         
-        api_recipes = []
-        for res in results:
-            image_url = res.get('image')
-            
-            # Use `download_and_upload_to_s3` to handle image URL
-            processed_image_url = download_and_upload_to_s3(image_url, res.get('title'))
-            
-            # Use the processed URL
-            res['image'] = processed_image_url
-            api_recipes.append(res)
-            
-        return jsonify(api_recipes)
-
-    except requests.exceptions.RequestException as e:
-        app.logger.error(f"Spoonacular API request failed: {e}")
-        return jsonify({'error': 'Failed to retrieve recipes from external API.'}), 500
-
+        limit = asyncio.Semaphore(ASYNC_IMAGE_CONCURRENCY)
+        
+        async def mirror(res):
+            async with limit:
+                res['image'] = await download_and_upload_to_s3_async(client, res.get('image'), res.get('title'))
+            return res
+        
+        api_recipes = list(await asyncio.gather(*(mirror(res) for res in results)))
+    
+    await asyncio.to_thread(api_cache.set, key, api_recipes, ttl=SPOONACULAR_SEARCH_CACHE_TTL)
+    return api_search_response(api_recipes, level)
 
-@app.route('/save_api_recipe/<int:spoonacular_id>', methods=['POST'])
 @login_required
-# 
-def save_api_recipe(spoonacular_id):
+async def save_api_recipe_async(spoonacular_id):
     """Save a recipe from Spoonacular API to local database"""
-    recipe_data = get_recipe_details_api(spoonacular_id)
-    
-    if not recipe_data:
-        flash('Recipe not found', 'error')
-        return redirect(url_for('home'))
-    
-    conn = get_db_connection()
-    if not conn:
-        flash('Database connection error', 'error')
-        return redirect(url_for('home'))
+    user_id = session['user_id']
     
-    try:
-        cur = conn.cursor()
-        
-        # Check if recipe already exists
-        cur.execute('SELECT id FROM recipes WHERE spoonacular_id = %s', (spoonacular_id,))
-        existing = cur.fetchone()
+    async with async_http_client() as client:
+        # The duplicate check and the detail fetch are independent
+        recipe_data, existing_id = await asyncio.gather(
+            get_recipe_details_api_async(client, spoonacular_id),
+            asyncio.to_thread(find_saved_api_recipe, spoonacular_id),
+        )
         
-        if existing:
+        if existing_id:
             flash('Recipe already saved!', 'info')
-            return redirect(url_for('recipe_detail', recipe_id=existing[0]))
-        
-        # Format data for database
-        title = recipe_data.get('title', '')
-        
-        #clean description and limit length
-        raw_description = recipe_data.get('summary', '')
-        description = clean_html_content(raw_description)[:500] if raw_description else ''
+            return redirect(url_for('recipe_detail', recipe_id=existing_id))
         
-        #Format ingredient and instructions with html cleaning
-        ingredients = format_ingredients(recipe_data.get('extendedIngredients', []))
+        if not recipe_data:
+            return api_recipe_unavailable()
         
-        # Get instructions
-        instructions = recipe_data.get('analyzedInstructions', [])
-        steps = ""
-        if instructions and len(instructions) > 0:
-            steps = format_instructions(instructions[0].get('steps', []))
-        elif recipe_data.get('instructions'):
-            # Fallback to raw instructions if analyzedInstructions not available
-            steps = clean_html_content(recipe_data['instructions'])    
-        
-        # Download and upload image to S3
+        fields = prepare_api_recipe_fields(recipe_data)
         image_url = None
         if recipe_data.get('image'):
-            print(f"📥 Downloading and uploading image to S3: {recipe_data['image']}")
-            image_url = download_and_upload_to_s3(recipe_data['image'], title)
-            if image_url:
-                print(f"✅ Image uploaded to S3: {image_url}")
-            else:
-                print("⚠️ Failed to upload image to S3, using original URL")
-                # Fallback to original URL if S3 upload fails
-                image_url = recipe_data['image']
-         
+            image_url = await download_and_upload_to_s3_async(client, recipe_data['image'], fields[0])
+            image_url = image_url or recipe_data['image']
     
-        # Save to database with S3 URL
-        cur.execute('''INSERT INTO recipes (title, description, ingredients, steps, image_url, author_id, spoonacular_id, source)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id''',
-                    (title, description, ingredients, steps, image_url, session['user_id'], spoonacular_id, 'spoonacular'))
-        
-        recipe_id = cur.fetchone()[0]
-        conn.commit()
-        
-        if image_url and image_url.startswith('https'):
-            flash('Recipe and image saved successfully!', 'success')
-        else:
-            flash('Recipe saved successfully! (Image upload failed)', 'warning')
-        
-        return redirect(url_for('recipe_detail', recipe_id=recipe_id))
-        
-    except psycopg2.Error as e:
-        print(f"Error saving recipe: {e}")
-        conn.rollback()
-        flash('Error saving recipe', 'error')
-        return redirect(url_for('home'))
-    finally:
-        cur.close()
-        close_db_connection(conn)
+    recipe_id = await asyncio.to_thread(insert_api_recipe, fields, image_url, user_id, spoonacular_id,
+                                        recipe_details_document(recipe_data))
+    return finish_api_recipe_save(recipe_id, image_url)
+
+if ASYNC_UPSTREAM_ROUTES:
+    if GREEN_MODE:
+        # gevent already overlaps the upstream I/O; an asyncio loop per request would fight the hub
+        log.warning("⚠️  ASYNC_UPSTREAM_ROUTES ignored under gevent workers - using sync routes")
+    elif ASYNC_HTTP_AVAILABLE:
+        app.view_functions.update({
+            'search': search_async,
+            'api_recipe_detail': api_recipe_detail_async,
+            'api_search': api_search_async,
+            'save_api_recipe': save_api_recipe_async,
+        })
+        log.info("⚡ Async upstream routes enabled")
+    else:
+        log.warning("⚠️  ASYNC_UPSTREAM_ROUTES set but httpx is not installed - using sync routes")
 
 @app.route('/debug/images')
 def debug_images():
@@ -856,21 +3659,19 @@ def debug_images():
         return "Database connection error"
     
     try: 
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute("SELECT id, title, image_url FROM recipes WHERE image_url IS NOT NULL LIMIT 10")
-        recipes = cur.fetchall()
+        recipes = repository.recipes_with_images(conn, limit=10)
         
         html = "<h1>Image Debug</h1>"
-        html += f"<p>S3 Configured: {'Yes' if s3_client else 'No'}</p>"
+        html += f"<p>S3 Configured: {'Yes' if S3_CONFIGURED else 'No'}</p>"
         html += f"<p>S3 Bucket: {AWS_S3_BUCKET}</p><hr>"
         
         for recipe in recipes:
             html += f"<div style='border: 1px solid #ccc; margin: 10px; padding: 10px;'>"
-            html += f"<h3>{recipe['title']}</h3>"
-            html += f"<p><strong>URL:</strong> {recipe['image_url']}</p>"
+            html += f"<h3>{recipe.title}</h3>"
+            html += f"<p><strong>URL:</strong> {recipe.image_url}</p>"
             
-            if recipe['image_url']:
-                html += f"<img src='{recipe['image_url']}' style='max-width: 200px; max-height: 150px;' "
+            if recipe.image_url:
+                html += f"<img src='{recipe.image_url}' style='max-width: 200px; max-height: 150px;' "
                 html += f"onerror='this.style.border=\"2px solid red\"; this.alt=\"Failed to load\";' />"
             else:
                 html += "<p>No image URL</p>"
@@ -882,15 +3683,15 @@ def debug_images():
     except Exception as e:
         return f"Error: {e}"
     finally:
-        if 'cur' in locals():
-            cur.close()
         close_db_connection(conn)    
 
 def configure_s3_bucket():
     """Configure S3 bucket for public read access"""
-    if not s3_client or not AWS_S3_BUCKET:
+    if not S3_CONFIGURED:
         print("⚠️ S3 not configured")
         return False
+    from botocore.exceptions import ClientError
+    s3_client = get_s3_client()
     
     try:
         # Check if bucket exists
@@ -939,25 +3740,21 @@ def login():
             return redirect(url_for('login'))
         
         try:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-            cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-            user = cur.fetchone()
+            user = repository.user_by_email(conn, email)
             
-            if user and check_password_hash(user['password_hash'], password):
-                session['user_id'] = user['id']
-                session['user_email'] = user['email']
+            if user and check_password_hash(user.password_hash, password):
+                session['user_id'] = user.id
+                session['user_email'] = user.email
                 # Personalized welcome message
-                flash(f"Welcome back, {user['email'].split('@')[0].title()}!", 'success')
+                flash(f"Welcome back, {user.email.split('@')[0].title()}!", 'success')
                 return redirect(url_for('home'))
             else:
                 flash('Login failed, Please check your email or password', 'error')
                 
         except psycopg2.Error as e:
-            print(f"Error during login: {e}")
+            db_log.error(f"Error during login: {e}")
             flash('Login error occurred', 'error')
         finally:
-            if 'cur' in locals() and cur is not None:
-                cur.close()
             close_db_connection(conn)
     
     return render_template('login.html')
@@ -982,16 +3779,11 @@ def signup():
             return redirect(url_for('signup'))  
         
         try:
-            cur = conn.cursor()
-            
             # Check if user already exists
-            cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-            if cur.fetchone():
+            if repository.user_by_email(conn, email):
                 flash('An account with that Email already registered', 'warning')
             else:
-                cur.execute('INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id',
-                        (email, hashed_password))
-                user_id = cur.fetchone()[0]
+                user_id = repository.create_user(conn, email, hashed_password)
                 conn.commit()
                 
                 session.clear()
@@ -1002,11 +3794,9 @@ def signup():
                 return redirect(url_for('home'))
         except psycopg2.Error as e:
                 conn.rollback()
-                print(f"Error during signup: {e}", file=sys.stderr)
+                db_log.error(f"Error during signup: {e}")
                 flash('An error occurred during signup.', 'error')
         finally:
-            if 'cur' in locals() and cur is not None:
-                cur.close()
             close_db_connection(conn)
     
     return render_template('signup.html')
@@ -1017,6 +3807,26 @@ def logout():
     flash('You have been logged out', 'info')
     return redirect(url_for('home'))
 
+@app.route('/uploads/presign', methods=['POST'])
+@login_required
+def presign_upload():
+    """Presigned S3 POST for the recipe form's image; the browser uploads directly"""
+    if not S3_CONFIGURED:
+        return jsonify({'error': 'Image uploads are not configured'}), 503
+    payload = request.get_json(silent=True) or {}
+    content_type = payload.get('content_type')
+    if content_type not in DIRECT_UPLOAD_TYPES:
+        return jsonify({'error': 'Supported formats: JPG, PNG, GIF, WebP'}), 400
+    size = payload.get('size')
+    if not isinstance(size, int) or not 0 < size <= DIRECT_UPLOAD_MAX_BYTES:
+        return jsonify({'error': f"Images must be under {DIRECT_UPLOAD_MAX_BYTES // (1024 * 1024)}MB",
+                        'max_bytes': DIRECT_UPLOAD_MAX_BYTES}), 400
+    try:
+        return jsonify(presigned_image_upload(session['user_id'], content_type))
+    except Exception as e:
+        s3_log.error(f"❌ Could not presign upload: {e}")
+        return jsonify({'error': 'Could not start the upload'}), 503
+
 @app.route('/create_recipe', methods=['GET', 'POST'])
 @login_required
 def create_recipe():
@@ -1028,7 +3838,9 @@ def create_recipe():
         
         # Handle image upload with fallbacks
         image_url = None
-        if 'image' in request.files:
+        image_key = uploaded_image_key(request.form, session['user_id'])
+        if image_key is None and 'image' in request.files:
+            # Browsers without JavaScript still send the file through the worker
             file = request.files['image']
             if file.filename != '':
                    image_url = process_and_upload_user_image(file)
@@ -1039,55 +3851,62 @@ def create_recipe():
             return redirect(url_for('create_recipe'))
         
         try:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-            cur.execute(
-                '''INSERT INTO recipes (title, description, ingredients, steps, image_url, user_id, author_info)
-                           VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id; 
-                ''',
-                (title, description, ingredients, steps, image_url, session['user_id'], session.get('user_email', 'Anonymous'))
-            )
-            recipe_id = cur.fetchone()['id']       
+            if image_key and repository.image_key_pending(conn, image_key):
+                # A double-submitted form: the first recipe consumes the upload
+                flash('That image is already being added to another recipe.', 'warning')
+                image_key = None
+            recipe_id = repository.insert_recipe(
+                conn, title, description, ingredients, steps, image_url, session['user_id'],
+                derived_field_params(title, description, ingredients, steps),
+                details=recipe_form_details(request.form))
+            if image_key:
+                repository.set_pending_image(conn, recipe_id, image_key)
             conn.commit()
+            if image_key:
+                schedule_image_processing(recipe_id, image_key)
+            schedule_similarity_update(recipe_id)
             flash('Recipe created successfully!', 'success')
             return redirect(url_for('recipe_detail', recipe_id=recipe_id))  
         except psycopg2.Error as e:
-            print(f"Error creating recipe: {e}")
+            db_log.error(f"❌ Error creating recipe: {e}")
             conn.rollback()
-            print(f"❌ Database error: {e}", file=sys.stderr)
             flash('Error creating recipe', 'error')
         finally:
-            if 'cur' in locals() and cur is not None:
-                cur.close()
             close_db_connection(conn)
     
-    return render_template('create_recipe.html')
+    return render_recipe_form('create_recipe.html')
 
 @app.route('/recipe/<int:recipe_id>')
 def recipe_detail(recipe_id):
+    key = f"recipe:{recipe_id}"
+    cached, generation = cached_page_data(key)
+    if cached is not None:
+        recipe, similar_recipes = cached
+        return render_template('recipe_detail.html', recipe=recipe, similar_recipes=similar_recipes)
+    
     conn = get_db_connection()
     if not conn:
         flash('Database connection error', 'error')
         return redirect(url_for('home'))
     
     try:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute('''SELECT r.*, u.email 
-                       FROM recipes r
-                       LEFT JOIN users u ON r.author_id = u.id 
-                       WHERE r.id = %s''', (recipe_id,))
-        recipe = cur.fetchone()
+        recipe = repository.recipe_detail(conn, recipe_id)
         
         if not recipe:
             flash('Recipe not found', 'error')
             return redirect(url_for('home'))
         
-        return render_template('recipe_detail.html', recipe=recipe)
+        recipe = with_derived_fields(recipe)
+        similar_recipes = similar_recipe_cards(conn, recipe_id)
+        # Similar cards show other recipes' titles and images, so their changes evict this page too
+        tags = {key, f"author:{recipe.author_id}", *(f"recipe:{r.id}" for r in similar_recipes)}
+        page_cache.set(key, (recipe, similar_recipes), tags, generation)
+        return render_template('recipe_detail.html', recipe=recipe, similar_recipes=similar_recipes)
     except psycopg2.Error as e:
-        print(f"Error fetching recipe: {e}")
+        db_log.error(f"Error fetching recipe: {e}")
         flash('Error loading recipe', 'error')
         return redirect(url_for('home'))
     finally:
-        cur.close()
         close_db_connection(conn)
 
 @app.route('/edit_recipe/<int:recipe_id>', methods=['GET', 'POST'])
@@ -1099,10 +3918,7 @@ def edit_recipe(recipe_id):
         return redirect(url_for('home'))
     
     try:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute('SELECT * FROM recipes WHERE id = %s AND author_id = %s', 
-                    (recipe_id, session['user_id']))
-        recipe = cur.fetchone()
+        recipe = repository.recipe_for_edit(conn, recipe_id, session['user_id'])
         
         if recipe is None:
             flash('Recipe not found or you do not have permission to edit it', 'error')
@@ -1113,37 +3929,43 @@ def edit_recipe(recipe_id):
             description = request.form['description']
             ingredients = request.form['ingredients']
             steps = request.form['steps']
-            image_url = recipe['image_url']  
+            image_url = recipe.image_url
+            image_key = uploaded_image_key(request.form, session['user_id'])
+            if image_key and repository.image_key_pending(conn, image_key, recipe_id):
+                flash('That image is already being added to another recipe.', 'warning')
+                image_key = None
             
-            if 'image' in request.files:
+            if image_key is None and 'image' in request.files:
                 file = request.files['image']
                 if file.filename != '':
-                    print(f"📤 Uploading updated image to S3: {file.filename}")
-                    new_image_url = process_and_upload_user_image(file)
+                    image_log.debug("📤 Uploading updated image to S3: %s", file.filename)
+                    new_image_url = process_and_upload_user_image(file, conn)
                     if new_image_url:
                         image_url = new_image_url
-                        print(f"✅ Updated image uploaded to S3: {image_url}")
+                        image_log.debug("✅ Updated image uploaded to S3: %s", image_url)
                     else:
                         flash('Invalid image file. Please upload a valid image.', 'error')
-                        return render_template('edit_recipe.html', recipe=recipe)
+                        return render_recipe_form('edit_recipe.html', recipe=recipe)
                        
-            cur.execute('''UPDATE recipes 
-                           SET title = %s, description = %s, ingredients = %s, steps = %s, image_url = %s
-                           WHERE id = %s''',
-                        (title, description, ingredients, steps, image_url, recipe_id))
+            repository.update_recipe(conn, recipe_id, title, description, ingredients, steps, image_url,
+                                     derived_field_params(title, description, ingredients, steps),
+                                     recipe_form_details(request.form, recipe.details))
+            if image_key:
+                repository.set_pending_image(conn, recipe_id, image_key)
             conn.commit()
+            if image_key:
+                schedule_image_processing(recipe_id, image_key)
+            schedule_similarity_update(recipe_id)
             flash('Recipe updated successfully!', 'success')
             return redirect(url_for('recipe_detail', recipe_id=recipe_id))
         
-        return render_template('edit_recipe.html', recipe=recipe)
+        return render_recipe_form('edit_recipe.html', recipe=recipe)
     except psycopg2.Error as e:
-        print(f"Error editing recipe: {e}")
+        db_log.error(f"Error editing recipe: {e}")
         conn.rollback()
         flash('Error updating recipe', 'error')
         return redirect(url_for('home'))
     finally:
-        if 'cur' in locals() and cur is not None:
-            cur.close()
         close_db_connection(conn)
         
 # Error Handlers
@@ -1172,6 +3994,526 @@ def test_database():
     else:
         print("❌ Database connection test failed!")
 
+@app.cli.command()
+@click.option('--all', 'recompute_all', is_flag=True, help='Recompute rows that already have derived fields.')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_recipe_fields(recompute_all, batch_size):
+    """Fill the sanitized title/description/ingredient/step columns."""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            rows = repository.recipes_missing_derived_fields(conn, last_id, recompute_all, batch_size)
+            if not rows:
+                break
+            repository.set_derived_fields(
+                conn, [(recipe_id, derived_field_params(title, description, ingredients, steps))
+                       for recipe_id, title, description, ingredients, steps in rows])
+            conn.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+            print(f"   ...{updated} recipes updated")
+        print(f"✅ Backfilled derived fields for {updated} recipes")
+    except psycopg2.Error as e:
+        print(f"❌ Backfill failed: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+@app.cli.command()
+@click.option('--fetch', is_flag=True, help='Call Spoonacular for recipes missing from the response cache.')
+@click.option('--batch-size', default=200, show_default=True)
+def backfill_recipe_details(fetch, batch_size):
+    """Fill recipes.details for saved Spoonacular recipes."""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    updated = missing = 0
+    last_id = 0
+    try:
+        while True:
+            rows = repository.spoonacular_recipes_without_details(conn, last_id, batch_size)
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            documents = []
+            for recipe_id, spoonacular_id in rows:
+                # Lean payloads only lack nutrition, which the details document doesn't use
+                recipe_data = cached_recipe_details(spoonacular_id, 'lean')
+                if recipe_data is None and fetch and quota_budget.level() != 'cache_only':
+                    recipe_data = get_recipe_details_api(spoonacular_id)
+                if recipe_data is None:
+                    missing += 1
+                    continue
+                documents.append((recipe_id, recipe_details_document(recipe_data)))
+            repository.set_recipe_details(conn, documents)
+            conn.commit()
+            updated += len(documents)
+            print(f"   ...{updated} recipes updated")
+        print(f"✅ Stored details for {updated} recipes ({missing} not in the cache"
+              f"{'' if fetch else '; rerun with --fetch to call Spoonacular'})")
+    except psycopg2.Error as e:
+        print(f"❌ Backfill failed: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+@app.cli.command()
+def flush_page_cache():
+    """Drop every worker's cached page data (on every node sharing the database)."""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    try:
+        repository.notify_cache_flush(conn, RECIPE_CACHE_CHANNEL)
+        conn.commit()
+        print("✅ Page caches flushed")
+    except psycopg2.Error as e:
+        print(f"❌ Flush failed: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+@app.cli.command()
+@click.option('--top', default=CACHE_WARM_TOP_QUERIES, show_default=True,
+              help='Most searched queries to warm besides CACHE_WARM_CATEGORIES.')
+@click.option('--max-points', default=CACHE_WARM_MAX_POINTS, show_default=True,
+              help='Spoonacular quota points this pass may spend.')
+@click.option('--refresh-before', default=CACHE_WARM_REFRESH_BEFORE, show_default=True,
+              help='Refetch entries expiring within this many seconds.')
+@click.option('--dry-run', is_flag=True, help='Report what is stale without fetching anything.')
+def warm_cache(top, max_points, refresh_before, dry_run):
+    """Prefetch popular searches and categories into the Spoonacular response cache."""
+    if not SPOONACULAR_API_KEY:
+        print("❌ Spoonacular API key is not configured")
+        return
+    warmer = CacheWarmer(CACHE_WARM_INTERVAL, refresh_before, top, CACHE_WARM_CATEGORIES,
+                         CACHE_WARM_DETAILS, max_points, CACHE_WARM_MIN_QUOTA_LEFT)
+    outcomes = warmer.run_pass(dry_run=dry_run)
+    if outcomes is None:
+        print("❌ Warm pass did not run (database unavailable or another pass in progress)")
+        return
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  {outcome}: {count}")
+    print(f"✅ Cache warm pass finished (budget level: {quota_budget.level()})")
+
+@app.cli.command()
+@click.option('--top', default=20, show_default=True, help='Allocation sites to list.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the merged report as JSON.')
+@click.option('--reset', is_flag=True,
+              help='Delete the profile files after reporting (live workers write theirs again on their next sample).')
+def memory_report(top, as_json, reset):
+    """Report per-route memory use sampled by the workers (MEMORY_PROFILE_SAMPLE_RATE)."""
+    report = merge_memory_profiles(MEMORY_PROFILE_DIR, top)
+    if not report['routes']:
+        print(f"❌ No memory samples in {MEMORY_PROFILE_DIR} (is MEMORY_PROFILE_SAMPLE_RATE set on the server?)")
+        return
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        kib = lambda size: f"{size / 1024:,.0f}"
+        print(f"{'route':<40}{'samples':>9}{'peak avg':>12}{'peak max':>12}{'net avg':>12}{'net max':>12}  (KiB)")
+        for row in report['routes']:
+            print(f"{row['route']:<40}{row['samples']:>9}{kib(row['peak_avg']):>12}{kib(row['peak_max']):>12}"
+                  f"{kib(row['net_avg']):>12}{kib(row['net_max']):>12}")
+        print("\nTop allocation sites still held at request end (KiB per sampled request):")
+        for row in report['sites']:
+            print(f"{kib(row['size_per_request']):>10}  {row['route']:<30} {row['site']}")
+        print("\nWorkers: " + ', '.join(f"{w['pid']} (max RSS {(w['max_rss_kb'] or 0) / 1024:,.0f} MB)"
+                                        for w in report['workers']))
+    if reset:
+        for name in os.listdir(MEMORY_PROFILE_DIR):
+            if name.startswith('memory-') and name.endswith('.json'):
+                os.remove(os.path.join(MEMORY_PROFILE_DIR, name))
+        print(f"✅ Cleared {len(report['workers'])} worker profiles")
+
+@app.cli.command()
+def process_pending_uploads():
+    """Process direct image uploads left pending (e.g. by a worker restart or S3 error)."""
+    if not S3_CONFIGURED:
+        print("❌ S3 is not configured")
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    try:
+        pending = repository.pending_image_uploads(conn)
+    finally:
+        close_db_connection(conn)
+    settled = sum(1 for recipe_id, key in pending if process_uploaded_image(recipe_id, key))
+    print(f"✅ Settled {settled} of {len(pending)} pending uploads")
+
+# Objects the app writes: processed images and direct-upload originals
+GC_IMAGE_PREFIXES = ('recipes/', 'uploads/')
+S3_DELETE_BATCH = 1000  # DeleteObjects limit
+
+def delete_s3_objects(keys):
+    """Delete up to S3_DELETE_BATCH keys in one call; returns the keys S3 refused"""
+    response = get_s3_client().delete_objects(
+        Bucket=AWS_S3_BUCKET,
+        Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True},
+    )
+    errors = response.get('Errors', [])
+    for error in errors[:5]:
+        s3_log.warning(f"⚠️ Could not delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+    return {error.get('Key') for error in errors}
+
+@app.cli.command()
+@click.option('--grace-hours', default=72.0, show_default=True,
+              help='Keep unreferenced objects younger than this (uploads in flight, cached search results).')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting.')
+def gc_images(grace_hours, dry_run):
+    """Delete S3 images that no recipe or cached search response references."""
+    if not S3_CONFIGURED:
+        print("❌ S3 is not configured")
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    # Snapshot the references before listing: an object uploaded after this
+    # point is younger than the grace period, so it is never a candidate.
+    referenced = set()
+    try:
+        for image_url, pending_key in repository.referenced_images(conn):
+            key = s3_key_from_url(image_url)
+            if key:
+                referenced.add(key)
+            if pending_key:
+                referenced.add(pending_key)
+        # /api/search responses serve mirrored images straight from the cache,
+        # and the cache warmer keeps reusing them however old they get
+        for image_url in repository.cached_response_images(conn, 'api-search:'):
+            key = s3_key_from_url(image_url)
+            if key:
+                referenced.add(key)
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"❌ Could not read referenced images: {e}")
+        conn.rollback()
+        close_db_connection(conn)
+        return
+    close_db_connection(conn)
+    print(f"🔗 {len(referenced)} objects referenced by recipes and cached search responses")
+    
+    cutoff = datetime.now(timezone.utc).timestamp() - grace_hours * 3600
+    scanned = kept_young = 0
+    deleted, failed = [], 0
+    batch = []
+    
+    def flush(batch):
+        nonlocal failed
+        refused = set() if dry_run else delete_s3_objects([key for key, _ in batch])
+        failed += len(refused)
+        deleted.extend((key, size) for key, size in batch if key not in refused)
+    
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    for prefix in GC_IMAGE_PREFIXES:
+        for page in paginator.paginate(Bucket=AWS_S3_BUCKET, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                scanned += 1
+                if obj['Key'] in referenced:
+                    continue
+                if obj['LastModified'].timestamp() > cutoff:
+                    kept_young += 1
+                    continue
+                batch.append((obj['Key'], obj['Size']))
+                if len(batch) == S3_DELETE_BATCH:
+                    flush(batch)
+                    batch = []
+    if batch:
+        flush(batch)
+    freed = sum(size for _, size in deleted)
+    
+    if dry_run:
+        for key, _ in deleted[:20]:
+            print(f"   would delete {key}")
+        print(f"🧪 Dry run: {len(deleted)} of {scanned} objects are orphaned ({freed / 1024 / 1024:.1f} MB); "
+              f"{kept_young} unreferenced objects are inside the grace period")
+        return
+    
+    # Their placeholders are dead rows now too
+    conn = get_db_connection()
+    if conn and deleted:
+        try:
+            urls = [generate_public_s3_url(key) for key, _ in deleted]
+            for start in range(0, len(urls), S3_DELETE_BATCH):
+                repository.delete_image_placeholders(conn, urls[start:start + S3_DELETE_BATCH])
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"⚠️ Could not remove placeholders of deleted images: {e}")
+            conn.rollback()
+    close_db_connection(conn)
+    print(f"✅ Deleted {len(deleted)} of {scanned} objects ({freed / 1024 / 1024:.1f} MB); "
+          f"{failed} failed, {kept_young} kept inside the grace period")
+
+class RateLimiter:
+    """Token bucket shared by threads: at most `rate` acquisitions per second"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def reprocess_image(image_url, cpu_pool, s3_limit):
+    """Fetch one stored image, transcode it in cpu_pool and publish it under a new key.
+
+    Returns (new_url, placeholder, bytes read). The old object is left for
+    gc-images, so pages cached with its URL keep working.
+    """
+    s3_limit.acquire()
+    image_data = get_s3_client().get_object(Bucket=AWS_S3_BUCKET, Key=s3_key_from_url(image_url))['Body'].read()
+    jpeg_data, placeholder = cpu_pool.submit(_transcode_image, image_data).result()
+    s3_limit.acquire()
+    new_url = upload_image_to_s3(jpeg_data, f"recipes/{uuid.uuid4()}.jpg", 'image/jpeg')
+    if not new_url:
+        raise RuntimeError("S3 upload failed")
+    return new_url, placeholder, len(image_data)
+
+@app.cli.command()
+@click.option('--job', default='default', show_default=True, help='Checkpoint name; rerunning a job resumes it.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the first recipe.')
+@click.option('--processes', default=os.cpu_count() or 1, show_default=True, help='Transcoding processes.')
+@click.option('--io-threads', type=int, help='Threads for S3 transfers  [default: 2 x processes, at least 8]')
+@click.option('--s3-rate', default=100.0, show_default=True, help='S3 requests per second (0 = unlimited).')
+@click.option('--limit', type=int, help='Stop after this many recipes.')
+def reprocess_images(job, restart, processes, io_threads, s3_rate, limit):
+    """Re-run the image pipeline over every stored recipe image (after a policy change)."""
+    if not S3_CONFIGURED or not IMAGE_PROCESSING_AVAILABLE:
+        print("❌ S3 and Pillow are both required")
+        return
+    io_threads = io_threads or max(8, processes * 2)
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    
+    after_id = 0 if restart else repository.image_reprocess_checkpoint(conn, job)
+    conn.commit()
+    if after_id:
+        print(f"↩️  Resuming job '{job}' after recipe {after_id}")
+    
+    # Backpressure: at most this many images between "read from the DB" and "written back"
+    in_flight = threading.BoundedSemaphore(io_threads * 2)
+    results = queue.Queue()
+    s3_limit = RateLimiter(s3_rate)
+    submitted = deque()  # recipe ids in submission (= id) order
+    finished = set()
+    replaced, placeholders = [], []
+    totals = {'done': 0, 'failed': 0, 'skipped': 0, 'bytes': 0}
+    unsaved = {'done': 0, 'failed': 0}
+    started = last_report = last_save = time.monotonic()
+    
+    def work(recipe_id, image_url):
+        try:
+            results.put((recipe_id, image_url, reprocess_image(image_url, cpu_pool, s3_limit), None))
+        except Exception as e:
+            results.put((recipe_id, image_url, None, e))
+        finally:
+            in_flight.release()
+    
+    def save():
+        """Write finished rows plus the checkpoint (every id up to it is finished) in one transaction"""
+        nonlocal after_id, last_save
+        while submitted and submitted[0] in finished:
+            finished.discard(submitted[0])
+            after_id = submitted.popleft()
+        for image_url, placeholder in placeholders:
+            repository.save_image_placeholder(conn, image_url, *placeholder)
+        repository.replace_recipe_images(conn, replaced)
+        repository.save_image_reprocess_checkpoint(conn, job, after_id, unsaved['done'], unsaved['failed'])
+        conn.commit()
+        replaced.clear()
+        placeholders.clear()
+        unsaved.update(done=0, failed=0)
+        last_save = time.monotonic()
+    
+    def drain(timeout=0):
+        nonlocal last_report
+        try:
+            while True:
+                recipe_id, image_url, result, error = results.get(timeout=timeout)
+                timeout = 0
+                finished.add(recipe_id)
+                if error is not None:
+                    totals['failed'] += 1
+                    unsaved['failed'] += 1
+                    image_log.warning(f"❌ Could not reprocess image of recipe {recipe_id}: {error}")
+                    continue
+                new_url, placeholder, size = result
+                replaced.append((recipe_id, image_url, new_url))
+                placeholders.append((new_url, placeholder))
+                totals['done'] += 1
+                totals['bytes'] += size
+                unsaved['done'] += 1
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        if len(replaced) >= 200 or now - last_save >= 5:
+            save()
+        if now - last_report >= 5:
+            elapsed = now - started
+            print(f"   ...{totals['done']} done, {totals['failed']} failed, "
+                  f"{totals['done'] / elapsed:.1f} images/s, {totals['bytes'] / elapsed / 1024 / 1024:.1f} MB/s in")
+            last_report = now
+    
+    # spawn: forking a process that already runs logging and pool threads is unsafe
+    cpu_pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+    io_pool = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='reprocess')
+    read = 0
+    try:
+        while limit is None or read < limit:
+            rows = repository.recipe_images_after(conn, submitted[-1] if submitted else after_id,
+                                                  min(500, limit - read) if limit else 500)
+            conn.commit()
+            if not rows:
+                break
+            for recipe_id, image_url in rows:
+                read += 1
+                submitted.append(recipe_id)
+                if s3_key_from_url(image_url) is None:
+                    # Not one of our objects (an unmirrored external URL)
+                    finished.add(recipe_id)
+                    totals['skipped'] += 1
+                    continue
+                while not in_flight.acquire(timeout=0.5):
+                    drain()
+                io_pool.submit(work, recipe_id, image_url)
+            drain()
+        while len(finished) < len(submitted):
+            drain(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\n⏹️  Interrupted; saving progress of finished images")
+        io_pool.shutdown(wait=True, cancel_futures=True)
+        drain()
+    finally:
+        io_pool.shutdown(wait=True)
+        cpu_pool.shutdown(wait=True)
+        try:
+            save()
+        except psycopg2.Error as e:
+            print(f"❌ Could not save progress: {e}")
+            conn.rollback()
+        close_db_connection(conn)
+    
+    elapsed = time.monotonic() - started
+    print(f"✅ Reprocessed {totals['done']} images in {elapsed:.1f}s ({totals['done'] / elapsed:.1f}/s); "
+          f"{totals['failed']} failed, {totals['skipped']} external URLs skipped. Checkpoint: recipe {after_id}")
+
+def fetch_image_placeholder(image_url):
+    """Download an already stored image and compute its placeholder; None on failure"""
+    try:
+        with span('image-download', IMAGE_STAGE_LATENCY.labels('download')):
+            response = http_session().get(image_url, headers=IMAGE_DOWNLOAD_HEADERS, timeout=15)
+            response.raise_for_status()
+        with Image.open(io.BytesIO(response.content)) as img:
+            return image_placeholder(img)
+    except Exception as e:
+        image_log.warning(f"❌ Could not read image for placeholder: {e}", extra={'image_url': image_url})
+        return None
+
+@app.cli.command()
+@click.option('--batch-size', default=100, show_default=True)
+@click.option('--workers', default=8, show_default=True, help='Concurrent image downloads.')
+def backfill_image_placeholders(batch_size, workers):
+    """Compute size and dominant colour for recipe images stored before placeholders existed."""
+    if not IMAGE_PROCESSING_AVAILABLE:
+        print("❌ Pillow is not installed")
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    stored = failed = 0
+    last_url = ''
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='placeholder') as downloads:
+            while True:
+                urls = repository.image_urls_without_placeholders(conn, last_url, batch_size)
+                if not urls:
+                    break
+                last_url = urls[-1]
+                # Relative /static paths have no URL to fetch; they are skipped
+                remote = [url for url in urls if url.startswith(('http://', 'https://'))]
+                for url, placeholder in zip(remote, downloads.map(fetch_image_placeholder, remote)):
+                    if placeholder is None:
+                        failed += 1
+                        continue
+                    repository.save_image_placeholder(conn, url, *placeholder)
+                    stored += 1
+                # Placeholders live outside recipes, so the row triggers do not announce them
+                repository.notify_cache_flush(conn, RECIPE_CACHE_CHANNEL)
+                conn.commit()
+                print(f"   ...{stored} placeholders stored")
+        print(f"✅ Stored {stored} image placeholders ({failed} images could not be read)")
+    except psycopg2.Error as e:
+        print(f"❌ Backfill failed: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+@app.cli.command()
+@click.option('--k', default=SIMILAR_RECIPES_K, show_default=True, help='Neighbours stored per recipe.')
+@click.option('--max-terms', default=SIMILARITY_MAX_TERMS, show_default=True, help='Vocabulary size cap.')
+def rebuild_similar_recipes(k, max_terms):
+    """Refit the similar-recipes model and recompute every neighbour list."""
+    if not SIMILARITY_AVAILABLE:
+        print("❌ NumPy is not installed")
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    try:
+        started = time.perf_counter()
+        recipes, terms = rebuild_similarity_index(conn, k=k, max_terms=max_terms)
+        conn.commit()
+        print(f"✅ Indexed {recipes} recipes over {terms} terms in {time.perf_counter() - started:.1f}s")
+    except psycopg2.Error as e:
+        print(f"❌ Rebuild failed: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
+@app.cli.command()
+def rebuild_facet_counts():
+    """Recount the /browse facets from scratch."""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Failed to connect to database")
+        return
+    try:
+        values = repository.rebuild_facet_counts(conn)
+        conn.commit()
+        print(f"✅ Rebuilt counts for {values} facet values")
+    except psycopg2.Error as e:
+        print(f"❌ Rebuild failed: {e}")
+        conn.rollback()
+    finally:
+        close_db_connection(conn)
+
 def test_neon_connection():
     """Test connection to Neon PostgreSQL"""
     print("Testing Neon PostgreSQL connection...")
@@ -1327,6 +4669,8 @@ def setup_s3_bucket():
     print("-" * 50)
     
     # Initialize S3 client
+    import boto3
+    from botocore.exceptions import ClientError
     try:
         s3_client = boto3.client(
             's3',
@@ -1502,10 +4846,86 @@ def setup_neon():
     else:
         print("❌ Neon.tech connection failed!")
 
+# Application factory and worker lifecycle
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'recipe-app-jinja'))
+
+_app_created = False
+
+def create_app():
+    """Application factory for gunicorn ('app:create_app()') and python app.py.
+
+    Importing this module does no I/O: the S3 client, HTTP sessions and the
+    database pool are all built on first use. create_app() checks the
+    configuration, logs the startup banner and installs the Jinja bytecode
+    cache; warm_up() then builds the clients before traffic arrives.
+    """
+    global _app_created
+    if _app_created:
+        return app
+
+    if DATABASE_CONFIG is None:
+        db_log.critical("❌DATABASE_URL not set!")
+        raise RuntimeError("DATABASE_URL must be set")
+    db_log.info(f"🐘 Using Neon.tech PostgreSQL: {DATABASE_CONFIG['host']}")
+
+    if S3_CONFIGURED:
+        s3_log.info(f"✅ AWS S3 configured: {AWS_S3_BUCKET}")
+    else:
+        s3_log.warning("⚠️  AWS S3 not configured. Check your environment variables.")
+
+    if not SPOONACULAR_API_KEY:
+        api_log.warning("⚠️  Warning: SPOONACULAR_API_KEY not set. API features will be disabled.")
+
+    # Compiled templates are shared by every worker and survive restarts
+    if JINJA_CACHE_DIR:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+    _app_created = True
+    return app
+
+def after_fork():
+    """Reset per-process state inherited from a preloading gunicorn master"""
+    global db_pool, _s3_client, _http_local, _http_shared
+    # The listener thread and any open sockets belong to the parent
+    configure_logging()
+    db_pool = None
+    _s3_client = None
+    _http_local = threading.local()
+    _http_shared = None
+
+def warm_up(boot_started=None):
+    """Open the pool's connections, build the S3 client and compile templates"""
+    started = time.perf_counter()
+
+    conn = get_db_connection()
+    close_db_connection(conn)
+    get_s3_client()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    # Have a readiness answer before the first probe arrives
+    health_monitor.refresh()
+    health_monitor.ensure_running()
+    cache_listener.ensure_running()
+    if CACHE_WARMER_ENABLED:
+        cache_warmer.ensure_running()
+
+    warm_ms = (time.perf_counter() - started) * 1000
+    boot_ms = (time.perf_counter() - boot_started) * 1000 if boot_started else None
+    if boot_ms is not None:
+        WORKER_BOOT_SECONDS.set(boot_ms / 1000)
+    log.info('worker_ready', extra={'event': 'worker_ready', 'pid': os.getpid(),
+                                    'warm_ms': round(warm_ms, 1),
+                                    'boot_ms': round(boot_ms, 1) if boot_ms is not None else None,
+                                    'db_ready': conn is not None})
+
 if __name__ == '__main__':
-    if init_db():
-        print("🚀 Starting Recipe App...")
-        print("=" * 50)
+    try:
+        create_app()
+    except RuntimeError:
+        exit(1)
+    print("🚀 Starting Recipe App...")
+    print("=" * 50)
     
     # Test database connection first
     if not test_db_connection():
@@ -1518,7 +4938,7 @@ if __name__ == '__main__':
         exit(1)
         
      # Configure S3 if available
-    if s3_client:
+    if S3_CONFIGURED:
         configure_s3_bucket()     
     
     print("🌐 Server starting...")
@@ -0,0 +1,4 @@
+"""Benchmark harness for ME-COOKBOOK (see the Benchmarks section of readme.md)."""
+
+# Password of every user created by bench.seed
+BENCH_PASSWORD = 'bench-password'
@@ -0,0 +1,70 @@
+"""Measure how quickly a fresh worker process becomes ready to serve.
+
+    python -m bench.boot --runs 10
+    python -m bench.boot --importtime        # slowest imports of one cold start
+
+Each run starts a new interpreter and times the three stages a gunicorn
+worker goes through: importing app.py, create_app() and warm_up(). Point
+DATABASE_URL at a reachable database (bench/bench.env) to include opening
+the pool's connections in warm_up.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+app.warm_up()
+warmed = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000,
+                  'create_app_ms': (created - imported) * 1000,
+                  'warm_up_ms': (warmed - created) * 1000,
+                  'total_ms': (warmed - started) * 1000}))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_probe():
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def import_profile(top):
+    """Parse -X importtime output into (cumulative_us, module) pairs"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='show the slowest imports instead')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.importtime:
+        for cumulative_us, module in import_profile(args.top):
+            print(f"{cumulative_us / 1000:>9.1f} ms  {module}")
+        return
+
+    runs = [run_probe() for _ in range(args.runs)]
+    summary = {stage: round(statistics.median(run[stage] for run in runs), 1) for stage in runs[0]}
+    print(json.dumps({'runs': args.runs, 'median': summary}, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Local stand-in for the Spoonacular API.
+
+Replays the recorded payloads in bench/fixtures with configurable latency so
+the app can be load tested without spending quota:
+
+    python -m bench.fake_spoonacular --port 9100 --latency-ms 150 --jitter-ms 50
+
+Point the app at it with SPOONACULAR_BASE_URL=http://127.0.0.1:9100/recipes
+and any non-empty SPOONACULAR_API_KEY. Image URLs in the responses point back
+at this server, which serves generated JPEGs so image mirroring is exercised
+as well.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+from PIL import Image
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+def make_jpeg(seed, size=(556, 370)):
+    """A deterministic noisy gradient so every recipe id gets its own photo-sized image"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    base = rng.integers(0, 256, 3)
+    ramp = np.linspace(0, 80, width)[None, :, None]
+    noise = rng.normal(0, 18, (height, width, 3))
+    pixels = np.clip(base[None, None, :] - 40 + ramp + noise, 0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels, 'RGB')
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+class FakeSpoonacularHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeSpoonacular/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _sleep(self, latency_ms, jitter_ms):
+        delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _send_json(self, payload, points):
+        body = json.dumps(payload).encode()
+        with self.server.lock:
+            self.server.quota_used += points
+            used = self.server.quota_used
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-API-Quota-Request', f"{points:g}")
+        self.send_header('X-API-Quota-Used', f"{used:g}")
+        self.send_header('X-API-Quota-Left', f"{max(self.server.daily_quota - used, 0):g}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _image_url(self, recipe_id):
+        host = self.headers.get('Host', f"127.0.0.1:{self.server.server_port}")
+        return f"http://{host}/images/{recipe_id}.jpg"
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        if not params.get('apiKey') and not parsed.path.startswith('/images/'):
+            self.send_error(401, 'apiKey missing')
+            return
+
+        if parsed.path == '/recipes/complexSearch':
+            self._sleep(self.server.latency_ms, self.server.jitter_ms)
+            query = params.get('query', [''])[0]
+            number = int(params.get('number', ['10'])[0])
+            payload = copy.deepcopy(self.server.search_payload)
+            # Vary ids by query so different searches hit different detail pages
+            offset = sum(map(ord, query)) * 100
+            for result in payload['results']:
+                result['id'] += offset
+                result['image'] = self._image_url(result['id'])
+            payload['results'] = payload['results'][:number]
+            payload['number'] = len(payload['results'])
+            points = 1 + 0.01 * payload['number']
+            if params.get('addRecipeNutrition', ['false'])[0].lower() == 'true':
+                points += 0.025 * payload['number']
+            self._send_json(payload, points)
+            return
+
+        match = re.fullmatch(r'/recipes/(\d+)/information', parsed.path)
+        if match:
+            self._sleep(self.server.latency_ms, self.server.jitter_ms)
+            recipe_id = int(match.group(1))
+            payload = copy.deepcopy(self.server.information_payload)
+            payload['id'] = recipe_id
+            payload['title'] = f"{payload['title']} #{recipe_id}"
+            payload['image'] = self._image_url(recipe_id)
+            self._send_json(payload, 1)
+            return
+
+        match = re.fullmatch(r'/images/(\d+)\.jpg', parsed.path)
+        if match:
+            self._sleep(self.server.image_latency_ms, self.server.jitter_ms)
+            body = make_jpeg(int(match.group(1)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_error(404)
+
+def make_server(host, port, latency_ms=150, jitter_ms=0, image_latency_ms=50,
+                daily_quota=1_000_000, verbose=False):
+    server = ThreadingHTTPServer((host, port), FakeSpoonacularHandler)
+    server.daemon_threads = True
+    server.latency_ms = latency_ms
+    server.jitter_ms = jitter_ms
+    server.image_latency_ms = image_latency_ms
+    server.daily_quota = daily_quota
+    server.quota_used = 0.0
+    server.lock = threading.Lock()
+    server.verbose = verbose
+    server.search_payload = load_fixture('complex_search.json')
+    server.information_payload = load_fixture('information.json')
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--image-latency-ms', type=float, default=50)
+    parser.add_argument('--daily-quota', type=float, default=1_000_000,
+                        help='points reported in X-API-Quota-Left before any spend')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                         args.image_latency_ms, args.daily_quota, args.verbose)
+    print(f"🍝 Fake Spoonacular listening on http://{args.host}:{args.port}/recipes "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Check that gevent mode really overlaps blocking I/O.
+
+    python -m bench.green
+    python -m bench.green --concurrency 20 --delay 0.5
+    python -m bench.green --no-db          # without a Postgres to query
+
+Patches the standard library the way gunicorn.conf.py does for
+GUNICORN_WORKER_CLASS=gevent, imports the app, and then runs N concurrent
+greenlets for each kind of call a request makes:
+
+- outbound HTTP through app.http_session()
+- boto3 S3 calls through app.get_s3_client()
+- Postgres queries (pg_sleep) through the pool, so DATABASE_URL must be
+  reachable unless --no-db skips this check
+- a Pillow transcode, while a ticker greenlet measures how long the hub stalls
+
+HTTP and S3 both go to a local endpoint that answers every request after
+--delay seconds. If the calls yield, a batch finishes in about one delay.
+If they block, it takes N delays. Exits non-zero when any check fails.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import sys
+import time
+
+import gevent
+from gevent.pywsgi import WSGIServer
+
+def slow_endpoint(delay):
+    """WSGI app that sleeps (cooperatively) and answers 200 to anything"""
+    def application(environ, start_response):
+        gevent.sleep(delay)
+        start_response('200 OK', [('Content-Type', 'application/xml'), ('Content-Length', '0')])
+        return [b'']
+    return application
+
+def concurrently(fn, concurrency):
+    started = time.perf_counter()
+    jobs = [gevent.spawn(fn) for _ in range(concurrency)]
+    gevent.joinall(jobs, raise_error=True)
+    return time.perf_counter() - started
+
+def report(name, elapsed, limit):
+    ok = elapsed < limit
+    print(f"{'✅' if ok else '❌'} {name:<28}{elapsed:>8.2f}s (limit {limit:.2f}s)")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.5, help='seconds each call waits upstream')
+    parser.add_argument('--no-db', action='store_true', help='skip the Postgres check instead of failing it')
+    args = parser.parse_args()
+    # Overlapped calls finish in about one delay; allow slack for connection setup
+    limit = args.delay * 2
+
+    server = WSGIServer(('127.0.0.1', 0), slow_endpoint(args.delay), log=None)
+    server.start()
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+
+    # Point the S3 client at the slow endpoint; the database settings are left alone
+    os.environ.update({'AWS_ACCESS_KEY_ID': 'green-check', 'AWS_SECRET_ACCESS_KEY': 'green-check',
+                       'AWS_S3_BUCKET': 'green-check', 'AWS_S3_ENDPOINT_URL': endpoint})
+    import psycopg2.extensions
+    import app
+
+    if not app.GREEN_MODE or psycopg2.extensions.get_wait_callback() is None:
+        print("❌ app did not detect the gevent patches (GREEN_MODE is off)")
+        sys.exit(1)
+    results = []
+
+    results.append(report('http_session().get', concurrently(
+        lambda: app.http_session().get(f"{endpoint}/recipes", timeout=10).raise_for_status(),
+        args.concurrency), limit))
+
+    s3 = app.get_s3_client()
+    results.append(report('s3.head_bucket', concurrently(
+        lambda: s3.head_bucket(Bucket=app.AWS_S3_BUCKET), args.concurrency), limit))
+
+    conn = None if args.no_db or not app.DATABASE_CONFIG else app.get_db_connection()
+    if args.no_db:
+        print("⏭️  postgres pg_sleep              skipped (--no-db)")
+    elif conn is None:
+        print("❌ postgres pg_sleep              no reachable DATABASE_URL (--no-db to skip)")
+        results.append(False)
+    else:
+        app.close_db_connection(conn)
+        def query():
+            conn = app.get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT pg_sleep(%s)', (args.delay,))
+            finally:
+                app.close_db_connection(conn)
+        # Queries beyond the pool size queue for a connection, so batch by pool size
+        results.append(report('postgres pg_sleep', concurrently(
+            query, min(args.concurrency, app.DB_POOL_MAX)), limit))
+
+    from bench.micro import make_photo
+    photo = make_photo(0, 'RGBA')
+    gaps = []
+    def ticker():
+        last = time.perf_counter()
+        while True:
+            gevent.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+    ticking = gevent.spawn(ticker)
+    gevent.sleep(0.05)
+    app.transcode_image(photo)
+    ticking.kill()
+    results.append(report('hub stall during transcode', max(gaps), 0.1))
+
+    server.stop()
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""End-to-end load scenarios against a running app.
+
+Start the stand-ins and the app first (see the Benchmarks section of
+readme.md), then:
+
+    python -m bench.load --base-url http://127.0.0.1:8080 --concurrency 16 \
+        --duration 30 --output bench/results/$(git rev-parse --short HEAD).json
+
+    python -m bench.load --compare bench/results/before.json bench/results/after.json
+
+Results are written as JSON with sorted keys so two runs can be diffed, and
+--compare exits non-zero when a scenario regresses past --threshold.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+from PIL import Image
+
+from bench import BENCH_PASSWORD
+
+SEARCH_TERMS = ['chicken', 'pasta', 'curry', 'salad', 'soup', 'vegan', 'dessert', 'tacos',
+                'breakfast', 'risotto', 'healthy', 'bread']
+
+SCENARIOS = {}
+
+def scenario(name, needs_login=False):
+    def register(fn):
+        SCENARIOS[name] = (fn, needs_login)
+        return fn
+    return register
+
+class Context:
+    """Per-thread state: an HTTP session (logged in when needed) and an RNG"""
+
+    def __init__(self, args, worker_id):
+        self.args = args
+        self.base_url = args.base_url.rstrip('/')
+        self.rng = random.Random(args.seed * 1000 + worker_id)
+        self.worker_id = worker_id
+        self.session = requests.Session()
+
+    def login(self):
+        email = f"bench{self.worker_id % self.args.users}@example.com"
+        response = self.session.post(f"{self.base_url}/login", allow_redirects=False,
+                                     data={'email': email, 'password': BENCH_PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError(f"login failed for {email}: HTTP {response.status_code}")
+
+def redirected_to_recipe(response):
+    return response.status_code == 302 and '/recipe/' in response.headers.get('Location', '')
+
+@scenario('home')
+def home(ctx):
+    response = ctx.session.get(f"{ctx.base_url}/", allow_redirects=False)
+    return response.status_code == 200
+
+@scenario('search')
+def search(ctx):
+    response = ctx.session.get(f"{ctx.base_url}/search", allow_redirects=False,
+                               params={'q': ctx.rng.choice(SEARCH_TERMS)})
+    return response.status_code == 200
+
+@scenario('recipe_detail')
+def recipe_detail(ctx):
+    recipe_id = ctx.rng.randint(1, ctx.args.recipes)
+    response = ctx.session.get(f"{ctx.base_url}/recipe/{recipe_id}", allow_redirects=False)
+    return response.status_code == 200
+
+@scenario('api_detail')
+def api_detail(ctx):
+    # A bounded id pool gives a realistic mix of cache hits and misses
+    spoonacular_id = 654959 + ctx.rng.randrange(ctx.args.api_id_pool)
+    response = ctx.session.get(f"{ctx.base_url}/api_recipe/{spoonacular_id}", allow_redirects=False)
+    return response.status_code == 200
+
+@scenario('create_with_image', needs_login=True)
+def create_with_image(ctx):
+    response = ctx.session.post(
+        f"{ctx.base_url}/create_recipe", allow_redirects=False,
+        data={'title': f"Bench recipe {ctx.rng.random():.6f}",
+              'description': 'Created by the load benchmark.',
+              'ingredients': "• 1 cup flour\n• 2 eggs",
+              'steps': "1. Mix.\n2. Bake."},
+        files={'image': ('photo.jpg', upload_image(), 'image/jpeg')})
+    return redirected_to_recipe(response)
+
+# recipes.spoonacular_id is an INTEGER: start above the ids bench.seed and the
+# fixtures use, in a per-run window of 1000 saves that stays well inside int4
+_save_ids = itertools.count(2_000_001 + (int(time.time()) % 100_000) * 1000)
+
+@scenario('save_api_recipe', needs_login=True)
+def save_api_recipe(ctx):
+    # Fresh ids every time so the full fetch + mirror + insert path is measured
+    spoonacular_id = next(_save_ids)
+    response = ctx.session.post(f"{ctx.base_url}/save_api_recipe/{spoonacular_id}", allow_redirects=False)
+    return redirected_to_recipe(response)
+
+_upload_image = None
+
+def upload_image():
+    """A 12MP-class photo, generated once with a fixed seed"""
+    global _upload_image
+    if _upload_image is None:
+        rng = np.random.default_rng(7)
+        pixels = rng.integers(0, 256, (1500, 2000, 3), dtype=np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels, 'RGB').resize((4000, 3000)).save(buf, format='JPEG', quality=90)
+        _upload_image = buf.getvalue()
+    return _upload_image
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def run_scenario(name, args):
+    fn, needs_login = SCENARIOS[name]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = [None]
+
+    def worker(worker_id):
+        ctx = Context(args, worker_id)
+        if needs_login:
+            ctx.login()
+        warmup_until = time.perf_counter() + args.warmup
+        while True:
+            started = time.perf_counter()
+            if stop_at[0] is not None and started >= stop_at[0]:
+                return
+            try:
+                ok = fn(ctx)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if started < warmup_until:
+                continue
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    stop_at[0] = time.perf_counter() + args.warmup + args.duration
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    completed = len(latencies)
+    return {
+        'requests': completed,
+        'errors': errors[0],
+        'throughput_rps': round(completed / args.duration, 2),
+        'mean_ms': round(sum(latencies) / completed * 1000, 2) if completed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if completed else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if completed else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if completed else None,
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(before_path, after_path, threshold):
+    with open(before_path) as f:
+        before = json.load(f)['scenarios']
+    with open(after_path) as f:
+        after = json.load(f)['scenarios']
+
+    regressions = []
+    print(f"{'scenario':<20}{'rps':>22}{'p95 ms':>24}{'p99 ms':>24}")
+    for name in sorted(set(before) & set(after)):
+        b, a = before[name], after[name]
+        row = f"{name:<20}"
+        for key in ('throughput_rps', 'p95_ms', 'p99_ms'):
+            if b[key] is None or a[key] is None:
+                row += f"{'n/a':>24}"
+                continue
+            change = (a[key] - b[key]) / b[key] if b[key] else 0.0
+            row += f"{b[key]:>9} → {a[key]:<9}({change:+.0%})"
+            worse = change < -threshold if key == 'throughput_rps' else change > threshold
+            if worse:
+                regressions.append(f"{name} {key} {change:+.0%}")
+        print(row)
+
+    if regressions:
+        print("\n❌ Regressions past threshold:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\n✅ No regressions past threshold")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8080')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds per scenario')
+    parser.add_argument('--users', type=int, default=200, help='users created by bench.seed')
+    parser.add_argument('--recipes', type=int, default=5000, help='recipes created by bench.seed')
+    parser.add_argument('--api-id-pool', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON results here (default: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative change counted as a regression in --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    results = {}
+    for name in args.scenarios.split(','):
+        name = name.strip()
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+        print(f"▶️  {name} ({args.concurrency} clients, {args.duration:g}s)", file=sys.stderr)
+        results[name] = run_scenario(name, args)
+        print(f"   {json.dumps(results[name])}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'base_url': args.base_url,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'seed': args.seed,
+        },
+        'scenarios': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        print(f"📄 Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
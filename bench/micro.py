@@ -0,0 +1,204 @@
+"""Microbenchmarks for the text and image hot paths.
+
+    python -m bench.micro                                  # run everything
+    python -m bench.micro --filter transcode               # substring match on names
+    python -m bench.micro --save bench/results/micro-base.json
+    python -m bench.micro --compare bench/results/micro-base.json --threshold 0.15
+
+Inputs are generated from fixed seeds (Spoonacular-style summaries, 30
+ingredient lists, 12MP photos in RGBA/P/LA modes), so numbers are comparable
+between commits on the same machine. Each benchmark reports ops/sec plus the
+peak Python heap and the blocks still held after a single call (via
+tracemalloc; Pillow's pixel buffers live outside the Python allocator, so
+image peaks only show the encoded bytes and wrappers).
+--compare exits non-zero when ops/sec drops, or peak bytes grow, past the
+threshold.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+import app
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def load_information():
+    with open(os.path.join(FIXTURES_DIR, 'information.json')) as f:
+        return json.load(f)
+
+def make_summaries(rng, count=50):
+    """Spoonacular-style summaries: bold tags, links and HTML entities"""
+    base = load_information()['summary']
+    words = ['savory', 'quick', 'weeknight', 'rich', 'bright', 'comforting', 'crowd-pleasing']
+    summaries = []
+    for _ in range(count):
+        extra = ' '.join(f"<b>{rng.choice(words)}</b> &amp; {rng.choice(words)}"
+                         for _ in range(rng.randint(2, 12)))
+        summaries.append(f"{base} {extra} &quot;Enjoy!&quot;")
+    return summaries
+
+def make_ingredients(rng, count=30):
+    names = ['all-purpose flour', 'unsalted butter', 'large eggs', 'whole milk', 'granulated sugar',
+             'kosher salt', 'black pepper', 'extra-virgin olive oil', 'garlic cloves', 'yellow onion',
+             'crushed tomatoes', 'boneless chicken thighs', 'basmati rice', 'parmesan', 'fresh basil']
+    units = ['cups', 'tablespoons', 'teaspoons', 'grams', 'ounces', 'cloves', '']
+    return [{
+        'id': 1000 + n,
+        'name': rng.choice(names),
+        'original': f"{rng.randint(1, 4)} {rng.choice(units)} {rng.choice(names)} &frac12;, <i>divided</i>",
+        'amount': round(rng.uniform(0.25, 4), 2),
+        'unit': rng.choice(units),
+    } for n in range(count)]
+
+def make_steps(rng, count=12):
+    steps = load_information()['analyzedInstructions'][0]['steps']
+    return [{'number': n + 1, 'step': rng.choice(steps)['step'] + ' Stir &amp; taste.'}
+            for n in range(count)]
+
+def make_photo(rng_seed, mode, size=(4000, 3000)):
+    """A 12MP noisy gradient photo encoded as PNG in the requested mode"""
+    rng = np.random.default_rng(rng_seed)
+    width, height = size
+    ramp = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 20, (height, width, 3)).astype(np.float32)
+    rgb = np.clip(ramp * 0.6 + noise + 40, 0, 255).astype(np.uint8)
+    img = Image.fromarray(rgb, 'RGB')
+    if mode == 'RGBA':
+        alpha = Image.fromarray(rng.integers(128, 256, (height, width), dtype=np.uint8), 'L')
+        img.putalpha(alpha)
+    elif mode == 'P':
+        img = img.quantize(colors=256)
+    elif mode == 'LA':
+        img = img.convert('LA')
+    buf = io.BytesIO()
+    img.save(buf, format='PNG', compress_level=1)
+    return buf.getvalue()
+
+def build_benchmarks():
+    """Name -> zero-argument callable; inputs are built once, up front"""
+    rng = random.Random(1234)
+    summaries = make_summaries(rng)
+    ingredients = make_ingredients(rng)
+    steps = make_steps(rng)
+    card_template = app.app.jinja_env.from_string(
+        "{% for r in recipes %}<div>{{ r.title | clean_html }}{{ (r.summary | clean_html)[:100] }}</div>{% endfor %}")
+    information = load_information()
+    stored = {'title': 'Recipe &amp; <b>1</b>', 'description': summaries[0],
+              'ingredients': app.format_ingredients(ingredients), 'steps': app.format_instructions(steps)}
+    cards = [{'title': f"Recipe &amp; <b>{n}</b>", 'summary': summaries[n % len(summaries)]} for n in range(12)]
+
+    benchmarks = {
+        'clean_html_content/summary': lambda: [app.clean_html_content(s) for s in summaries],
+        'clean_html_filter/12_cards': lambda: card_template.render(recipes=cards),
+        'format_ingredients/30': lambda: app.format_ingredients(ingredients),
+        'format_instructions/12': lambda: app.format_instructions(steps),
+        'derive_recipe_fields/stored_recipe': lambda: app.derive_recipe_fields(
+            stored['title'], stored['description'], stored['ingredients'], stored['steps']),
+        'sanitize_recipe_payload/information': lambda: app.sanitize_recipe_payload(dict(information)),
+    }
+    for seed, mode in enumerate(('RGBA', 'P', 'LA')):
+        photo = make_photo(seed, mode)
+        benchmarks[f"transcode_to_jpeg/12mp_{mode}"] = (lambda data=photo: app.transcode_to_jpeg(data))
+    fitted = Image.open(io.BytesIO(make_photo(3, 'RGB', size=(800, 600))))
+    fitted.load()
+    benchmarks['image_placeholder/800x600'] = lambda: app.image_placeholder(fitted)
+    return benchmarks
+
+def measure(fn, min_time, repeats):
+    """ops/sec (median of repeats) plus the heap footprint of one call"""
+    fn()  # warm caches (regex compilation, Jinja, Pillow plugins)
+
+    # Calls per repeat: double until one batch takes at least min_time
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= min_time:
+            break
+        number *= 2
+
+    rates = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rates.append(number / (time.perf_counter() - started))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return {
+        'ops_per_sec': round(statistics.median(rates), 3),
+        'peak_bytes': peak,
+        'retained_blocks': retained,
+    }
+
+def compare(baseline, results, threshold):
+    regressions = []
+    print(f"{'benchmark':<34}{'ops/sec':>34}{'peak bytes':>34}")
+    for name in sorted(set(baseline) & set(results)):
+        b, r = baseline[name], results[name]
+        speed = (r['ops_per_sec'] - b['ops_per_sec']) / b['ops_per_sec']
+        memory = (r['peak_bytes'] - b['peak_bytes']) / b['peak_bytes'] if b['peak_bytes'] else 0.0
+        print(f"{name:<34}{b['ops_per_sec']:>12} → {r['ops_per_sec']:<12}({speed:+.0%})"
+              f"{b['peak_bytes']:>12} → {r['peak_bytes']:<12}({memory:+.0%})")
+        if speed < -threshold:
+            regressions.append(f"{name} ops/sec {speed:+.0%}")
+        if memory > threshold:
+            regressions.append(f"{name} peak bytes {memory:+.0%}")
+    if regressions:
+        print("\n❌ Regressions past threshold:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\n✅ No regressions past threshold")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timing repeat')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--save', metavar='PATH', help='write results as a baseline JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+
+    benchmarks = {name: fn for name, fn in build_benchmarks().items() if args.filter in name}
+    results = {}
+    for name, fn in benchmarks.items():
+        results[name] = measure(fn, args.min_time, args.repeats)
+        print(f"{name:<34}{results[name]['ops_per_sec']:>14.1f} ops/s"
+              f"{results[name]['peak_bytes']:>14} B peak{results[name]['retained_blocks']:>8} retained",
+              file=sys.stderr)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"📄 Baseline written to {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sys.exit(compare(baseline, results, args.threshold))
+
+if __name__ == '__main__':
+    main()
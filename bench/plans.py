@@ -0,0 +1,392 @@
+"""Query-plan checks for the app's queries, against a large seeded database.
+
+    set -a; . bench/bench.env; set +a
+    python -m bench.seed --users 100000 --recipes 1000000
+    python -m bench.plans                                   # check every case
+    python -m bench.plans --filter search_cards             # substring match on names
+    python -m bench.plans --save bench/results/plans-base.json
+    python -m bench.plans --compare bench/results/plans-base.json --threshold 0.25
+
+Cases cover every repository function, the response cache, the quota and
+search-log syncs and the CLI batches; schema setup, the warmer's advisory
+lock and health pings are left out. Each case calls the repository function
+(or app helper) exactly as the app does, on a connection whose cursors first
+run the same statement under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) inside
+a savepoint that is rolled back, then run it for real. Every case is rolled back afterwards, so write
+cases leave the database as they found it.
+
+A case fails when one of its plans
+  - has a Seq Scan on a table of --seq-scan-rows rows or more that the case
+    does not expect to scan (full rebuilds and sweeps do);
+  - has a node whose row estimate is off from the actual rows by more than
+    --estimate-factor (ignoring nodes a LIMIT stopped early);
+  - takes longer than the case's latency budget (times --budget-scale).
+--compare also fails when a case reads --threshold more buffers, or runs
+that much slower, than in the baseline; plan shape changes are listed either
+way. Exits non-zero on any failure.
+"""
+import argparse
+import json
+import os
+import sys
+from functools import lru_cache
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+import app
+import repository
+
+EXPLAIN = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) '
+
+# Nodes that consume their whole input before returning a row, so a LIMIT
+# above them does not stop the nodes below early
+BLOCKING_NODES = {'Sort', 'Aggregate', 'Hash', 'Materialize', 'WindowAgg', 'SetOp'}
+
+class ExplainCursorMixin:
+    """Capture the plan of every statement before running it"""
+
+    def execute(self, query, vars=None):
+        self.connection.explain(query, vars)
+        if self.connection.explain_only:
+            # The plan was the point; hand the caller an empty result
+            return super().execute('SELECT 1 WHERE false')
+        return super().execute(query, vars)
+
+@lru_cache(maxsize=None)
+def explain_cursor_class(cursor_factory):
+    return type(f"Explain{cursor_factory.__name__}", (ExplainCursorMixin, cursor_factory), {})
+
+class ExplainConnection(psycopg2.extensions.connection):
+    """Connection whose cursors record (statement, plan) pairs in .plans"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.plans = []
+        self.capturing = False
+        self.explain_only = False
+
+    def cursor(self, *args, **kwargs):
+        if not self.capturing:
+            return super().cursor(*args, **kwargs)
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = explain_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        # Cases run in one transaction that is rolled back; nothing may end it early
+        if not self.capturing:
+            super().commit()
+
+    def explain(self, query, vars):
+        statement = EXPLAIN.encode() + query if isinstance(query, bytes) else EXPLAIN + query
+        cur = psycopg2.extensions.cursor(self)
+        cur.execute('SAVEPOINT explain')
+        try:
+            cur.execute(statement, vars)
+            self.plans.append((query, cur.fetchone()[0][0]))
+        except psycopg2.Error:
+            # Not explainable (LOCK TABLE and the like)
+            self.plans.append((query, None))
+        finally:
+            cur.execute('ROLLBACK TO SAVEPOINT explain')
+            cur.close()
+
+def case(fn, budget_ms=50, seq_scans=(), explain_only=False):
+    return {'fn': fn, 'budget_ms': budget_ms, 'seq_scans': set(seq_scans), 'explain_only': explain_only}
+
+def sample_params(conn):
+    """Ids, keys and URLs the cases look up, picked from the middle of the data"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT MAX(id) FROM recipes')
+        max_id = cur.fetchone()[0]
+        if not max_id:
+            raise SystemExit("❌ No recipes; run python -m bench.seed first")
+        cur.execute('''SELECT id, author_id, image_url FROM recipes
+                       WHERE id >= %s AND image_url IS NOT NULL ORDER BY id LIMIT 1''', (max_id // 2,))
+        recipe_id, author_id, image_url = cur.fetchone()
+        cur.execute('SELECT spoonacular_id FROM recipes WHERE spoonacular_id IS NOT NULL AND id >= %s LIMIT 1',
+                    (max_id // 2,))
+        spoonacular_id = (cur.fetchone() or (0,))[0]
+        cur.execute('SELECT id, pending_image_key FROM recipes WHERE pending_image_key IS NOT NULL LIMIT 1')
+        pending = cur.fetchone() or (recipe_id, 'uploads/0/none.jpg')
+        cur.execute('SELECT email FROM users WHERE id = %s', (author_id,))
+        email = cur.fetchone()[0]
+        cur.execute('SELECT cache_key FROM api_response_cache ORDER BY cache_key LIMIT 1')
+        cache_key = (cur.fetchone() or ('complexSearch:12:curry',))[0]
+        cur.execute('SELECT terms, weights FROM recipe_similarity WHERE recipe_id = %s', (recipe_id,))
+        terms, weights = cur.fetchone() or ([], [])
+    conn.commit()
+    return {'max_id': max_id, 'recipe_id': recipe_id, 'author_id': author_id, 'image_url': image_url,
+            'spoonacular_id': spoonacular_id, 'pending': pending, 'email': email, 'cache_key': cache_key,
+            'query_terms': app.similarity.query_terms(terms, weights, app.SIMILAR_MIN_SCORE).tolist()}
+
+def quota_budget_sync(conn):
+    """One QuotaBudget.sync() with spend and quota headers to write"""
+    budget = app.QuotaBudget(app.SPOONACULAR_DAILY_QUOTA, app.SPOONACULAR_LEAN_BELOW,
+                             app.SPOONACULAR_CACHE_ONLY_BELOW, app.SPOONACULAR_BUDGET_SYNC_INTERVAL)
+    budget._pid = os.getpid()  # no background sync thread on the bench connection
+    budget.record('complexSearch', 1.0, used=10.0, left=140.0)
+    budget.sync()
+
+def search_log_flush(conn):
+    log = app.SearchLog(app.SEARCH_LOG_FLUSH_INTERVAL)
+    log._pid = os.getpid()  # likewise, no flush thread
+    for query in ('curry', 'banana bread', 'curry'):
+        log.record('complexSearch', query)
+    log.flush()
+
+def build_cases(p):
+    """Name -> case; names group by the repository function or app helper under test"""
+    limit = app.LOCAL_SEARCH_LIMIT
+    page = app.BROWSE_PAGE_SIZE
+    text = ('Bench Soup', 'A <b>bench</b> soup.', '• 1 cup rice\n• 2 cups stock', '1. Simmer the rice.')
+    derived = app.derived_field_params(*text)
+    details = {'dishTypes': ['soup'], 'diets': ['vegan'], 'readyInMinutes': 25}
+    return {
+        # Pages
+        'featured_cards': case(lambda c: repository.featured_cards(c, 4)),
+        'search_cards/common_word': case(lambda c: repository.search_cards(c, 'curry', limit), 100),
+        'search_cards/rare_phrase': case(lambda c: repository.search_cards(c, 'zesty shakshuka', limit)),
+        'search_cards/no_match': case(lambda c: repository.search_cards(c, 'xylophone', limit)),
+        'search_cards/diet': case(lambda c: repository.search_cards(c, '', limit, {'diets': 'vegan'})),
+        'search_cards/type_and_time': case(lambda c: repository.search_cards(
+            c, '', limit, {'dishTypes': 'dessert', 'max_time': 20})),
+        'search_cards/calories': case(lambda c: repository.search_cards(c, '', limit, {'max_calories': 300})),
+        'search_cards/word_and_diet': case(lambda c: repository.search_cards(
+            c, 'curry', limit, {'diets': 'gluten free'}), 100),
+        'recipe_detail': case(lambda c: repository.recipe_detail(c, p['recipe_id'])),
+        'recipe_for_edit': case(lambda c: repository.recipe_for_edit(c, p['recipe_id'], p['author_id'])),
+        'similar_cards': case(lambda c: repository.similar_cards(c, p['recipe_id'], app.SIMILAR_RECIPES_SHOWN)),
+        'browse_cards/all': case(lambda c: repository.browse_cards(c, {}, None, page + 1)),
+        'browse_cards/category': case(lambda c: repository.browse_cards(c, {'dishTypes': 'soup'}, None, page + 1)),
+        'browse_cards/deep_page': case(lambda c: repository.browse_cards(
+            c, {'diets': 'vegan'}, p['max_id'] // 10, page + 1)),
+        'facet_counts': case(repository.facet_counts),
+        'api_recipe_page/first': case(lambda c: repository.api_recipe_page(c, repository.API_LIST_FIELDS, None, 50)),
+        'api_recipe_page/deep': case(lambda c: repository.api_recipe_page(
+            c, repository.API_LIST_FIELDS, p['max_id'] // 10, 50)),
+        'api_recipe': case(lambda c: repository.api_recipe(c, list(repository.API_FIELDS), p['recipe_id'])),
+        'user_by_email': case(lambda c: repository.user_by_email(c, p['email'])),
+        'saved_api_recipe_id': case(lambda c: repository.saved_api_recipe_id(c, p['spoonacular_id'])),
+        'response_cache/get': case(lambda c: app.ResponseCache(1, 60).get(p['cache_key'])),
+        'response_cache/ttl_left': case(lambda c: app.api_cache.ttl_left(p['cache_key'])),
+
+        # Writes (rolled back); triggers run as they would in the app
+        'insert_recipe': case(lambda c: repository.insert_recipe(c, *text, None, p['author_id'], derived,
+                                                                  details=details)),
+        'update_recipe': case(lambda c: repository.update_recipe(c, p['recipe_id'], *text, p['image_url'],
+                                                                 derived, details)),
+        'create_user': case(lambda c: repository.create_user(c, 'plans-bench@example.com', 'x')),
+        'image_key_pending': case(lambda c: repository.image_key_pending(c, p['pending'][1])),
+        'set_pending_image': case(lambda c: repository.set_pending_image(c, p['recipe_id'], 'uploads/1/plans.jpg')),
+        'finish_pending_image': case(lambda c: repository.finish_pending_image(c, *p['pending'], p['image_url'])),
+        'save_image_placeholder': case(lambda c: repository.save_image_placeholder(
+            c, p['image_url'], 800, 600, '#a0522d')),
+        'replace_recipe_images': case(lambda c: repository.replace_recipe_images(
+            c, [(p['recipe_id'], p['image_url'], p['image_url'] + '?v=2')])),
+        'set_recipe_details': case(lambda c: repository.set_recipe_details(c, [(p['recipe_id'], details)])),
+        'save_recipe_similarity': case(lambda c: repository.save_recipe_similarity(
+            c, (p['recipe_id'], [1, 2], [0.6, 0.8], [p['recipe_id'] - 1], [0.5]),
+            [(p['recipe_id'] - 1, [p['recipe_id']], [0.5])])),
+        'delete_image_placeholders': case(lambda c: repository.delete_image_placeholders(c, [p['image_url']])),
+        'response_cache/set': case(lambda c: app.ResponseCache(1, 60).set(p['cache_key'], {'results': []})),
+        'notify_cache_flush': case(lambda c: repository.notify_cache_flush(c, app.RECIPE_CACHE_CHANNEL)),
+
+        # Once per create, edit or save, on the background thread
+        'lock_similarity/shared': case(lambda c: repository.lock_similarity(c, shared=True)),
+        'similarity_model': case(repository.similarity_model),
+        'similarity_document': case(lambda c: repository.similarity_document(c, p['recipe_id'])),
+        'similarity_candidates': case(lambda c: repository.similarity_candidates(
+            c, p['recipe_id'], p['query_terms']), 500),
+        'lock_neighbor_lists': case(lambda c: repository.lock_neighbor_lists(
+            c, [p['recipe_id'] - 1, p['recipe_id'], p['recipe_id'] + 1])),
+
+        # Every few seconds in every worker
+        'quota_budget/sync': case(quota_budget_sync),
+        'search_log/flush': case(search_log_flush),
+
+        # Background jobs and CLI batches
+        'pending_image_uploads': case(repository.pending_image_uploads),
+        'recipe_images_after': case(lambda c: repository.recipe_images_after(c, p['max_id'] // 2, 200)),
+        'image_urls_without_placeholders': case(lambda c: repository.image_urls_without_placeholders(c, '', 100),
+                                                500),
+        'spoonacular_recipes_without_details': case(lambda c: repository.spoonacular_recipes_without_details(
+            c, 0, 100)),
+        # LIMIT without an order: the scan stops at the first rows it finds
+        'recipes_with_images': case(lambda c: repository.recipes_with_images(c, 100), seq_scans=('recipes',)),
+        'image_reprocess_checkpoint': case(lambda c: repository.image_reprocess_checkpoint(c, 'plans')),
+        'save_image_reprocess_checkpoint': case(lambda c: repository.save_image_reprocess_checkpoint(
+            c, 'plans', p['max_id'] // 2, 1000, 3)),
+        'recipes_missing_derived_fields/all': case(lambda c: repository.recipes_missing_derived_fields(
+            c, p['max_id'] // 2, True, 200), 200),
+        'set_derived_fields': case(lambda c: repository.set_derived_fields(c, [(p['recipe_id'], derived)])),
+        # Once per warm pass, over a week of a small table
+        'search_log/popular': case(lambda c: app.SearchLog.popular(c, app.CACHE_WARM_TOP_QUERIES,
+                                                                   app.SEARCH_LOG_DAYS),
+                                   200, ('search_query_counts',)),
+        'search_log/prune': case(lambda c: app.SearchLog.prune(c, app.SEARCH_LOG_DAYS), 200, ('search_query_counts',)),
+
+        # Whole-table work by design: plans are recorded, latency is not budgeted
+        'referenced_images': case(lambda c: list(repository.referenced_images(c)), None,
+                                  ('recipes',), explain_only=True),
+        'cached_response_images': case(lambda c: list(repository.cached_response_images(c, 'api-search:')), None,
+                                       ('api_response_cache',), explain_only=True),
+        # Until it finds a batch of unbackfilled rows, which on a backfilled table is never
+        'recipes_missing_derived_fields/missing': case(lambda c: repository.recipes_missing_derived_fields(
+            c, 0, False, 200), None, ('recipes',)),
+        'save_similarity_index': case(lambda c: repository.save_similarity_index(
+            c, ['i:rice', 'i:stock'], [1.5, 2.5], [(p['recipe_id'], [0, 1], [0.6, 0.8], [], [])]),
+            None, ('recipe_similarity',), explain_only=True),
+        'similarity_documents': case(lambda c: list(repository.similarity_documents(c)), None, ('recipes',),
+                                     explain_only=True),
+        # Runs for real: its INSERT only fits once the DELETE before it has happened
+        'rebuild_facet_counts': case(repository.rebuild_facet_counts, None, ('recipes', 'recipe_facet_counts')),
+    }
+
+def plan_nodes(node, limited=False, depth=0):
+    """Yield (node, depth, limited) depth-first; limited means a LIMIT may have stopped it early"""
+    yield node, depth, limited
+    below = node['Node Type'] == 'Limit' or (limited and node['Node Type'] not in BLOCKING_NODES)
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child, below, depth + 1)
+
+def node_label(node):
+    label = node['Node Type']
+    if 'Relation Name' in node:
+        label += f" on {node['Relation Name']}"
+    if 'Index Name' in node:
+        label += f" using {node['Index Name']}"
+    return label
+
+def check_plan(plan, expected_seq_scans, table_rows, seq_scan_rows, estimate_factor, min_rows):
+    """Problems in one EXPLAIN result"""
+    problems = []
+    for node, _, limited in plan_nodes(plan['Plan']):
+        relation = node.get('Relation Name')
+        if (node['Node Type'] == 'Seq Scan' and relation not in expected_seq_scans
+                and table_rows.get(relation, 0) >= seq_scan_rows):
+            problems.append(f"Seq Scan on {relation} ({table_rows[relation]:,.0f} rows)")
+        if not node.get('Actual Loops'):
+            continue
+        estimated, actual = node['Plan Rows'], node['Actual Rows']
+        if actual >= min_rows and actual > estimated * estimate_factor:
+            problems.append(f"{node_label(node)} estimated {estimated:,} rows, got {actual:,}")
+        elif not limited and estimated >= min_rows and estimated > actual * estimate_factor:
+            problems.append(f"{node_label(node)} estimated {estimated:,} rows, got {actual:,}")
+    return problems
+
+def run_case(conn, spec, runs):
+    """Plans of the case's statements on its last run"""
+    for _ in range(runs):
+        conn.plans = []
+        conn.capturing, conn.explain_only = True, spec['explain_only']
+        try:
+            spec['fn'](conn)
+        finally:
+            conn.capturing = conn.explain_only = False
+            conn.rollback()
+    return conn.plans
+
+def summarize(plans):
+    explained = [plan for _, plan in plans if plan is not None]
+    return {
+        'execution_ms': round(sum(plan['Execution Time'] for plan in explained), 3),
+        'buffers': sum(plan['Plan'].get('Shared Hit Blocks', 0) + plan['Plan'].get('Shared Read Blocks', 0)
+                       for plan in explained),
+        'plan': [f"{'  ' * depth}{node_label(node)}"
+                 for plan in explained for node, depth, _ in plan_nodes(plan['Plan'])],
+    }
+
+def table_sizes(conn):
+    with conn.cursor() as cur:
+        cur.execute('''SELECT relname, reltuples FROM pg_class
+                       WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace''')
+        sizes = dict(cur.fetchall())
+    conn.commit()
+    return sizes
+
+def compare(baseline, results, threshold):
+    """Regressions against a saved run; plan shape changes are printed as well"""
+    regressions = []
+    for name in sorted(set(baseline) & set(results)):
+        b, r = baseline[name], results[name]
+        if b['plan'] != r['plan']:
+            print(f"\n🔀 {name} plan changed:")
+            print("\n".join(f"    - {line}" for line in b['plan']))
+            print("\n".join(f"    + {line}" for line in r['plan']))
+        if b['buffers'] and (r['buffers'] - b['buffers']) / b['buffers'] > threshold:
+            regressions.append(f"{name} buffers {b['buffers']} → {r['buffers']}")
+        # Sub-millisecond queries are too noisy to compare by ratio alone
+        if r['execution_ms'] - b['execution_ms'] > max(1.0, b['execution_ms'] * threshold):
+            regressions.append(f"{name} execution {b['execution_ms']} ms → {r['execution_ms']} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--runs', type=int, default=2, help='runs per case; the last one is checked (warm cache)')
+    parser.add_argument('--seq-scan-rows', type=float, default=10000,
+                        help='tables at least this large must not be scanned sequentially')
+    parser.add_argument('--estimate-factor', type=float, default=10,
+                        help='largest allowed ratio between estimated and actual rows')
+    parser.add_argument('--estimate-min-rows', type=int, default=1000,
+                        help='ignore misestimates on nodes with fewer rows than this')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='multiply every latency budget')
+    parser.add_argument('--save', metavar='PATH', help='write results as a baseline JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    args = parser.parse_args()
+
+    if app.DATABASE_CONFIG is None:
+        raise SystemExit("❌ DATABASE_URL not set")
+    conn = psycopg2.connect(connection_factory=ExplainConnection, **app.DATABASE_CONFIG)
+    # App helpers borrow "pooled" connections; hand them this one
+    app.get_db_connection = lambda: conn
+    app.close_db_connection = lambda _: None
+
+    params = sample_params(conn)
+    table_rows = table_sizes(conn)
+    cases = {name: spec for name, spec in build_cases(params).items() if args.filter in name}
+
+    results, failures = {}, []
+    print(f"{'case':<40}{'ms':>10}{'buffers':>10}  plan", file=sys.stderr)
+    for name, spec in cases.items():
+        plans = run_case(conn, spec, args.runs)
+        results[name] = summarize(plans)
+        problems = []
+        for _, plan in plans:
+            if plan is not None:
+                problems += check_plan(plan, spec['seq_scans'], table_rows, args.seq_scan_rows,
+                                       args.estimate_factor, args.estimate_min_rows)
+        budget = spec['budget_ms'] * args.budget_scale if spec['budget_ms'] is not None else None
+        if budget is not None and results[name]['execution_ms'] > budget:
+            problems.append(f"{results[name]['execution_ms']} ms over its {budget:g} ms budget")
+        failures += [f"{name}: {problem}" for problem in problems]
+        top = results[name]['plan'][0].strip() if results[name]['plan'] else '(not explainable)'
+        print(f"{'❌' if problems else '✅'} {name:<37}{results[name]['execution_ms']:>10.2f}"
+              f"{results[name]['buffers']:>10}  {top}", file=sys.stderr)
+    conn.close()
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"📄 Baseline written to {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        failures += compare(baseline, results, args.threshold)
+
+    if failures:
+        print("\n❌ Plan checks failed:")
+        for line in failures:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("\n✅ Every plan within its checks")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Create the schema and fill the benchmark database with deterministic data.
+
+    set -a; . bench/bench.env; set +a
+    python -m bench.seed --users 200 --recipes 5000             # load scenarios
+    python -m bench.seed --users 100000 --recipes 1000000       # query plans (bench.plans)
+
+Every run with the same --seed produces the same rows. The load scenarios
+log in as bench0@example.com .. bench{N-1}@example.com with BENCH_PASSWORD.
+
+Rows are shaped like production rather than uniform: a few prolific authors
+and a long tail, creation times spread over three years, a fifth of the
+recipes saved from Spoonacular (some still without details), image
+placeholders for most images, a trickle of pending uploads, precomputed
+similar-recipe lists, and search counts and cached responses for the cache
+warmer. Recipes go in by chunks, so memory stays flat at any size; the
+per-row triggers are disabled during the load and the facet counts rebuilt
+once at the end.
+"""
+import argparse
+import math
+import random
+import sys
+from datetime import datetime, timedelta
+
+import psycopg2
+import psycopg2.extras
+from werkzeug.security import generate_password_hash
+
+import app
+import repository
+from bench import BENCH_PASSWORD
+
+ADJECTIVES = ['Creamy', 'Spicy', 'Smoky', 'Crispy', 'Zesty', 'Hearty', 'Classic', 'Rustic',
+              'Easy', 'Garlicky', 'Roasted', 'Grilled', 'Lemony', 'Herbed', 'Sticky', 'Golden']
+DISHES = ['Risotto', 'Chicken Curry', 'Lasagna', 'Pancakes', 'Tacos', 'Buddha Bowl', 'Soup',
+          'Banana Bread', 'Salmon', 'Chili', 'Pad Thai', 'Salad', 'Brownies', 'Frittata',
+          'Burgers', 'Stir Fry', 'Gnocchi', 'Shakshuka', 'Ramen', 'Paella']
+INGREDIENTS = ['flour', 'butter', 'eggs', 'milk', 'sugar', 'salt', 'black pepper', 'olive oil',
+               'garlic', 'onion', 'tomatoes', 'chicken breast', 'rice', 'parmesan', 'basil',
+               'lemon', 'chickpeas', 'coconut milk', 'ginger', 'soy sauce', 'spinach', 'mushrooms',
+               'bell pepper', 'cumin', 'paprika', 'honey', 'yogurt', 'carrots', 'potatoes', 'beef']
+UNITS = ['cup', 'cups', 'tbsp', 'tsp', 'g', 'oz', 'cloves', 'pinch']
+STEP_VERBS = ['Preheat the oven and', 'Whisk together', 'Finely chop', 'Saute', 'Simmer',
+              'Fold in', 'Season', 'Bake', 'Roast', 'Stir in', 'Drizzle', 'Serve with']
+
+def fake_recipe(rng):
+    title = f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}"
+    picked = rng.sample(INGREDIENTS, rng.randint(5, 14))
+    ingredients = "\n".join(f"• {rng.randint(1, 4)} {rng.choice(UNITS)} {name}" for name in picked)
+    steps = "\n".join(f"{n}. {rng.choice(STEP_VERBS)} the {rng.choice(picked)} for {rng.randint(2, 30)} minutes."
+                      for n in range(1, rng.randint(4, 10)))
+    description = (f"A {title.lower()} with {', '.join(picked[:3])} that comes together in "
+                   f"{rng.randint(15, 90)} minutes. " * rng.randint(1, 3)).strip()
+    return title, description, ingredients, steps
+
+def fake_details(rng, saved=False):
+    """Categories, diets and ready time so /browse and the search filters have data"""
+    details = {
+        'dishTypes': sorted(rng.sample(app.DISH_TYPE_FILTERS, rng.randint(1, 2))),
+        'diets': sorted(rng.sample(app.DIET_FILTERS, rng.randint(0, 2))),
+        'readyInMinutes': rng.randint(10, 120),
+    }
+    if saved:
+        details['nutrition'] = {'calories': rng.randint(80, 1400)}
+    return details
+
+def fake_author(rng, users):
+    """Log-uniform author ids: a few prolific authors and a long tail"""
+    return max(1, min(users, int(users ** rng.random())))
+
+def recipe_rows(rng, start, count, recipes, users, started_at):
+    span = timedelta(days=3 * 365)
+    for n in range(start, start + count):
+        title, description, ingredients, steps = fake_recipe(rng)
+        image_url = (f"{app.AWS_S3_ENDPOINT_URL or 'https://example.com'}/{app.AWS_S3_BUCKET}/recipes/seed-{n}.jpg"
+                     if rng.random() < 0.7 else None)
+        saved = rng.random() < 0.2
+        # Saved before the details column existed: left for backfill-recipe-details
+        details = fake_details(rng, saved) if not saved or rng.random() < 0.9 else None
+        pending = f"uploads/{rng.randint(1, users)}/seed-{n}.jpg" if rng.random() < 0.0005 else None
+        created_at = started_at + span * (n / recipes) + timedelta(seconds=rng.randint(0, 3600))
+        yield (title, description, ingredients, steps, image_url, fake_author(rng, users),
+               rng.randint(1, 2_000_000) if saved else None, 'spoonacular' if saved else 'user',
+               *app.derived_field_params(title, description, ingredients, steps),
+               psycopg2.extras.Json(details) if details else None, pending, created_at)
+
+def seed_recipes(cur, conn, rng, users, recipes, chunk):
+    started_at = datetime.now() - timedelta(days=3 * 365)
+    for start in range(0, recipes, chunk):
+        rows = list(recipe_rows(rng, start, min(chunk, recipes - start), recipes, users, started_at))
+        psycopg2.extras.execute_values(
+            cur, '''INSERT INTO recipes (title, description, ingredients, steps, image_url, author_id,
+                                         spoonacular_id, source, title_clean, description_clean,
+                                         ingredient_list, step_list, details, pending_image_key,
+                                         created_at) VALUES %s''', rows, page_size=1000)
+        placeholders = [(row[4], 800, 600, f"#{rng.randrange(0x1000000):06x}") for row in rows
+                        if row[4] and rng.random() < 0.8]
+        if placeholders:
+            psycopg2.extras.execute_values(
+                cur, 'INSERT INTO image_placeholders (image_url, width, height, color) VALUES %s',
+                placeholders, page_size=1000)
+        conn.commit()
+        print(f"  {start + len(rows)}/{recipes} recipes", file=sys.stderr)
+
+def fake_terms(rng, vocabulary=app.SIMILARITY_MAX_TERMS):
+    """Log-uniform term ids (low ids are the common words) weighted like IDF, unit length"""
+    terms = sorted({int(vocabulary ** rng.random()) - 1 for _ in range(rng.randint(8, 20))})
+    weights = [math.log(2 + term) for term in terms]
+    norm = math.sqrt(sum(w * w for w in weights))
+    return terms, [round(w / norm, 4) for w in weights]
+
+def seed_similarity(cur, conn, rng, recipes, k, chunk):
+    """Random vectors and neighbour lists; plans only depend on their shape, not their quality"""
+    for start in range(1, recipes + 1, chunk):
+        rows = []
+        for recipe_id in range(start, min(start + chunk, recipes + 1)):
+            similar_ids = [i for i in rng.sample(range(1, recipes + 1), min(k + 1, recipes))
+                           if i != recipe_id][:k]
+            scores = sorted((round(rng.uniform(0.1, 0.9), 3) for _ in similar_ids), reverse=True)
+            rows.append((recipe_id, *fake_terms(rng), similar_ids, scores))
+        psycopg2.extras.execute_values(
+            cur, 'INSERT INTO recipe_similarity (recipe_id, terms, weights, similar_ids, scores) VALUES %s',
+            rows, template='(%s, %s::int[], %s::real[], %s::int[], %s::real[])', page_size=1000)
+        conn.commit()
+
+def seed_search_log(cur, rng, days=30, queries=2000, cache_entries=10000):
+    """Search counts and cached responses, so the cache warmer's queries have data"""
+    words = [dish.lower() for dish in DISHES] + INGREDIENTS
+    today = datetime.now().date()
+    counts = {}
+    for _ in range(days * queries):
+        key = (today - timedelta(days=rng.randrange(days)), rng.choice(('complexSearch', 'api-search')),
+               ' '.join(rng.sample(words, rng.randint(1, 2))))
+        # A handful of queries account for most searches
+        counts[key] = counts.get(key, 0) + int(1 / (rng.random() + 0.01))
+    psycopg2.extras.execute_values(
+        cur, 'INSERT INTO search_query_counts (day, kind, query, searches) VALUES %s',
+        [(*key, searches) for key, searches in counts.items()], page_size=1000)
+    now = datetime.now()
+    entries = {}
+    for n in range(cache_entries):
+        key = (app.search_cache_key('complexSearch', ' '.join(rng.sample(words, 2)), 12) if n % 2
+               else app.recipe_details_cache_key(rng.randint(1, 2_000_000)))
+        entries[key] = now + timedelta(seconds=rng.randint(-3600, app.SPOONACULAR_CACHE_TTL))
+    psycopg2.extras.execute_values(
+        cur, 'INSERT INTO api_response_cache (cache_key, payload, expires_at) VALUES %s',
+        [(key, psycopg2.extras.Json({'results': []}), expires_at) for key, expires_at in entries.items()],
+        page_size=1000)
+
+def seed(users, recipes, seed_value, chunk=10000, similar=app.SIMILAR_RECIPES_K):
+    rng = random.Random(seed_value)
+    if not app.init_db():
+        raise SystemExit("❌ Could not initialize the schema")
+
+    conn = psycopg2.connect(**app.DATABASE_CONFIG)
+    cur = conn.cursor()
+    cur.execute('''TRUNCATE recipes, users, api_response_cache, recipe_facet_counts, image_placeholders,
+                            search_query_counts RESTART IDENTITY CASCADE''')
+
+    # One hash for every bench user: hashing is deliberately slow
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    psycopg2.extras.execute_values(
+        cur, "INSERT INTO users (email, password_hash) VALUES %s",
+        [(f"bench{n}@example.com", password_hash) for n in range(users)], page_size=1000)
+
+    # Per-row facet counting and cache NOTIFYs would dominate a large load
+    for table in ('recipes', 'recipe_similarity'):
+        cur.execute(f'ALTER TABLE {table} DISABLE TRIGGER USER')
+    conn.commit()
+    try:
+        seed_recipes(cur, conn, rng, users, recipes, chunk)
+        if similar:
+            seed_similarity(cur, conn, rng, recipes, similar, chunk)
+        seed_search_log(cur, rng)
+        repository.rebuild_facet_counts(conn)
+        conn.commit()
+    finally:
+        conn.rollback()
+        for table in ('recipes', 'recipe_similarity'):
+            cur.execute(f'ALTER TABLE {table} ENABLE TRIGGER USER')
+        conn.commit()
+
+    conn.autocommit = True
+    cur.execute("VACUUM ANALYZE")
+    cur.close()
+    conn.close()
+    print(f"✅ Seeded {users} users and {recipes} recipes")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk', type=int, default=10000, help='recipes inserted per transaction')
+    parser.add_argument('--similar', type=int, default=app.SIMILAR_RECIPES_K,
+                        help='neighbours stored per recipe (0 skips recipe_similarity)')
+    args = parser.parse_args()
+    seed(args.users, args.recipes, args.seed, args.chunk, args.similar)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Gunicorn settings for ME-COOKBOOK.
+
+Start the production server from the project directory with:
+
+    gunicorn
+
+Gunicorn picks this file up automatically from the working directory; it
+serves 'app:create_app()'.
+
+GUNICORN_WORKER_CLASS=gevent runs each worker as one process serving up to
+GUNICORN_WORKER_CONNECTIONS requests on greenlets, for traffic that mostly
+waits on Spoonacular, image hosts, S3 and Postgres.
+"""
+import os
+
+# The standard library has to be patched before the preloaded app creates its
+# locks, semaphores and sockets, so this happens first, in the master.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+import glob
+import shutil
+import sys
+import tempfile
+import time
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Import the app once in the master so each forked worker starts ready to
+# serve instead of repeating the imports; GUNICORN_PRELOAD=0 turns this off
+# (needed for code reloads on HUP).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+# Prometheus multiprocess mode: each worker writes its samples to files in
+# this directory and /metrics merges them, so one scrape sees every worker.
+prometheus_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'recipe-app-metrics'))
+# A preloaded app creates its metrics before on_starting runs
+os.makedirs(prometheus_dir, exist_ok=True)
+
+# Memory profiles are one memory-<pid>.json per worker, merged the same way
+memory_profile_dir = os.environ.setdefault(
+    'MEMORY_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'recipe-app-memory'))
+
+def remove_memory_profile(pattern):
+    for path in glob.glob(os.path.join(memory_profile_dir, pattern)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def on_starting(server):
+    # Samples left over from a previous run would be merged into the new one
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+    remove_memory_profile('memory-*.json')
+
+def child_exit(server, worker):
+    remove_memory_profile(f'memory-{worker.pid}.json')
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    worker.boot_started = time.perf_counter()
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.after_fork()
+
+def post_worker_init(worker):
+    # Runs once the worker has loaded the app, before it accepts connections
+    import app
+    app.warm_up(boot_started=getattr(worker, 'boot_started', None))
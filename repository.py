@@ -0,0 +1,528 @@
+"""Recipe and user data access.
+
+Every query the routes run against `recipes` and `users` lives here, each
+selecting only the columns its page needs. Functions take an open
+connection from the app's pool and leave commit/rollback to the caller;
+psycopg2 errors propagate.
+
+Rows come back as small __slots__ objects instead of DictRow, so a card
+listing never transfers or holds the ingredient and step text.
+"""
+import psycopg2.extras
+
+class Row:
+    """Base for slotted rows built from a plain cursor tuple in __slots__ order"""
+    __slots__ = ()
+
+    def __init__(self, values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def fetch_one(cls, cur):
+        row = cur.fetchone()
+        return cls(row) if row else None
+
+    @classmethod
+    def fetch_all(cls, cur):
+        return [cls(row) for row in cur.fetchall()]
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class RecipeCard(Row):
+    """What home and search cards show"""
+    __slots__ = ('id', 'title_clean', 'description_clean', 'image_url', 'author_id', 'email',
+                 'ready_in_minutes', 'image_width', 'image_height', 'image_color',
+                 'raw_title', 'raw_description')
+
+class RecipeDetail(Row):
+    """Everything the recipe page renders"""
+    __slots__ = ('id', 'title_clean', 'description_clean', 'ingredient_list', 'step_list',
+                 'image_url', 'author_id', 'email', 'image_width', 'image_height', 'image_color',
+                 'image_pending', 'raw_title', 'raw_description', 'raw_ingredients', 'raw_steps')
+
+class RecipeEdit(Row):
+    """The author's original text, as the edit form shows it"""
+    __slots__ = ('id', 'title', 'description', 'ingredients', 'steps', 'image_url', 'details')
+
+class RecipeImage(Row):
+    __slots__ = ('id', 'title', 'image_url')
+
+class FacetCount(Row):
+    __slots__ = ('facet', 'value', 'recipes')
+
+class User(Row):
+    __slots__ = ('id', 'email', 'password_hash')
+
+# The raw_* columns are only non-NULL for rows that predate the derived-field
+# backfill; the app rebuilds the derived fields from them (with_derived_fields).
+# Image size and colour come from image_placeholders (alias p), NULL until the
+# image has been processed or backfilled.
+CARD_COLUMNS = '''r.id, r.title_clean, r.description_clean, r.image_url, r.author_id, u.email,
+                  (r.details->>'readyInMinutes')::int, p.width, p.height, p.color,
+                  CASE WHEN r.step_list IS NULL THEN r.title END,
+                  CASE WHEN r.step_list IS NULL THEN r.description END'''
+
+DETAIL_COLUMNS = '''r.id, r.title_clean, r.description_clean, r.ingredient_list, r.step_list,
+                    r.image_url, r.author_id, u.email, p.width, p.height, p.color,
+                    r.pending_image_key IS NOT NULL,
+                    CASE WHEN r.step_list IS NULL THEN r.title END,
+                    CASE WHEN r.step_list IS NULL THEN r.description END,
+                    CASE WHEN r.step_list IS NULL THEN r.ingredients END,
+                    CASE WHEN r.step_list IS NULL THEN r.steps END'''
+
+# Recipe pages
+
+def featured_cards(conn, limit):
+    with conn.cursor() as cur:
+        cur.execute(f'''SELECT {CARD_COLUMNS}
+                        FROM recipes r
+                        LEFT JOIN users u ON r.author_id = u.id
+                        LEFT JOIN image_placeholders p ON p.image_url = r.image_url
+                        ORDER BY r.created_at DESC
+                        LIMIT %s''', (limit,))
+        return RecipeCard.fetch_all(cur)
+
+def filter_clauses(filters):
+    """WHERE conditions for search filters over recipes.details.
+
+    The expressions match the indexes init_db() creates: containment uses
+    the jsonb_path_ops GIN index, time and calories their expression indexes.
+    """
+    clauses, params = [], []
+    contains = {key: [filters[key]] for key in ('diets', 'cuisines', 'dishTypes') if key in filters}
+    if contains:
+        clauses.append('r.details @> %s')
+        params.append(psycopg2.extras.Json(contains))
+    if 'max_time' in filters:
+        clauses.append("(r.details->>'readyInMinutes')::int <= %s")
+        params.append(filters['max_time'])
+    if 'max_calories' in filters:
+        clauses.append("(r.details->'nutrition'->>'calories')::numeric <= %s")
+        params.append(filters['max_calories'])
+    return clauses, params
+
+def search_cards(conn, query, limit, filters=None):
+    """Cards matching query (title or description) and filters, newest first"""
+    clauses, params = filter_clauses(filters or {})
+    if query:
+        pattern = f'%{query}%'
+        clauses.insert(0, '(r.title ILIKE %s OR r.description ILIKE %s)')
+        params[:0] = [pattern, pattern]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with conn.cursor() as cur:
+        cur.execute(f'''SELECT {CARD_COLUMNS}
+                        FROM recipes r
+                        LEFT JOIN users u ON r.author_id = u.id
+                        LEFT JOIN image_placeholders p ON p.image_url = r.image_url
+                        {where}
+                        ORDER BY r.created_at DESC
+                        LIMIT %s''', (*params, limit))
+        return RecipeCard.fetch_all(cur)
+
+def recipe_detail(conn, recipe_id):
+    with conn.cursor() as cur:
+        cur.execute(f'''SELECT {DETAIL_COLUMNS}
+                        FROM recipes r
+                        LEFT JOIN users u ON r.author_id = u.id
+                        LEFT JOIN image_placeholders p ON p.image_url = r.image_url
+                        WHERE r.id = %s''', (recipe_id,))
+        return RecipeDetail.fetch_one(cur)
+
+def recipe_for_edit(conn, recipe_id, author_id):
+    """The recipe if author_id owns it, else None"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT id, title, description, ingredients, steps, image_url, details
+                       FROM recipes
+                       WHERE id = %s AND author_id = %s''', (recipe_id, author_id))
+        return RecipeEdit.fetch_one(cur)
+
+def browse_cards(conn, filters, before_id, limit):
+    """Cards matching filters, newest first, from before_id (keyset pagination)"""
+    clauses, params = filter_clauses(filters)
+    if before_id:
+        clauses.append('r.id < %s')
+        params.append(before_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with conn.cursor() as cur:
+        cur.execute(f'''SELECT {CARD_COLUMNS}
+                        FROM recipes r
+                        LEFT JOIN users u ON r.author_id = u.id
+                        LEFT JOIN image_placeholders p ON p.image_url = r.image_url
+                        {where}
+                        ORDER BY r.id DESC
+                        LIMIT %s''', (*params, limit))
+        return RecipeCard.fetch_all(cur)
+
+def facet_counts(conn):
+    """Non-empty facet values, most recipes first (kept current by a trigger)"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT facet, value, recipes FROM recipe_facet_counts
+                       WHERE recipes > 0
+                       ORDER BY facet, recipes DESC, value''')
+        return FacetCount.fetch_all(cur)
+
+def rebuild_facet_counts(conn):
+    """Recount every facet from recipes.details; returns the number of values"""
+    with conn.cursor() as cur:
+        # Block writers so the trigger can't apply a delta mid-rebuild
+        cur.execute('LOCK TABLE recipes IN SHARE MODE')
+        cur.execute('DELETE FROM recipe_facet_counts')
+        cur.execute('''INSERT INTO recipe_facet_counts (facet, value, recipes)
+                       SELECT f.facet, f.value, COUNT(*)
+                       FROM recipes r, recipe_facets(r.details) f
+                       GROUP BY f.facet, f.value''')
+        return cur.rowcount
+
+def recipes_with_images(conn, limit):
+    with conn.cursor() as cur:
+        cur.execute('''SELECT id, title, image_url FROM recipes
+                       WHERE image_url IS NOT NULL
+                       LIMIT %s''', (limit,))
+        return RecipeImage.fetch_all(cur)
+
+def save_image_placeholder(conn, image_url, width, height, color):
+    with conn.cursor() as cur:
+        cur.execute('''INSERT INTO image_placeholders (image_url, width, height, color)
+                       VALUES (%s, %s, %s, %s)
+                       ON CONFLICT (image_url) DO UPDATE
+                       SET width = EXCLUDED.width, height = EXCLUDED.height, color = EXCLUDED.color''',
+                    (image_url, width, height, color))
+
+def notify_cache_flush(conn, channel):
+    """Ask every worker's page cache to drop everything once this transaction commits"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_notify(%s, %s)', (channel, '{"flush": true}'))
+
+def image_urls_without_placeholders(conn, after_url, limit):
+    """Distinct recipe image URLs with no placeholder yet, in URL order from after_url"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT DISTINCT r.image_url FROM recipes r
+                       LEFT JOIN image_placeholders p ON p.image_url = r.image_url
+                       WHERE r.image_url IS NOT NULL AND p.image_url IS NULL AND r.image_url > %s
+                       ORDER BY r.image_url
+                       LIMIT %s''', (after_url, limit))
+        return [row[0] for row in cur.fetchall()]
+
+def recipe_images_after(conn, after_id, limit):
+    """(id, image_url) of recipes with a settled image, in id order from after_id"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT id, image_url FROM recipes
+                       WHERE id > %s AND image_url IS NOT NULL AND pending_image_key IS NULL
+                       ORDER BY id
+                       LIMIT %s''', (after_id, limit))
+        return cur.fetchall()
+
+def replace_recipe_images(conn, rows):
+    """Point recipes at reprocessed images: (recipe_id, old_url, new_url) rows.
+
+    A recipe whose image changed since it was read keeps the newer one.
+    """
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_batch(
+            cur, 'UPDATE recipes SET image_url = %s WHERE id = %s AND image_url = %s',
+            [(new_url, recipe_id, old_url) for recipe_id, old_url, new_url in rows])
+
+def image_reprocess_checkpoint(conn, job):
+    """Recipe id the named reprocessing job has finished through (0 if new)"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT last_id FROM image_reprocess_checkpoints WHERE job = %s', (job,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+def save_image_reprocess_checkpoint(conn, job, last_id, processed, failed):
+    with conn.cursor() as cur:
+        cur.execute('''INSERT INTO image_reprocess_checkpoints (job, last_id, processed, failed, updated_at)
+                       VALUES (%s, %s, %s, %s, NOW())
+                       ON CONFLICT (job) DO UPDATE
+                       SET last_id = EXCLUDED.last_id,
+                           processed = image_reprocess_checkpoints.processed + EXCLUDED.processed,
+                           failed = image_reprocess_checkpoints.failed + EXCLUDED.failed,
+                           updated_at = NOW()''', (job, last_id, processed, failed))
+
+def referenced_images(conn, batch_size=5000):
+    """Yield (image_url, pending_image_key) for every recipe holding an image.
+
+    Streams through a server-side cursor, so the rows never sit in memory
+    all at once.
+    """
+    with conn.cursor(name='referenced_images') as cur:
+        cur.itersize = batch_size
+        cur.execute('''SELECT image_url, pending_image_key FROM recipes
+                       WHERE image_url IS NOT NULL OR pending_image_key IS NOT NULL''')
+        yield from cur
+
+def cached_response_images(conn, key_prefix, batch_size=5000):
+    """Yield the image URL of every result in unexpired cached responses under key_prefix"""
+    with conn.cursor(name='cached_response_images') as cur:
+        cur.itersize = batch_size
+        cur.execute('''SELECT DISTINCT result->>'image'
+                       FROM api_response_cache c
+                       CROSS JOIN LATERAL jsonb_array_elements(
+                           CASE WHEN jsonb_typeof(c.payload) = 'array' THEN c.payload ELSE '[]' END) AS result
+                       WHERE c.cache_key LIKE %s AND c.expires_at > NOW()''', (key_prefix + '%',))
+        for (image_url,) in cur:
+            yield image_url
+
+def delete_image_placeholders(conn, image_urls):
+    with conn.cursor() as cur:
+        cur.execute('DELETE FROM image_placeholders WHERE image_url = ANY(%s)', (list(image_urls),))
+
+def saved_api_recipe_id(conn, spoonacular_id):
+    """Local id of an already saved Spoonacular recipe, if any"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT id FROM recipes WHERE spoonacular_id = %s LIMIT 1', (spoonacular_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+# Recipe writes; `derived` is app.derived_field_params() for the same text
+
+def insert_recipe(conn, title, description, ingredients, steps, image_url, author_id, derived,
+                  spoonacular_id=None, source='user', details=None):
+    """Insert a recipe and return its id"""
+    with conn.cursor() as cur:
+        cur.execute('''INSERT INTO recipes (title, description, ingredients, steps, image_url, author_id,
+                                            spoonacular_id, source,
+                                            title_clean, description_clean, ingredient_list, step_list,
+                                            details)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id''',
+                    (title, description, ingredients, steps, image_url, author_id,
+                     spoonacular_id, source, *derived,
+                     psycopg2.extras.Json(details) if details else None))
+        return cur.fetchone()[0]
+
+def set_recipe_details(conn, rows):
+    """Store details documents for (recipe_id, details) pairs"""
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_batch(cur, 'UPDATE recipes SET details = %s WHERE id = %s',
+                                      [(psycopg2.extras.Json(details), recipe_id) for recipe_id, details in rows])
+
+def recipes_missing_derived_fields(conn, after_id, recompute_all, limit):
+    """(id, title, description, ingredients, steps) after after_id without derived columns, or every one"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT id, title, description, ingredients, steps FROM recipes
+                       WHERE id > %s AND (%s OR step_list IS NULL)
+                       ORDER BY id LIMIT %s''', (after_id, recompute_all, limit))
+        return cur.fetchall()
+
+def set_derived_fields(conn, rows):
+    """Store derive_recipe_fields() output for (recipe_id, derived) pairs"""
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_batch(
+            cur, '''UPDATE recipes SET title_clean = %s, description_clean = %s,
+                                       ingredient_list = %s, step_list = %s
+                    WHERE id = %s''', [(*derived, recipe_id) for recipe_id, derived in rows])
+
+def spoonacular_recipes_without_details(conn, after_id, limit):
+    """(id, spoonacular_id) of saved Spoonacular recipes with no details yet"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT id, spoonacular_id FROM recipes
+                       WHERE id > %s AND details IS NULL AND spoonacular_id IS NOT NULL
+                       ORDER BY id LIMIT %s''', (after_id, limit))
+        return cur.fetchall()
+
+def update_recipe(conn, recipe_id, title, description, ingredients, steps, image_url, derived, details):
+    with conn.cursor() as cur:
+        cur.execute('''UPDATE recipes
+                       SET title = %s, description = %s, ingredients = %s, steps = %s, image_url = %s,
+                           title_clean = %s, description_clean = %s, ingredient_list = %s, step_list = %s,
+                           details = %s
+                       WHERE id = %s''',
+                    (title, description, ingredients, steps, image_url, *derived,
+                     psycopg2.extras.Json(details) if details else None, recipe_id))
+
+def set_pending_image(conn, recipe_id, key):
+    """Mark a direct upload as the recipe's next image (see finish_pending_image)"""
+    with conn.cursor() as cur:
+        cur.execute('UPDATE recipes SET pending_image_key = %s WHERE id = %s', (key, recipe_id))
+
+def image_key_pending(conn, key, exclude_id=None):
+    """Whether another recipe is already waiting on this direct upload"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT EXISTS (SELECT 1 FROM recipes
+                                      WHERE pending_image_key = %s AND id IS DISTINCT FROM %s)''',
+                    (key, exclude_id))
+        return cur.fetchone()[0]
+
+def finish_pending_image(conn, recipe_id, key, image_url):
+    """Swap in the processed image unless a newer upload replaced key; NULL keeps the old image"""
+    with conn.cursor() as cur:
+        cur.execute('''UPDATE recipes
+                       SET image_url = COALESCE(%s, image_url), pending_image_key = NULL
+                       WHERE id = %s AND pending_image_key = %s''', (image_url, recipe_id, key))
+        return cur.rowcount > 0
+
+def pending_image_uploads(conn):
+    """(id, pending_image_key) of recipes whose upload has not been processed"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT id, pending_image_key FROM recipes WHERE pending_image_key IS NOT NULL ORDER BY id')
+        return cur.fetchall()
+
+# JSON API projections
+
+# Public field name -> SQL expression (the whitelist for ?fields=)
+API_FIELDS = {
+    'id': 'r.id',
+    'title': 'r.title_clean',
+    'description': 'r.description_clean',
+    'ingredients': 'r.ingredient_list',
+    'steps': 'r.step_list',
+    'image_url': 'r.image_url',
+    'author_id': 'r.author_id',
+    'source': 'r.source',
+    'spoonacular_id': 'r.spoonacular_id',
+    'created_at': 'r.created_at',
+}
+API_LIST_FIELDS = ('id', 'title', 'description', 'image_url', 'author_id', 'source', 'created_at')
+
+# Fields read from the derived columns, by position in derive_recipe_fields()
+API_DERIVED_FIELDS = {'title': 0, 'description': 1, 'ingredients': 2, 'steps': 3}
+
+def api_columns(fields):
+    columns = [f"{API_FIELDS[name]} AS {name}" for name in fields]
+    if any(name in API_DERIVED_FIELDS for name in fields):
+        columns += [f"CASE WHEN r.step_list IS NULL THEN r.{column} END AS raw_{column}"
+                    for column in ('title', 'description', 'ingredients', 'steps')]
+    return ', '.join(columns)
+
+def api_recipe_page(conn, fields, before_id, limit):
+    """Up to limit recipes with id below before_id (keyset pagination), as dicts"""
+    where = 'WHERE r.id < %(before_id)s' if before_id else ''
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(f'''SELECT {api_columns(fields)}
+                        FROM recipes r
+                        {where}
+                        ORDER BY r.id DESC
+                        LIMIT %(limit)s''', {'before_id': before_id, 'limit': limit})
+        return cur.fetchall()
+
+def api_recipe(conn, fields, recipe_id):
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(f'''SELECT {api_columns(fields)}
+                        FROM recipes r
+                        WHERE r.id = %s''', (recipe_id,))
+        return cur.fetchone()
+
+# Users
+
+def user_by_email(conn, email):
+    with conn.cursor() as cur:
+        cur.execute('SELECT id, email, password_hash FROM users WHERE email = %s', (email,))
+        return User.fetch_one(cur)
+
+def create_user(conn, email, password_hash):
+    """Insert a user and return its id"""
+    with conn.cursor() as cur:
+        cur.execute('INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id',
+                    (email, password_hash))
+        return cur.fetchone()[0]
+
+# Similar recipes (see similarity.py)
+
+# Rebuilds take it exclusively, incremental updates shared; held until the transaction ends
+SIMILARITY_LOCK = 7_041_001
+
+SIMILARITY_DOCUMENT = '''SELECT id, COALESCE(title_clean, title), ingredient_list,
+                                 CASE WHEN ingredient_list IS NULL THEN ingredients END
+                          FROM recipes'''
+
+class SimilarityRow(Row):
+    __slots__ = ('recipe_id', 'terms', 'weights', 'similar_ids', 'scores')
+
+def lock_similarity(conn, shared=False):
+    with conn.cursor() as cur:
+        if shared:
+            cur.execute('SELECT pg_advisory_xact_lock_shared(%s)', (SIMILARITY_LOCK,))
+        else:
+            cur.execute('SELECT pg_advisory_xact_lock(%s)', (SIMILARITY_LOCK,))
+
+def similarity_documents(conn, batch_size=5000):
+    """Yield (id, title, ingredient_list, raw ingredients) for every recipe in id order.
+
+    Raw ingredient text only comes back for rows without ingredient_list.
+    Streams through a server-side cursor, so each call is one pass over
+    recipes that never sits in memory all at once.
+    """
+    with conn.cursor(name='similarity_documents') as cur:
+        cur.itersize = batch_size
+        cur.execute(f'{SIMILARITY_DOCUMENT} ORDER BY id')
+        yield from cur
+
+def similarity_document(conn, recipe_id):
+    with conn.cursor() as cur:
+        cur.execute(f'{SIMILARITY_DOCUMENT} WHERE id = %s', (recipe_id,))
+        return cur.fetchone()
+
+def similarity_model(conn):
+    """(vocabulary, idf) of the last rebuild, or None"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT vocabulary, idf FROM similarity_model WHERE id = 1')
+        return cur.fetchone()
+
+def save_similarity_index(conn, vocabulary, idf, rows):
+    """Replace the model and every SimilarityRow-shaped tuple in rows (any iterable, consumed once)
+
+    Rows are rewritten without the per-row cache NOTIFY; the caller flushes the page caches instead.
+    """
+    lock_similarity(conn)
+    with conn.cursor() as cur:
+        cur.execute('''INSERT INTO similarity_model (id, vocabulary, idf, built_at)
+                       VALUES (1, %s, %s, NOW())
+                       ON CONFLICT (id) DO UPDATE
+                       SET vocabulary = EXCLUDED.vocabulary, idf = EXCLUDED.idf, built_at = EXCLUDED.built_at''',
+                    (psycopg2.extras.Json(vocabulary), idf))
+        # One NOTIFY per row would have every worker evict page by page; the DISABLE is
+        # part of this transaction, so no other session ever sees the trigger off
+        cur.execute('ALTER TABLE recipe_similarity DISABLE TRIGGER recipe_similarity_cache_notify')
+        cur.execute('DELETE FROM recipe_similarity')
+        psycopg2.extras.execute_values(
+            cur, '''INSERT INTO recipe_similarity (recipe_id, terms, weights, similar_ids, scores)
+                     VALUES %s''', rows, template='(%s, %s::int[], %s::real[], %s::int[], %s::real[])',
+            page_size=500)
+        cur.execute('ALTER TABLE recipe_similarity ENABLE TRIGGER recipe_similarity_cache_notify')
+
+def similarity_candidates(conn, recipe_id, terms):
+    """Rows sharing one of terms with recipe_id, or listing it as a neighbour (both GIN lookups)"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT recipe_id, terms, weights, similar_ids, scores
+                       FROM recipe_similarity
+                       WHERE recipe_id <> %s AND (terms && %s::int[] OR similar_ids @> ARRAY[%s])
+                       ORDER BY recipe_id''', (recipe_id, list(terms), recipe_id))
+        return SimilarityRow.fetch_all(cur)
+
+def lock_neighbor_lists(conn, recipe_ids):
+    """Lock the rows about to be rewritten, in id order; returns {recipe_id: (similar_ids, scores)} as committed"""
+    with conn.cursor() as cur:
+        cur.execute('''SELECT recipe_id, similar_ids, scores
+                       FROM recipe_similarity
+                       WHERE recipe_id = ANY(%s)
+                       ORDER BY recipe_id
+                       FOR UPDATE''', (sorted(recipe_ids),))
+        return {recipe_id: (similar_ids, scores) for recipe_id, similar_ids, scores in cur.fetchall()}
+
+def save_recipe_similarity(conn, row, neighbor_updates):
+    """Upsert one recipe's vector and neighbours, then rewrite changed neighbour lists"""
+    with conn.cursor() as cur:
+        cur.execute('''INSERT INTO recipe_similarity (recipe_id, terms, weights, similar_ids, scores)
+                       VALUES (%s, %s::int[], %s::real[], %s::int[], %s::real[])
+                       ON CONFLICT (recipe_id) DO UPDATE
+                       SET terms = EXCLUDED.terms, weights = EXCLUDED.weights,
+                           similar_ids = EXCLUDED.similar_ids, scores = EXCLUDED.scores''', row)
+        psycopg2.extras.execute_batch(
+            cur, 'UPDATE recipe_similarity SET similar_ids = %s::int[], scores = %s::real[] WHERE recipe_id = %s',
+            [(similar_ids, scores, recipe_id) for recipe_id, similar_ids, scores in neighbor_updates])
+
+def similar_cards(conn, recipe_id, limit):
+    """Precomputed neighbours of recipe_id as cards, most similar first"""
+    with conn.cursor() as cur:
+        cur.execute(f'''SELECT {CARD_COLUMNS}
+                        FROM recipe_similarity s
+                        CROSS JOIN LATERAL unnest(s.similar_ids[1:%s]) WITH ORDINALITY AS n(id, position)
+                        JOIN recipes r ON r.id = n.id
+                        LEFT JOIN users u ON r.author_id = u.id
+                        LEFT JOIN image_placeholders p ON p.image_url = r.image_url
+                        WHERE s.recipe_id = %s
+                        ORDER BY n.position''', (limit, recipe_id))
+        return RecipeCard.fetch_all(cur)
@@ -0,0 +1,187 @@
+"""TF-IDF ingredient similarity for the "similar recipes" panel.
+
+Recipes become L2-normalised TF-IDF vectors over their ingredient words and
+(down-weighted) title words, kept as sparse rows (CSR arrays). A full rebuild
+finds every recipe's top-k neighbours with matrix products over blocks that
+are densified one at a time. Incremental updates score one recipe only
+against the stored vectors that share one of its query_terms().
+
+Pure NumPy; the app stores the vocabulary, the sparse vectors and the
+neighbour lists in Postgres.
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+TOKEN = re.compile(r'[a-z]+')
+
+# Quantities, units and filler words that say nothing about the dish
+STOPWORDS = frozenset('''
+    a an and or of the to for with in on into from at by as plus about
+    cup cups tbsp tablespoon tablespoons tsp teaspoon teaspoons g gram grams kg ml l
+    oz ounce ounces lb lbs pound pounds pinch dash can cans clove cloves slice slices
+    piece pieces package packages bunch handful large medium small whole half quarter
+    fresh freshly chopped diced minced sliced grated ground finely roughly thinly
+    optional divided taste needed more serving servings recipe easy best
+'''.split())
+
+TITLE_WEIGHT = 0.5
+
+def normalize_token(token):
+    # Crude plural folding: "tomatoes" -> "tomato", "onions" -> "onion"
+    if len(token) > 4 and token.endswith('oes'):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokens(text):
+    return [normalize_token(t) for t in TOKEN.findall((text or '').lower())
+            if len(t) > 2 and t not in STOPWORDS]
+
+def recipe_terms(title, ingredients):
+    """Term counts for one recipe; title words are kept apart from ingredient words"""
+    counts = Counter()
+    for line in ingredients or []:
+        counts.update(f"i:{t}" for t in set(tokens(line)))
+    for t in set(tokens(title)):
+        counts[f"t:{t}"] += TITLE_WEIGHT
+    return counts
+
+class TfidfModel:
+    """Vocabulary plus smoothed IDF weights fitted on the whole collection"""
+
+    def __init__(self, vocabulary, idf):
+        self.vocabulary = list(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self._index = {term: i for i, term in enumerate(self.vocabulary)}
+
+    @classmethod
+    def fit(cls, documents, max_terms=2048, min_df=2):
+        """documents: iterable of recipe_terms() counters"""
+        document_frequency = Counter()
+        count = 0
+        for terms in documents:
+            document_frequency.update(terms.keys())
+            count += 1
+        kept = [(df, term) for term, df in document_frequency.items() if df >= min_df]
+        kept.sort(key=lambda item: (-item[0], item[1]))
+        vocabulary = [term for _, term in kept[:max_terms]]
+        idf = [math.log((1 + count) / (1 + document_frequency[term])) + 1.0 for term in vocabulary]
+        return cls(vocabulary, idf)
+
+    def transform(self, terms):
+        """Sparse L2-normalised vector as (indices int32, weights float32)"""
+        pairs = sorted((self._index[term], count) for term, count in terms.items() if term in self._index)
+        if not pairs:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        indices = np.fromiter((i for i, _ in pairs), dtype=np.int32, count=len(pairs))
+        weights = np.fromiter((c for _, c in pairs), dtype=np.float32, count=len(pairs)) * self.idf[indices]
+        return indices, weights / np.linalg.norm(weights)
+
+def query_terms(indices, weights, min_score):
+    """Terms a recipe must share with this vector to score min_score or more against it.
+
+    The lowest weights are dropped while their norm stays below min_score:
+    by Cauchy-Schwarz a unit vector sharing only those terms scores less
+    than that norm. Common words carry the lowest IDF, so they go first.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(weights, kind='stable')
+    dropped = np.sqrt(np.cumsum(np.square(weights[order]))) < min_score
+    return np.sort(np.asarray(indices, dtype=np.int64)[order[~dropped]])
+
+def top_k(scores, k):
+    """Column indices and values of the k largest entries in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.intp), empty.astype(np.float32)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+class SparseRows:
+    """Stored vectors in CSR form, for scoring one new vector against all of them"""
+
+    def __init__(self, vectors):
+        lengths = np.fromiter((len(indices) for indices, _ in vectors), dtype=np.int64, count=len(vectors))
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.indices = (np.concatenate([np.asarray(i, dtype=np.int32) for i, _ in vectors])
+                        if vectors else np.empty(0, dtype=np.int32))
+        self.weights = (np.concatenate([np.asarray(w, dtype=np.float32) for _, w in vectors])
+                        if vectors else np.empty(0, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def row(self, position):
+        """(indices, weights) of one stored vector"""
+        lo, hi = self.indptr[position], self.indptr[position + 1]
+        return self.indices[lo:hi], self.weights[lo:hi]
+
+    def densify(self, start, stop, n_terms):
+        """Rows start..stop as a dense (stop - start, n_terms) float32 block"""
+        block = np.zeros((stop - start, n_terms), dtype=np.float32)
+        owners = np.repeat(np.arange(stop - start), np.diff(self.indptr[start:stop + 1]))
+        lo, hi = self.indptr[start], self.indptr[stop]
+        block[owners, self.indices[lo:hi]] = self.weights[lo:hi]
+        return block
+
+    def dot(self, indices, weights, n_terms):
+        """Cosine similarity of one sparse vector with every stored row"""
+        query = np.zeros(n_terms, dtype=np.float32)
+        query[indices] = weights
+        contributions = np.concatenate((query[self.indices] * self.weights, [0.0]))
+        # reduceat over empty rows would pick up the next row's value
+        sums = np.add.reduceat(contributions, np.minimum(self.indptr[:-1], len(contributions) - 1))
+        return np.where(np.diff(self.indptr) > 0, sums, 0.0).astype(np.float32)
+
+def all_neighbors(rows, n_terms, k, batch_size=1024, chunk_size=16384):
+    """Yield the top-k cosine neighbours (row positions, scores) of every row, excluding itself, a batch at a time.
+
+    Query batches are scored against the collection chunk by chunk, both
+    densified from the sparse rows on the fly, so memory stays at
+    (batch_size + chunk_size) x n_terms floats however large n is.
+    """
+    n = len(rows)
+    k = min(k, max(n - 1, 0))
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        query = rows.densify(start, stop, n_terms)
+        own = np.arange(start, stop)
+        neighbors = np.empty((stop - start, 0), dtype=np.intp)
+        scores = np.empty((stop - start, 0), dtype=np.float32)
+        for chunk_start in range(0, n, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, n)
+            block = query @ rows.densify(chunk_start, chunk_stop, n_terms).T
+            inside = (own >= chunk_start) & (own < chunk_stop)
+            block[np.nonzero(inside)[0], own[inside] - chunk_start] = -np.inf
+            chunk_neighbors, chunk_scores = top_k(block, k)
+            candidates = np.concatenate((neighbors, chunk_neighbors + chunk_start), axis=1)
+            picked, scores = top_k(np.concatenate((scores, chunk_scores), axis=1), k)
+            neighbors = np.take_along_axis(candidates, picked, axis=1)
+        yield neighbors, scores
+
+def merge_neighbor(neighbor_ids, neighbor_scores, recipe_id, score, k, min_score):
+    """Insert (or move/drop) recipe_id in a neighbour list; returns new lists or None if unchanged"""
+    pairs = [(s, i) for i, s in zip(neighbor_ids, neighbor_scores) if i != recipe_id]
+    if score >= min_score:
+        pairs.append((score, recipe_id))
+    pairs.sort(key=lambda pair: -pair[0])
+    pairs = pairs[:k]
+    new_ids = [i for _, i in pairs]
+    if new_ids == list(neighbor_ids) and len(pairs) == len(neighbor_scores):
+        return None
+    return new_ids, [s for s, _ in pairs]
+
+def affected_rows(scores, neighbor_lists, recipe_id, k, min_score):
+    """Rows whose (ids, scores) neighbour list a rescored recipe enters, moves within or leaves"""
+    entry = np.fromiter((row_scores[-1] if len(row_scores) >= k else min_score
+                         for _, row_scores in neighbor_lists), dtype=np.float32, count=len(neighbor_lists))
+    rows = set(np.nonzero(scores >= np.maximum(entry, min_score))[0].tolist())
+    rows.update(j for j, (ids, _) in enumerate(neighbor_lists) if recipe_id in ids)
+    return sorted(rows)
@@ -0,0 +1,51 @@
+// Sends the recipe form's image straight to S3 with a presigned POST, so the
+// form itself submits only the object key (image_key). If presigning or the
+// S3 upload fails, the file stays on the form and goes through the server.
+document.addEventListener('DOMContentLoaded', () => {
+  const input = document.querySelector('input[type="file"][data-presign-url]');
+  if (!input || !window.fetch || !window.FormData) return;
+
+  const form = input.form;
+  const keyField = form.querySelector('input[name="image_key"]');
+  const status = document.getElementById(input.dataset.status);
+  const submit = form.querySelector('button[type="submit"]');
+
+  input.addEventListener('change', async () => {
+    keyField.value = '';
+    input.name = 'image';
+    const file = input.files[0];
+    if (!file) return;
+
+    submit.disabled = true;
+    status.textContent = 'Uploading image…';
+    try {
+      const presign = await fetch(input.dataset.presignUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ content_type: file.type, size: file.size }),
+      });
+      if (presign.status === 400) {
+        status.textContent = (await presign.json()).error;
+        input.value = '';
+        return;
+      }
+      if (!presign.ok) throw new Error(`presign returned ${presign.status}`);
+      const upload = await presign.json();
+
+      const body = new FormData();
+      Object.entries(upload.fields).forEach(([name, value]) => body.append(name, value));
+      body.append('file', file); // S3 requires the file to be the last field
+      const response = await fetch(upload.url, { method: 'POST', body });
+      if (!response.ok) throw new Error(`S3 returned ${response.status}`);
+
+      keyField.value = upload.key;
+      input.removeAttribute('name'); // the bytes are already in the bucket
+      status.textContent = 'Image uploaded ✓';
+    } catch (error) {
+      status.textContent = 'Image will be sent with the form.';
+    } finally {
+      submit.disabled = false;
+    }
+  });
+});